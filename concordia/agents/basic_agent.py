@@ -21,8 +21,8 @@ Park, J.S., O'Brien, J.C., Cai, C.J., Morris, M.R., Liang, P. and
 Bernstein, M.S., 2023. Generative agents: Interactive simulacra of human
 behavior. arXiv preprint arXiv:2304.03442.
 """
-from collections.abc import Callable, Sequence
-import concurrent
+import asyncio
+from collections.abc import Sequence
 import copy
 import datetime
 import threading
@@ -32,7 +32,10 @@ from concordia.language_model import language_model
 from concordia.typing import agent
 from concordia.typing import clock as game_clock
 from concordia.typing import component
+from concordia.utils import component_graph
+from concordia.utils import concurrency
 from concordia.utils import helper_functions
+from concordia.utils import log_sink
 from IPython import display
 import termcolor
 
@@ -53,6 +56,8 @@ class BasicAgent(
       verbose: bool = False,
       user_controlled: bool = False,
       print_colour: str = 'green',
+      async_model: language_model.AsyncLanguageModel | None = None,
+      log: log_sink.LogSink | None = None,
   ):
     """A generative agent.
 
@@ -68,11 +73,16 @@ class BasicAgent(
       verbose: whether to print chains of thought or not
       user_controlled: if True, would query user input for speech and action
       print_colour: which colour to use for printing
+      async_model: the language model to use in `act_async`. If None then
+        `act_async` calls `model` in a worker thread.
+      log: where to keep the log of the agent's actions. If None, all the log
+        entries are kept in memory.
     """
     self._verbose = verbose
     self._print_colour = print_colour
 
     self._model = model
+    self._async_model = async_model
 
     self._agent_name = agent_name
     self._clock = clock
@@ -83,10 +93,11 @@ class BasicAgent(
     self._state_lock = threading.Lock()
 
     self._components = {}
+    self._component_graph = None
     for comp in components:
       self.add_component(comp)
 
-    self._log = []
+    self._log = log if log is not None else log_sink.LogSink()
     self._last_chain_of_thought = None
     self._last_update = datetime.datetime.min
     self._update()
@@ -96,18 +107,28 @@ class BasicAgent(
     return self._agent_name
 
   def copy(self) -> 'BasicAgent':
-    """Creates a copy of the agent."""
+    """Creates a copy of the agent, which shares its components and log."""
     new_sim = BasicAgent(
         model=self._model,
         agent_name=self._agent_name,
         clock=self._clock,
         components=copy.copy(list(self._components.values())),
+        update_interval=self._update_interval,
         verbose=self._verbose,
         user_controlled=self._user_controlled,
         print_colour=self._print_colour,
+        async_model=self._async_model,
+        log=self._log,
     )
     return new_sim
 
+  def close(self) -> None:
+    """Closes the log of the agent, and of its copies, which share it.
+
+    Call this once the simulation ends. The log can still be read afterwards.
+    """
+    self._log.close()
+
   def _print(self, entry: str):
     print(termcolor.colored(entry, self._print_colour), end='')
 
@@ -117,10 +138,20 @@ class BasicAgent(
       raise ValueError(f'Duplicate component name: {comp.name()}')
     else:
       self._components[comp.name()] = comp
+      self._component_graph = None
 
   def remove_component(self, component_name: str) -> None:
     """Remove a component."""
     del self._components[component_name]
+    self._component_graph = None
+
+  def get_component_graph(self) -> component_graph.ComponentGraph:
+    """Returns the graph that schedules the updates of the components."""
+    if self._component_graph is None:
+      self._component_graph = component_graph.ComponentGraph(
+          self._components.values()
+      )
+    return self._component_graph
 
   def set_clock(self, clock: game_clock.GameClock):
     self._clock = clock
@@ -151,17 +182,14 @@ class BasicAgent(
 
   def _update(self):
     self._last_update = self._clock.now()
+    self.get_component_graph().update()
 
-    def _get_recursive_update_func(
-        comp: component.Component,
-    ) -> Callable[[], None]:
-      return lambda: helper_functions.apply_recursively(
-          comp, function_name='update'
-      )
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-      for comp in self._components.values():
-        executor.submit(_get_recursive_update_func(comp))
+  async def _maybe_update_async(self):
+    next_update = self._last_update + self._update_interval
+    if self._clock.now() >= next_update:
+      self._last_update = self._clock.now()
+      # Components are synchronous, so they are updated in a worker thread.
+      await asyncio.to_thread(self.get_component_graph().update)
 
   def observe(self, observation: str):
     if observation:
@@ -175,18 +203,8 @@ class BasicAgent(
     if not action_spec:
       action_spec = agent.DEFAULT_ACTION_SPEC
     self._maybe_update()
-    prompt = interactive_document.InteractiveDocument(self._model)
-    context_of_action = '\n'.join([
-        f'{self.state()}',
-    ])
-
-    prompt.statement(context_of_action)
-
-    call_to_action = action_spec.call_to_action.format(
-        agent_name=self._agent_name,
-        timedelta=helper_functions.timedelta_to_readable_str(
-            self._clock.get_step_size()
-        ),
+    prompt, context_of_action, call_to_action = self._make_action_prompt(
+        action_spec
     )
     output = ''
 
@@ -214,9 +232,90 @@ class BasicAgent(
     def get_externality(externality):
       return externality.update_after_event(output)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-      executor.map(get_externality, self._components.values())
+    concurrency.map_parallel(get_externality, self._components.values())
+
+    self._log_action(prompt)
+    return output
+
+  async def act_async(
+      self,
+      action_spec: agent.ActionSpec = agent.DEFAULT_ACTION_SPEC,
+  ) -> str:
+    """Asynchronous version of `act`.
+
+    The action itself is sampled from the async model on the running event
+    loop. Components are synchronous, so their updates run in the loop's
+    shared worker threads rather than in a new thread pool per call.
 
+    Args:
+      action_spec: the action spec, as for `act`.
+
+    Returns:
+      The agent's intended action.
+    """
+    if not action_spec:
+      action_spec = agent.DEFAULT_ACTION_SPEC
+    await self._maybe_update_async()
+    prompt, context_of_action, call_to_action = self._make_action_prompt(
+        action_spec
+    )
+    output = ''
+
+    if action_spec.output_type == 'FREE':
+      if self._user_controlled:
+        output = await asyncio.to_thread(
+            self._ask_for_input,
+            context_of_action,
+            call_to_action + '\n',
+        )
+      else:
+        output = self._agent_name + ' '
+        output += await prompt.open_question_async(
+            call_to_action,
+            max_tokens=2200,
+            answer_prefix=output,
+        )
+    elif action_spec.output_type == 'CHOICE':
+      idx = await prompt.multiple_choice_question_async(
+          question=call_to_action, answers=action_spec.options
+      )
+      output = action_spec.options[idx]
+    elif action_spec.output_type == 'FLOAT':
+      raise NotImplementedError
+
+    await asyncio.gather(*(
+        asyncio.to_thread(externality.update_after_event, output)
+        for externality in self._components.values()
+    ))
+
+    self._log_action(prompt)
+    return output
+
+  def _make_action_prompt(
+      self, action_spec: agent.ActionSpec
+  ) -> tuple[interactive_document.InteractiveDocument, str, str]:
+    """Returns the action prompt, the context of action and call to action."""
+    prompt = interactive_document.InteractiveDocument(
+        self._model, async_model=self._async_model
+    )
+    context_of_action = '\n'.join([
+        f'{self.state()}',
+    ])
+
+    prompt.statement(context_of_action)
+
+    call_to_action = action_spec.call_to_action.format(
+        agent_name=self._agent_name,
+        timedelta=helper_functions.timedelta_to_readable_str(
+            self._clock.get_step_size()
+        ),
+    )
+    return prompt, context_of_action, call_to_action
+
+  def _log_action(
+      self, prompt: interactive_document.InteractiveDocument
+  ) -> None:
+    """Logs the chain of thought and component logs of an action."""
     self._last_chain_of_thought = prompt.view().text().splitlines()
     current_log = {
         'date': self._clock.now(),
@@ -239,8 +338,6 @@ class BasicAgent(
           + '\n'
       )
 
-    return output
-
   def _observe_latest(self, conversation: str):
     # If the prefix is not found then `find` returns -1.
     prefix_start_index = conversation.find(self._conversation_prefix)
@@ -0,0 +1,224 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Approximate nearest neighbour indices for associative memory embeddings.
+
+An index narrows down the rows of a memory bank that could be similar to a
+query, so that only those rows need to be scored. The memory bank remains the
+source of truth for the embeddings; the index only stores row numbers.
+"""
+
+import abc
+import itertools
+import math
+import threading
+
+import numpy as np
+
+# Bounds the size of the temporary [rows, centroids] similarity matrices.
+_ASSIGNMENT_CHUNK_SIZE = 8192
+
+
+class EmbeddingIndex(metaclass=abc.ABCMeta):
+  """Interface for an approximate nearest neighbour index over memory rows.
+
+  The memory bank serializes calls to `update`, but calls `search` from many
+  threads at once, including while an update is in progress. Searches may
+  return rows from an update that has not finished.
+  """
+
+  @abc.abstractmethod
+  def update(self, embeddings: np.ndarray) -> None:
+    """Brings the index up to date with the memory bank.
+
+    Args:
+      embeddings: the [num_rows, embedding_size] embeddings of every row in the
+        memory bank. Rows are only ever appended, so the rows passed on previous
+        calls are a prefix of this matrix.
+    """
+    raise NotImplementedError
+
+  @abc.abstractmethod
+  def search(self, query: np.ndarray) -> np.ndarray | None:
+    """Returns candidate rows for a query embedding.
+
+    Args:
+      query: the embedding of the query.
+
+    Returns:
+      Indices of the rows likely to be most similar to the query, or None if
+      the index cannot answer yet, in which case the caller should fall back
+      to an exact scan.
+    """
+    raise NotImplementedError
+
+
+def _nearest_centroids(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+  """Returns the index of the most similar centroid for each row of data."""
+  assignments = np.empty(len(data), dtype=np.int64)
+  for start in range(0, len(data), _ASSIGNMENT_CHUNK_SIZE):
+    chunk = data[start:start + _ASSIGNMENT_CHUNK_SIZE]
+    assignments[start:start + len(chunk)] = np.argmax(
+        chunk @ centroids.T, axis=1
+    )
+  return assignments
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+  norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+  return vectors / np.maximum(norms, np.finfo(vectors.dtype).tiny)
+
+
+def _spherical_kmeans(
+    data: np.ndarray,
+    num_clusters: int,
+    num_iterations: int,
+    rng: np.random.Generator,
+) -> np.ndarray:
+  """Clusters unit vectors by cosine similarity and returns the centroids."""
+  data = _normalize(data)
+  centroids = data[rng.choice(len(data), num_clusters, replace=False)]
+  for _ in range(num_iterations):
+    assignments = _nearest_centroids(data, centroids)
+    order = np.argsort(assignments, kind='stable')
+    counts = np.bincount(assignments, minlength=num_clusters)
+    non_empty = counts > 0
+    boundaries = np.concatenate(([0], np.cumsum(counts)[:-1]))[non_empty]
+    # Empty clusters keep their previous centroid.
+    centroids[non_empty] = _normalize(
+        np.add.reduceat(data[order], boundaries, axis=0)
+    )
+  return centroids
+
+
+class IVFIndex(EmbeddingIndex):
+  """An inverted file index over embeddings, implemented in pure NumPy.
+
+  Rows are partitioned into clusters by spherical k-means. A query only visits
+  the `num_probes` clusters whose centroids are most similar to it. New rows are
+  assigned to their nearest existing centroid as they are added, and the
+  clusters are retrained whenever the memory bank has grown by
+  `retrain_growth_factor` since the last training, so training cost is
+  amortized over the adds.
+
+  The index is not used until the memory bank reaches `min_rows_to_train` rows,
+  below which an exact scan is fast enough.
+
+  Updates are serialized, but searches do not take a lock: each training
+  publishes its centroids and clusters together in one assignment, and
+  incremental updates only append to the clusters.
+  """
+
+  def __init__(
+      self,
+      *,
+      num_probes: int = 16,
+      min_rows_to_train: int = 10_000,
+      rows_per_cluster: int | None = None,
+      retrain_growth_factor: float = 2.0,
+      num_training_iterations: int = 10,
+      max_training_rows: int = 100_000,
+      seed: int | None = None,
+  ):
+    """Constructor.
+
+    Args:
+      num_probes: how many clusters to visit per query. Higher values increase
+        recall at the cost of latency.
+      min_rows_to_train: the index is trained once there are this many rows.
+      rows_per_cluster: the target average number of rows per cluster. If None
+        then the number of clusters is the square root of the number of rows.
+      retrain_growth_factor: retrain once the number of rows has grown by this
+        factor since the last training.
+      num_training_iterations: number of k-means iterations per training.
+      max_training_rows: k-means is run on a random sample of at most this many
+        rows.
+      seed: seed for the random number generator used in training.
+    """
+    self._num_probes = num_probes
+    self._min_rows_to_train = min_rows_to_train
+    self._rows_per_cluster = rows_per_cluster
+    self._retrain_growth_factor = retrain_growth_factor
+    self._num_training_iterations = num_training_iterations
+    self._max_training_rows = max_training_rows
+    self._rng = np.random.default_rng(seed)
+
+    self._lock = threading.Lock()
+    # The centroids and the rows assigned to each of them, or None until the
+    # index is trained.
+    self._clusters: tuple[np.ndarray, list[list[int]]] | None = None
+    self._num_indexed = 0
+    self._num_rows_at_training = 0
+
+  def _num_clusters(self, num_rows: int) -> int:
+    if self._rows_per_cluster is None:
+      num_clusters = int(math.sqrt(num_rows))
+    else:
+      num_clusters = num_rows // self._rows_per_cluster
+    return max(1, min(num_clusters, num_rows))
+
+  def _train(self, embeddings: np.ndarray) -> None:
+    """Reclusters all rows from scratch. Assumes lock is held."""
+    num_rows = len(embeddings)
+    num_clusters = self._num_clusters(num_rows)
+    if num_rows > self._max_training_rows:
+      sample = embeddings[
+          self._rng.choice(num_rows, self._max_training_rows, replace=False)
+      ]
+    else:
+      sample = embeddings
+    centroids = _spherical_kmeans(
+        sample, num_clusters, self._num_training_iterations, self._rng
+    )
+    assignments = _nearest_centroids(embeddings, centroids)
+    order = np.argsort(assignments, kind='stable')
+    boundaries = np.cumsum(np.bincount(assignments, minlength=num_clusters))
+    self._clusters = (
+        centroids,
+        [rows.tolist() for rows in np.split(order, boundaries[:-1])],
+    )
+    self._num_indexed = num_rows
+    self._num_rows_at_training = num_rows
+
+  def update(self, embeddings: np.ndarray) -> None:
+    num_rows = len(embeddings)
+    with self._lock:
+      if num_rows < self._min_rows_to_train:
+        return
+      if (
+          self._clusters is None
+          or num_rows >= self._num_rows_at_training * self._retrain_growth_factor
+      ):
+        self._train(embeddings)
+        return
+      centroids, clusters = self._clusters
+      new_rows = embeddings[self._num_indexed:]
+      assignments = _nearest_centroids(new_rows, centroids)
+      for row, cluster in enumerate(assignments, start=self._num_indexed):
+        clusters[cluster].append(row)
+      self._num_indexed = num_rows
+
+  def search(self, query: np.ndarray) -> np.ndarray | None:
+    trained = self._clusters
+    if trained is None:
+      return None
+    centroids, clusters = trained
+    similarities = centroids @ np.ravel(query)
+    num_probes = min(self._num_probes, len(similarities))
+    probes = np.argpartition(-similarities, num_probes - 1)[:num_probes]
+    return np.fromiter(
+        itertools.chain.from_iterable(clusters[cluster] for cluster in probes),
+        dtype=np.int64,
+    )
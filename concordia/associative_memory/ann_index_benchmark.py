@@ -0,0 +1,128 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+r"""Recall and latency of approximate versus exact associative retrieval.
+
+Fills an associative memory with synthetic clustered embeddings, then compares
+the results and timing of approximate (IVF index) and exact retrieval.
+
+Usage:
+  python -m concordia.associative_memory.ann_index_benchmark \
+      --num_memories=200000 --num_probes=16
+"""
+
+import datetime
+import time
+
+from absl import app
+from absl import flags
+from concordia.associative_memory import ann_index
+from concordia.associative_memory import associative_memory
+import numpy as np
+
+_NUM_MEMORIES = flags.DEFINE_integer(
+    'num_memories', 100_000, 'Number of memories in the memory bank.'
+)
+_NUM_QUERIES = flags.DEFINE_integer(
+    'num_queries', 200, 'Number of queries to time.'
+)
+_EMBEDDING_SIZE = flags.DEFINE_integer(
+    'embedding_size', 384, 'Size of the synthetic embeddings.'
+)
+_NUM_TOPICS = flags.DEFINE_integer(
+    'num_topics', 2000, 'Number of clusters in the synthetic embeddings.'
+)
+_K = flags.DEFINE_integer('k', 25, 'Number of memories to retrieve.')
+_NUM_PROBES = flags.DEFINE_integer(
+    'num_probes', 16, 'Number of IVF clusters visited per query.'
+)
+_USE_RECENCY = flags.DEFINE_bool(
+    'use_recency', True, 'Whether retrieval is weighted by recency.'
+)
+_SEED = flags.DEFINE_integer('seed', 0, 'Random seed.')
+
+_START = datetime.datetime(2024, 1, 1)
+
+
+def _unit_vectors(vectors: np.ndarray) -> np.ndarray:
+  return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def _synthetic_embeddings(
+    rng: np.random.Generator, num: int, topics: np.ndarray
+) -> np.ndarray:
+  noise = rng.standard_normal((num, topics.shape[1])) / np.sqrt(topics.shape[1])
+  return _unit_vectors(
+      topics[rng.integers(len(topics), size=num)] + 0.7 * noise
+  ).astype(np.float32)
+
+
+def _time_retrieval(memory, queries, exact) -> tuple[list[set[str]], float]:
+  results = []
+  start = time.perf_counter()
+  for query in queries:
+    results.append(set(memory.retrieve_associative(
+        query,
+        k=_K.value,
+        use_recency=_USE_RECENCY.value,
+        add_time=False,
+        exact=exact,
+    )))
+  return results, (time.perf_counter() - start) / len(queries)
+
+
+def main(argv):
+  del argv
+  rng = np.random.default_rng(_SEED.value)
+  topics = _unit_vectors(
+      rng.standard_normal((_NUM_TOPICS.value, _EMBEDDING_SIZE.value))
+  )
+  embeddings_by_text = {}
+
+  memory_texts = [f'memory {i}' for i in range(_NUM_MEMORIES.value)]
+  query_texts = [f'query {i}' for i in range(_NUM_QUERIES.value)]
+  all_texts = memory_texts + query_texts
+  for text, embedding in zip(
+      all_texts, _synthetic_embeddings(rng, len(all_texts), topics)
+  ):
+    embeddings_by_text[text] = embedding
+
+  memory = associative_memory.AssociativeMemory(
+      embeddings_by_text.__getitem__,
+      index=ann_index.IVFIndex(num_probes=_NUM_PROBES.value, seed=_SEED.value),
+  )
+  start = time.perf_counter()
+  for i, text in enumerate(memory_texts):
+    memory.add(text, timestamp=_START + datetime.timedelta(minutes=i))
+  print(
+      f'Added {len(memory)} memories in {time.perf_counter() - start:.1f}s.'
+  )
+
+  exact_results, exact_latency = _time_retrieval(memory, query_texts, True)
+  approximate_results, approximate_latency = _time_retrieval(
+      memory, query_texts, False
+  )
+  recall = np.mean([
+      len(exact & approximate) / len(exact)
+      for exact, approximate in zip(exact_results, approximate_results)
+  ])
+  print(f'Exact retrieval:       {1000 * exact_latency:.2f} ms/query')
+  print(f'Approximate retrieval: {1000 * approximate_latency:.2f} ms/query')
+  print(f'Speedup: {exact_latency / approximate_latency:.1f}x')
+  print(f'Recall@{_K.value}: {recall:.3f}')
+
+
+if __name__ == '__main__':
+  app.run(main)
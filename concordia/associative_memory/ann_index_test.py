@@ -0,0 +1,77 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for ann_index.py."""
+
+import datetime
+import zlib
+
+from absl.testing import absltest
+from concordia.associative_memory import ann_index
+from concordia.associative_memory import associative_memory
+import numpy as np
+
+_START = datetime.datetime(2024, 1, 1)
+
+
+def _embedder(text: str) -> np.ndarray:
+  rng = np.random.default_rng(zlib.crc32(text.encode()))
+  embedding = rng.standard_normal(16)
+  return embedding / np.linalg.norm(embedding)
+
+
+class IVFIndexTest(absltest.TestCase):
+
+  def test_untrained_index_defers_to_exact_search(self):
+    index = ann_index.IVFIndex(min_rows_to_train=100)
+    index.update(np.stack([_embedder(str(i)) for i in range(10)]))
+    self.assertIsNone(index.search(_embedder('query')))
+
+  def test_search_finds_stored_rows(self):
+    index = ann_index.IVFIndex(num_probes=1, min_rows_to_train=100, seed=0)
+    embeddings = np.stack([_embedder(str(i)) for i in range(500)])
+    # Add the rows in two parts so that both training and incremental
+    # assignment are exercised.
+    index.update(embeddings[:300])
+    index.update(embeddings)
+    for row in (3, 250, 499):
+      self.assertIn(row, index.search(embeddings[row]))
+
+  def test_memory_with_index_retrieves_exact_match(self):
+    memory = associative_memory.AssociativeMemory(
+        _embedder,
+        index=ann_index.IVFIndex(min_rows_to_train=100, seed=0),
+    )
+    for i in range(1000):
+      memory.add(
+          f'memory number {i}', timestamp=_START + datetime.timedelta(hours=i)
+      )
+    for query in ('memory number 17', 'memory number 512'):
+      approximate = memory.retrieve_associative(
+          query, k=1, use_recency=False, use_importance=False, add_time=False
+      )
+      exact = memory.retrieve_associative(
+          query,
+          k=1,
+          use_recency=False,
+          use_importance=False,
+          add_time=False,
+          exact=True,
+      )
+      self.assertEqual(approximate, [query])
+      self.assertEqual(exact, [query])
+
+
+if __name__ == '__main__':
+  absltest.main()
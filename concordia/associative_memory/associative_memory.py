@@ -20,14 +20,43 @@ M.S., 2023. Generative agents: Interactive simulacra of human behavior. arXiv
 preprint arXiv:2304.03442.
 """
 
-from collections.abc import Callable, Iterable
+from collections.abc import Callable, Iterable, Iterator, Sequence
+import contextlib
+import dataclasses
 import datetime
+import json
+import os
+import re
 import threading
+import time as time_lib
+from typing import IO
 
+from concordia.associative_memory import ann_index
+from concordia.associative_memory import embedders
 from concordia.associative_memory import importance_function
+from concordia.associative_memory import text_index
+from concordia.utils import measurements as measurements_lib
 import numpy as np
 import pandas as pd
 
+DEFAULT_STATS_CHANNEL = 'associative_memory_stats'
+
+_RECENCY_DECAY_PER_MINUTE = 0.99
+_NANOSECONDS_PER_MINUTE = 60 * 10**9
+
+# When retrieving through an approximate index with recency weighting, this
+# many of the latest memories are always scored too, since their recency bonus
+# can lift them into the top k even if they are not similar to the query.
+_NUM_RECENT_CANDIDATES = 256
+
+# Number of rows to preallocate the first time a memory is added. After that
+# the capacity is doubled whenever it runs out, so appends are amortized O(1).
+_INITIAL_CAPACITY = 64
+
+# Names of the files written by `AssociativeMemory.save`.
+_EMBEDDINGS_FILENAME = 'embeddings.npy'
+_COLUMNS_FILENAME = 'columns.npz'
+
 
 def _check_date_in_range(timestamp: datetime.datetime) -> None:
   if timestamp < pd.Timestamp.min:
@@ -38,8 +67,85 @@ def _check_date_in_range(timestamp: datetime.datetime) -> None:
     raise ValueError(f'timestamp {timestamp} > pd.Timestamp.max {max_date}')
 
 
+def _to_nanoseconds(timestamp: datetime.datetime) -> int:
+  """Converts a timestamp into integer nanoseconds since the epoch."""
+  return pd.Timestamp(timestamp).value
+
+
+def _write_atomically(path: str, write_fn: Callable[[IO[bytes]], None]):
+  """Writes a file via a temporary file, so that it is never partly written."""
+  temporary_path = path + '.tmp'
+  with open(temporary_path, 'wb') as f:
+    write_fn(f)
+  os.replace(temporary_path, path)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+  """Returns the indices of the k largest scores, in descending score order.
+
+  Uses a linear-time partial partition to find the k winners and only sorts
+  those, rather than sorting all the scores.
+
+  Args:
+    scores: an array of scores, the last axis ranges over memories. Leading
+      axes (e.g. one per query) are treated independently.
+    k: the number of indices to return.
+  """
+  num_scores = scores.shape[-1]
+  k = min(k, num_scores)
+  if k <= 0:
+    return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+  if k < num_scores:
+    candidates = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+  else:
+    candidates = np.broadcast_to(np.arange(num_scores), scores.shape)
+  candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+  order = np.argsort(-candidate_scores, axis=-1, kind='stable')
+  return np.take_along_axis(candidates, order, axis=-1)
+
+
+@dataclasses.dataclass(frozen=True)
+class _Snapshot:
+  """An immutable view of the first `size` rows of the memory bank.
+
+  The arrays are views of the writer's buffers and the lists are the writer's
+  lists. Writers only ever write past `size`, or into freshly allocated
+  buffers, so the contents of a published snapshot never change.
+  """
+
+  size: int
+  text: Sequence[str]
+  tags: Sequence[tuple[str, ...]]
+  time: np.ndarray
+  importance: np.ndarray
+  embedding: np.ndarray | None
+  rows_by_time: np.ndarray
+  sorted_times: np.ndarray
+
+
 class AssociativeMemory:
-  """Class that implements associative memory."""
+  """Class that implements associative memory.
+
+  Memories are stored column by column. Embeddings, times and importance live
+  in preallocated NumPy blocks that grow geometrically, while text and tags are
+  kept in parallel lists. Embeddings are stored as a contiguous float32 matrix
+  so that retrieval scores every memory with a single matrix product. Rows are
+  never modified once written, so the first `len(self)` rows of every column
+  are always consistent with each other.
+
+  A time index, the row numbers ordered by time, is maintained alongside the
+  columns. Memories almost always arrive in time order, so keeping it sorted
+  is usually a plain append, and time interval and recency queries are binary
+  searches and slices rather than scans. Likewise, an inverted index of word
+  tokens answers literal text searches without scanning every memory.
+
+  Reads never take a lock. After every write the memory publishes a new
+  immutable snapshot of its rows with a single attribute assignment, and each
+  read works on whichever snapshot was current when it started. Out of order
+  inserts into the time index copy it rather than shifting it in place, so
+  published snapshots stay valid. Only writers serialize on a lock, and the
+  time they spend waiting for it can be published to a measurements channel.
+  """
 
   def __init__(
       self,
@@ -47,6 +153,9 @@ class AssociativeMemory:
       importance: Callable[[str], float] | None = None,
       clock: Callable[[], datetime.datetime] = datetime.datetime.now,
       clock_step_size: datetime.timedelta | None = None,
+      index: ann_index.EmbeddingIndex | None = None,
+      measurements: measurements_lib.Measurements | None = None,
+      channel: str = DEFAULT_STATS_CHANNEL,
   ):
     """Constructor.
 
@@ -57,18 +166,152 @@ class AssociativeMemory:
       clock: a callable to get time when adding memories
       clock_step_size: sets the step size of the clock. If None, assumes precise
         time
+      index: optional approximate nearest neighbour index used by associative
+        retrieval. It is kept up to date as memories are added. If None then
+        associative retrieval always scans the whole memory bank.
+      measurements: the measurements object to publish the time writers spend
+        waiting for the write lock to.
+      channel: the channel to publish the lock wait times to.
     """
-    self._memory_bank_lock = threading.Lock()
+    self._write_lock = threading.Lock()
+    self._measurements = measurements
+    self._channel = channel
     self._embedder = sentence_embedder
     self._importance = (
         importance or importance_function.ConstantImportanceModel().importance)
 
-    self._memory_bank = pd.DataFrame(
-        columns=['text', 'time', 'tags', 'embedding', 'importance']
-    )
+    self._size = 0
+    self._text_column: list[str] = []
+    self._tags_column: list[tuple[str, ...]] = []
+    # Times are stored as integer nanoseconds since the epoch.
+    self._time_column = np.empty(0, dtype=np.int64)
+    self._importance_column = np.empty(0, dtype=np.float64)
+    # The time index: row numbers sorted by time (ties in insertion order), and
+    # their times in the same order.
+    self._rows_by_time = np.empty(0, dtype=np.int64)
+    self._sorted_times = np.empty(0, dtype=np.int64)
+    # The embedding block is allocated on the first add, once its width is
+    # known.
+    self._embedding_column: np.ndarray | None = None
+
     self._clock_now = clock
     self._interval = clock_step_size
     self._stored_hashes = set()
+    self._index = index
+    self._token_index = text_index.TokenIndex()
+    self._snapshot = self._make_snapshot()
+
+  @contextlib.contextmanager
+  def _write_locked(self) -> Iterator[None]:
+    """Holds the write lock, recording how long it took to acquire."""
+    start = time_lib.perf_counter()
+    with self._write_lock:
+      wait = time_lib.perf_counter() - start
+      yield
+    if self._measurements is not None:
+      self._measurements.publish_datum(
+          self._channel, {'lock_wait_seconds': wait}
+      )
+
+  def _make_snapshot(self) -> _Snapshot:
+    """Returns a snapshot of the current rows. Assumes lock is held."""
+    size = self._size
+    if self._embedding_column is None:
+      embedding = None
+    else:
+      embedding = self._embedding_column[:size]
+    return _Snapshot(
+        size=size,
+        text=self._text_column,
+        tags=self._tags_column,
+        time=self._time_column[:size],
+        importance=self._importance_column[:size],
+        embedding=embedding,
+        rows_by_time=self._rows_by_time[:size],
+        sorted_times=self._sorted_times[:size],
+    )
+
+  def _reserve(self, num_rows: int) -> None:
+    """Makes sure there is room for `num_rows` rows. Assumes lock is held."""
+    capacity = len(self._time_column)
+    if num_rows <= capacity:
+      return
+    new_capacity = max(num_rows, 2 * capacity, _INITIAL_CAPACITY)
+
+    time_column = np.empty(new_capacity, dtype=np.int64)
+    time_column[:self._size] = self._time_column[:self._size]
+    importance_column = np.empty(new_capacity, dtype=np.float64)
+    importance_column[:self._size] = self._importance_column[:self._size]
+    rows_by_time = np.empty(new_capacity, dtype=np.int64)
+    rows_by_time[:self._size] = self._rows_by_time[:self._size]
+    sorted_times = np.empty(new_capacity, dtype=np.int64)
+    sorted_times[:self._size] = self._sorted_times[:self._size]
+    if self._embedding_column is not None:
+      embedding_column = np.empty(
+          (new_capacity, self._embedding_column.shape[1]),
+          dtype=self._embedding_column.dtype,
+      )
+      embedding_column[:self._size] = self._embedding_column[:self._size]
+      self._embedding_column = embedding_column
+
+    self._time_column = time_column
+    self._importance_column = importance_column
+    self._rows_by_time = rows_by_time
+    self._sorted_times = sorted_times
+
+  def _append_row(
+      self,
+      text: str,
+      time: int,
+      tags: tuple[str, ...],
+      importance: float,
+      embedding: np.ndarray,
+  ) -> None:
+    """Writes a new row at the end of the columns. Assumes lock is held."""
+    embedding = np.ravel(embedding)
+    if self._embedding_column is None:
+      self._embedding_column = np.empty(
+          (len(self._time_column), embedding.shape[0]), dtype=np.float32
+      )
+    elif embedding.shape[0] != self._embedding_column.shape[1]:
+      raise ValueError(
+          f'Embedding of size {embedding.shape[0]} does not match the size of '
+          f'the embeddings already in memory ({self._embedding_column.shape[1]}'
+          ').'
+      )
+    self._reserve(self._size + 1)
+
+    row = self._size
+    self._embedding_column[row] = embedding
+    self._time_column[row] = time
+    self._importance_column[row] = importance
+    self._text_column.append(text)
+    self._tags_column.append(tags)
+    self._index_time(row, time)
+    self._token_index.add(row, text)
+    self._size += 1
+
+  def _index_time(self, row: int, time: int) -> None:
+    """Inserts a new row into the time index. Assumes lock is held."""
+    size = self._size
+    if not size or time >= self._sorted_times[size - 1]:
+      position = size
+    else:
+      # Out of order memory: shift later entries along to make room. This is
+      # done in copies, since published snapshots share the current buffers.
+      position = int(
+          np.searchsorted(self._sorted_times[:size], time, side='right')
+      )
+      sorted_times = np.empty_like(self._sorted_times)
+      sorted_times[:position] = self._sorted_times[:position]
+      sorted_times[position + 1:size + 1] = self._sorted_times[position:size]
+      rows_by_time = np.empty_like(self._rows_by_time)
+      rows_by_time[:position] = self._rows_by_time[:position]
+      rows_by_time[position + 1:size + 1] = self._rows_by_time[position:size]
+      self._sorted_times = sorted_times
+      self._rows_by_time = rows_by_time
+    self._sorted_times[position] = time
+    self._rows_by_time[position] = row
 
   def add(
       self,
@@ -77,7 +320,7 @@ class AssociativeMemory:
       timestamp: datetime.datetime | None = None,
       tags: Iterable[str] = (),
       importance: float | None = None,
-  ):
+  ) -> int:
     """Adds nonduplicated entries (time, text, tags, importance) to the memory.
 
     Args:
@@ -85,55 +328,259 @@ class AssociativeMemory:
       timestamp: the time of the memory
       tags: optional tags
       importance: optionally set the importance of the memory.
+
+    Returns:
+      1 if the memory was added, and 0 if it was already in memory.
     """
-    if importance is None:
-      importance = self._importance(text)
+    return self.extend(
+        [text], timestamp=timestamp, tags=tags, importance=importance
+    )
 
+  def extend(
+      self,
+      texts: Iterable[str],
+      *,
+      timestamp: datetime.datetime | None = None,
+      tags: Iterable[str] = (),
+      importance: float | None = None,
+  ) -> int:
+    """Adds the texts to the memory.
+
+    All the new texts are embedded together, in vectorized batches if the
+    embedder is an `embedders.BatchEmbedder`. Texts that are already in memory
+    are skipped without being embedded.
+
+    Args:
+      texts: list of strings to add to the memory
+      timestamp: the time of the memories, shared by all of them
+      tags: optional tags, shared by all the memories
+      importance: optionally set the importance of all the memories. If None
+        then the importance of each text is computed separately.
+
+    Returns:
+      The number of memories added, which excludes the texts that were already
+      in memory.
+    """
     if timestamp is None:
       timestamp = self._clock_now()
 
     _check_date_in_range(timestamp)
+    tags = tuple(tags)
 
-    # Remove all newline characters from memories.
-    text = text.replace('\n', ' ')
-
-    contents = {
-        'text': text,
-        'time': timestamp,
-        'tags': tuple(tags),
-        'importance': importance,
+    rows = {}
+    for text in texts:
+      text_importance = (
+          self._importance(text) if importance is None else importance
+      )
+      # Remove all newline characters from memories.
+      text = text.replace('\n', ' ')
+      hashed_contents = hash((text, timestamp, tags, text_importance))
+      rows.setdefault(hashed_contents, (text, text_importance))
+
+    # Skip memories that are already stored before embedding them. This check
+    # is lock free, so it is repeated under the write lock below.
+    rows = {
+        hashed_contents: row
+        for hashed_contents, row in rows.items()
+        if hashed_contents not in self._stored_hashes
     }
-    hashed_contents = hash(tuple(contents.values()))
-    derived = {'embedding': self._embedder(text)}
-    new_df = pd.Series(contents | derived).to_frame().T.infer_objects()
-
-    with self._memory_bank_lock:
-      if hashed_contents in self._stored_hashes:
-        return
-      self._memory_bank = pd.concat(
-          [self._memory_bank, new_df], ignore_index=True
+    if not rows:
+      return 0
+    embeddings = self._embed_texts([text for text, _ in rows.values()])
+
+    time = _to_nanoseconds(timestamp)
+    num_added = 0
+    with self._write_locked():
+      self._reserve(self._size + len(rows))
+      for (hashed_contents, (text, text_importance)), embedding in zip(
+          rows.items(), embeddings
+      ):
+        # Another thread may have added the same memory in the meantime.
+        if hashed_contents in self._stored_hashes:
+          continue
+        self._append_row(
+            text=text,
+            time=time,
+            tags=tags,
+            importance=text_importance,
+            embedding=embedding,
+        )
+        self._stored_hashes.add(hashed_contents)
+        num_added += 1
+      if self._index is not None:
+        self._index.update(self._embedding_column[:self._size])
+      self._snapshot = self._make_snapshot()
+    return num_added
+
+  def _embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+    """Returns a [len(texts), embedding_size] matrix of text embeddings."""
+    return embedders.embed_texts(self._embedder, texts)
+
+  def save(self, path: str) -> None:
+    """Saves the memory bank to a directory, see `load`.
+
+    The embeddings are saved as a `.npy` file, which `load` memory-maps, and
+    the other columns as a `.npz` file with one array per column. Text and tags
+    are stored as UTF-8 bytes. The embeddings are written first, so a save that
+    is interrupted while overwriting an earlier save of the same memory leaves
+    the earlier save intact.
+
+    Args:
+      path: the directory to save to. It is created if it does not exist.
+    """
+    snapshot = self._snapshot
+    size = snapshot.size
+    texts = snapshot.text[:size]
+    tags = snapshot.tags[:size]
+    os.makedirs(path, exist_ok=True)
+    if snapshot.embedding is not None:
+      _write_atomically(
+          os.path.join(path, _EMBEDDINGS_FILENAME),
+          lambda f: np.save(f, snapshot.embedding),
       )
-      self._stored_hashes.add(hashed_contents)
+    columns = {
+        'time': snapshot.time,
+        'importance': snapshot.importance,
+        'text': np.frombuffer(''.join(texts).encode('utf-8'), dtype=np.uint8),
+        'text_lengths': np.array([len(text) for text in texts], dtype=np.int64),
+        'tags': np.frombuffer(json.dumps(tags).encode('utf-8'), dtype=np.uint8),
+    }
+    _write_atomically(
+        os.path.join(path, _COLUMNS_FILENAME),
+        lambda f: np.savez(f, **columns),
+    )
 
-  def extend(
+  def load(self, path: str) -> None:
+    """Loads a memory bank saved by `save` into this memory, which is empty.
+
+    The embeddings are memory-mapped rather than read, and are only copied into
+    memory once new memories are added. The time and token indices are rebuilt,
+    as is the approximate nearest neighbour index if there is one.
+
+    Args:
+      path: the directory passed to `save`.
+
+    Raises:
+      ValueError: if this memory is not empty.
+    """
+    with np.load(os.path.join(path, _COLUMNS_FILENAME)) as columns:
+      time = columns['time']
+      importance = columns['importance']
+      all_text = columns['text'].tobytes().decode('utf-8')
+      text_lengths = columns['text_lengths']
+      tags = [
+          tuple(row_tags)
+          for row_tags in json.loads(columns['tags'].tobytes().decode('utf-8'))
+      ]
+    size = len(time)
+    ends = np.cumsum(text_lengths).tolist()
+    texts = [
+        all_text[start:end] for start, end in zip([0] + ends[:-1], ends)
+    ]
+    embeddings_path = os.path.join(path, _EMBEDDINGS_FILENAME)
+    if size:
+      # Loaded read-only with a capacity of `size`, so that the first new row
+      # copies the embeddings into a writable, growable block.
+      embedding = np.load(embeddings_path, mmap_mode='r')[:size]
+    else:
+      embedding = None
+    rows_by_time = np.argsort(time, kind='stable')
+    # Times are in nanoseconds, and datetimes have microsecond resolution.
+    timestamps = (
+        time.astype('datetime64[ns]').astype('datetime64[us]').tolist()
+    )
+    hashes = {
+        hash(row)
+        for row in zip(texts, timestamps, tags, importance.tolist())
+    }
+
+    with self._write_locked():
+      if self._size:
+        raise ValueError('Can only load into an empty memory.')
+      self._text_column = texts
+      self._tags_column = tags
+      self._time_column = time
+      self._importance_column = importance
+      self._embedding_column = embedding
+      self._rows_by_time = rows_by_time
+      self._sorted_times = time[rows_by_time]
+      self._stored_hashes = hashes
+      for row, text in enumerate(texts):
+        self._token_index.add(row, text)
+      self._size = size
+      if self._index is not None and embedding is not None:
+        self._index.update(embedding)
+      self._snapshot = self._make_snapshot()
+
+  def get_data_frame(self) -> pd.DataFrame:
+    """Returns a copy of the memory bank materialized as a data frame."""
+    snapshot = self._snapshot
+    size = snapshot.size
+    if snapshot.embedding is None:
+      embeddings = []
+    else:
+      embeddings = list(snapshot.embedding.copy())
+    return pd.DataFrame({
+        'text': snapshot.text[:size],
+        'time': snapshot.time.astype('datetime64[ns]'),
+        'tags': snapshot.tags[:size],
+        'embedding': pd.Series(embeddings, dtype=object),
+        'importance': snapshot.importance.copy(),
+    })
+
+  def _score_rows(
       self,
-      texts: Iterable[str],
-      **kwargs,
-  ):
-    """Adds the texts to the memory.
+      snapshot: _Snapshot,
+      x: np.ndarray,
+      rows: np.ndarray | None = None,
+      use_recency: bool = True,
+      use_importance: bool = True,
+  ) -> np.ndarray:
+    """Scores rows of the memory bank against an input vector x.
+
+    The score of a row is its cosine similarity to x, optionally plus a recency
+    bonus that decays by `_RECENCY_DECAY_PER_MINUTE` for each minute the memory
+    is older than the newest one, and optionally plus its importance.
 
     Args:
-      texts: list of strings to add to the memory
-      **kwargs: arguments to pass on to .add
+      snapshot: the snapshot of the memory bank to score.
+      x: The input vector, or a [num_queries, embedding_size] matrix of them.
+      rows: indices of the rows to score. If None then score every row.
+      use_recency: if true then weight similarity by recency
+      use_importance: if true then weight similarity by importance
+
+    Returns:
+      A float32 array with one score per row, or a [num_queries, num_rows]
+      matrix of scores if x is a matrix.
     """
-    for text in texts:
-      self.add(text, **kwargs)
+    x = np.asarray(x, dtype=np.float32)
+    if not snapshot.size or (rows is not None and not rows.size):
+      return np.empty(x.shape[:-1] + (0,), dtype=np.float32)
+    latest_time = snapshot.sorted_times[-1]
+    if rows is None:
+      embeddings = snapshot.embedding
+      times = snapshot.time
+      importance = snapshot.importance
+    else:
+      embeddings = snapshot.embedding[rows]
+      times = snapshot.time[rows]
+      importance = snapshot.importance[rows]
+
+    # A single matrix product over the contiguous embedding block.
+    scores = x @ embeddings.T
 
-  def get_data_frame(self):
-    with self._memory_bank_lock:
-      return self._memory_bank.copy()
+    if use_recency:
+      minutes_ago = (latest_time - times) / _NANOSECONDS_PER_MINUTE
+      scores += np.exp(
+          minutes_ago * np.log(_RECENCY_DECAY_PER_MINUTE), dtype=np.float32
+      )
+
+    if use_importance:
+      scores += importance.astype(np.float32)
+
+    return scores
 
-  def _get_top_k_cosine(self, x: np.ndarray, k: int):
+  def _get_top_k_cosine(self, x: np.ndarray, k: int) -> np.ndarray:
     """Returns the top k most cosine similar rows to an input vector x.
 
     Args:
@@ -141,22 +588,38 @@ class AssociativeMemory:
       k: The number of rows to return.
 
     Returns:
-      Rows, sorted by cosine similarity in descending order.
+      Row indices, sorted by cosine similarity in descending order.
     """
-    with self._memory_bank_lock:
-      cosine_similarities = self._memory_bank['embedding'].apply(
-          lambda y: np.dot(x, y)
-      )
-
-      # Sort the cosine similarities in descending order.
-      cosine_similarities.sort_values(ascending=False, inplace=True)
+    return self._get_top_k_similar_rows(
+        x, k, use_recency=False, use_importance=False
+    )
 
-      # Return the top k rows.
-      return self._memory_bank.iloc[cosine_similarities.head(k).index]
+  def _get_candidate_rows(
+      self, snapshot: _Snapshot, x: np.ndarray, k: int, use_recency: bool
+  ) -> np.ndarray | None:
+    """Returns the rows worth scoring for x, or None to score every row."""
+    if self._index is None:
+      return None
+    candidates = self._index.search(x)
+    if candidates is None:
+      return None
+    # The index may already include rows written after the snapshot.
+    candidates = candidates[candidates < snapshot.size]
+    if use_recency:
+      num_recent = max(k, _NUM_RECENT_CANDIDATES)
+      candidates = np.union1d(
+          candidates, snapshot.rows_by_time[-num_recent:]
+      )
+    return candidates
 
   def _get_top_k_similar_rows(
-      self, x, k: int, use_recency: bool = True, use_importance: bool = True
-  ):
+      self,
+      x,
+      k: int,
+      use_recency: bool = True,
+      use_importance: bool = True,
+      exact: bool = False,
+  ) -> np.ndarray:
     """Returns the top k most similar rows to an input vector x.
 
     Args:
@@ -164,73 +627,80 @@ class AssociativeMemory:
       k: The number of rows to return.
       use_recency: if true then weight similarity by recency
       use_importance: if true then weight similarity by importance
+      exact: if true then score every row even if there is an approximate
+        index.
 
     Returns:
-      Rows, sorted by cosine similarity in descending order.
+      Row indices, sorted by similarity score in descending order.
     """
-    with self._memory_bank_lock:
-      cosine_similarities = self._memory_bank['embedding'].apply(
-          lambda y: np.dot(x, y)
-      )
-
-      similarity_score = cosine_similarities
-
-      if use_recency:
-        max_time = self._memory_bank['time'].max()
-        discounted_time = self._memory_bank['time'].apply(
-            lambda y: 0.99 ** ((max_time - y) / datetime.timedelta(minutes=1))
-        )
-        similarity_score += discounted_time
-
-      if use_importance:
-        importance = self._memory_bank['importance']
-        similarity_score += importance
-
-      # Sort the similarities in descending order.
-      similarity_score.sort_values(ascending=False, inplace=True)
-
-      # Return the top k rows.
-      return self._memory_bank.iloc[similarity_score.head(k).index]
-
-  def _get_k_recent(self, k: int):
-    with self._memory_bank_lock:
-      recency = self._memory_bank['time'].sort_values(ascending=False)
-      return self._memory_bank.iloc[recency.head(k).index]
-
-  def _pd_to_text(
+    snapshot = self._snapshot
+    if exact:
+      candidates = None
+    else:
+      candidates = self._get_candidate_rows(snapshot, x, k, use_recency)
+    scores = self._score_rows(
+        snapshot,
+        x,
+        rows=candidates,
+        use_recency=use_recency,
+        use_importance=use_importance,
+    )
+    top_k = _top_k(scores, k)
+    if candidates is None:
+      return top_k
+    return candidates[top_k]
+
+  def _get_k_recent(self, k: int) -> np.ndarray:
+    """Returns the rows of the k latest memories, sorted by time."""
+    snapshot = self._snapshot
+    return snapshot.rows_by_time[max(0, snapshot.size - k):].copy()
+
+  def _get_time_interval(self, time_from: int, time_until: int) -> np.ndarray:
+    """Returns the rows with time_from <= time <= time_until, sorted by time."""
+    snapshot = self._snapshot
+    start = np.searchsorted(snapshot.sorted_times, time_from, side='left')
+    end = np.searchsorted(snapshot.sorted_times, time_until, side='right')
+    return snapshot.rows_by_time[start:end].copy()
+
+  def _rows_to_text(
       self,
-      data: pd.DataFrame,
+      rows: np.ndarray,
       add_time: bool = False,
       sort_by_time: bool = True,
-  ):
-    """Formats a dataframe into list of strings.
+  ) -> list[str]:
+    """Formats rows of the memory bank into a list of strings.
 
     Args:
-      data: the dataframe to process
+      rows: indices of the rows to format
       add_time: whether to add time
       sort_by_time: whether to sort by time
 
     Returns:
       A list of strings, one for each memory
     """
+    # Rows are never modified, so any snapshot taken after the rows were
+    # retrieved contains them.
+    snapshot = self._snapshot
+    times = snapshot.time[rows]
+    texts = [snapshot.text[row] for row in rows]
+
     if sort_by_time:
-      data = data.sort_values('time', ascending=True)
-
-    if add_time and not data.empty:
-      if self._interval:
-        this_time = data['time']
-        next_time = data['time'] + self._interval
-
-        interval = this_time.dt.strftime(
-            '%d %b %Y [%H:%M:%S  '
-        ) + next_time.dt.strftime('- %H:%M:%S]: ')
-        output = interval + data['text']
-      else:
-        output = data['time'].dt.strftime('[%d %b %Y %H:%M:%S] ') + data['text']
+      order = np.argsort(times, kind='stable')
+      times = times[order]
+      texts = [texts[i] for i in order]
+
+    if not add_time or not texts:
+      return texts
+
+    this_time = pd.DatetimeIndex(times.astype('datetime64[ns]'))
+    if self._interval:
+      next_time = this_time + self._interval
+      prefixes = this_time.strftime('%d %b %Y [%H:%M:%S  ') + next_time.strftime(
+          '- %H:%M:%S]: '
+      )
     else:
-      output = data['text']
-
-    return output.tolist()
+      prefixes = this_time.strftime('[%d %b %Y %H:%M:%S] ')
+    return [prefix + text for prefix, text in zip(prefixes, texts)]
 
   def retrieve_associative(
       self,
@@ -240,6 +710,7 @@ class AssociativeMemory:
       use_importance: bool = True,
       add_time: bool = True,
       sort_by_time: bool = True,
+      exact: bool = False,
   ):
     """Retrieve memories associatively.
 
@@ -250,20 +721,81 @@ class AssociativeMemory:
       use_importance: whether to use importance for retrieval
       add_time: whether to add time stamp to the output
       sort_by_time: whether to sort the result by time
+      exact: whether to scan the whole memory bank even if the memory has an
+        approximate nearest neighbour index
 
     Returns:
       List of strings corresponding to memories
     """
-    query_embedding = self._embedder(query)
+    query_embedding = np.ravel(self._embedder(query))
 
-    data = self._get_top_k_similar_rows(
+    rows = self._get_top_k_similar_rows(
         query_embedding,
         k,
         use_recency=use_recency,
         use_importance=use_importance,
+        exact=exact,
     )
 
-    return self._pd_to_text(data, add_time=add_time, sort_by_time=sort_by_time)
+    return self._rows_to_text(
+        rows, add_time=add_time, sort_by_time=sort_by_time
+    )
+
+  def retrieve_associative_batch(
+      self,
+      queries: Sequence[str],
+      k: int = 1,
+      use_recency: bool = True,
+      use_importance: bool = True,
+      add_time: bool = True,
+      sort_by_time: bool = True,
+      exact: bool = False,
+  ) -> list[list[str]]:
+    """Retrieve memories associatively for several queries at once.
+
+    All queries are scored against the memory bank with a single matrix
+    product, which is much cheaper than calling `retrieve_associative` once per
+    query.
+
+    Args:
+      queries: strings to use for retrieval
+      k: how many memories to retrieve per query
+      use_recency: whether to use timestamps to weight by recency or not
+      use_importance: whether to use importance for retrieval
+      add_time: whether to add time stamp to the output
+      sort_by_time: whether to sort each result by time
+      exact: whether to scan the whole memory bank even if the memory has an
+        approximate nearest neighbour index
+
+    Returns:
+      For each query, the list of strings corresponding to its memories, i.e.
+      the same as `retrieve_associative` would return for that query.
+    """
+    if not queries:
+      return []
+    query_embeddings = self._embed_texts(queries)
+    if exact or self._index is None:
+      scores = self._score_rows(
+          self._snapshot,
+          query_embeddings,
+          use_recency=use_recency,
+          use_importance=use_importance,
+      )
+      rows_per_query = _top_k(scores, k)
+    else:
+      rows_per_query = [
+          self._get_top_k_similar_rows(
+              query_embedding,
+              k,
+              use_recency=use_recency,
+              use_importance=use_importance,
+          )
+          for query_embedding in query_embeddings
+      ]
+    return [
+        self._rows_to_text(rows, add_time=add_time, sort_by_time=sort_by_time)
+        for rows in rows_per_query
+    ]
 
   def retrieve_by_regex(
       self,
@@ -273,6 +805,9 @@ class AssociativeMemory:
   ):
     """Retrieve memories matching a regex.
 
+    Regexes that search for a literal string, e.g. a player name, are answered
+    from the token index, and only other patterns scan every memory.
+
     Args:
       regex: a regex to match
       add_time: whether to add time stamp to the output
@@ -281,10 +816,29 @@ class AssociativeMemory:
     Returns:
       List of strings corresponding to memories
     """
-    with self._memory_bank_lock:
-      data = self._memory_bank[self._memory_bank['text'].str.contains(regex)]
+    literal = text_index.literal_from_regex(regex)
+    snapshot = self._snapshot
+    if literal is None:
+      candidates = None
+    else:
+      candidates = self._token_index.candidate_rows(literal)
+    texts = snapshot.text
+    if candidates is None:
+      candidates = range(snapshot.size)
+    else:
+      # The index may already include rows written after the snapshot.
+      candidates = candidates[candidates < snapshot.size]
+
+    if literal is None:
+      pattern = re.compile(regex)
+      rows = [row for row in candidates if pattern.search(texts[row])]
+    else:
+      rows = [row for row in candidates if literal in texts[row]]
+    rows = np.array(rows, dtype=np.int64)
 
-    return self._pd_to_text(data, add_time=add_time, sort_by_time=sort_by_time)
+    return self._rows_to_text(
+        rows, add_time=add_time, sort_by_time=sort_by_time
+    )
 
   def retrieve_time_interval(
       self,
@@ -302,14 +856,11 @@ class AssociativeMemory:
     Returns:
       List of strings corresponding to memories
     """
+    rows = self._get_time_interval(
+        _to_nanoseconds(time_from), _to_nanoseconds(time_until)
+    )
 
-    with self._memory_bank_lock:
-      data = self._memory_bank[
-          (self._memory_bank['time'] >= time_from)
-          & (self._memory_bank['time'] <= time_until)
-      ]
-
-    return self._pd_to_text(data, add_time=add_time, sort_by_time=True)
+    return self._rows_to_text(rows, add_time=add_time, sort_by_time=False)
 
   def retrieve_recent(
       self,
@@ -325,9 +876,29 @@ class AssociativeMemory:
     Returns:
       List of strings corresponding to memories
     """
-    data = self._get_k_recent(k)
+    rows = self._get_k_recent(k)
+
+    return self._rows_to_text(rows, add_time=add_time, sort_by_time=False)
 
-    return self._pd_to_text(data, add_time=add_time, sort_by_time=True)
+  def retrieve_added_after(
+      self,
+      num_memories: int,
+      add_time: bool = False,
+  ) -> list[str]:
+    """Retrieve the memories added after the first `num_memories`.
+
+    Since memories cannot be deleted, passing the length of the memory at some
+    point returns the memories added since then.
+
+    Args:
+      num_memories: the number of memories to skip, in order of addition.
+      add_time: whether to add time stamp to the output
+
+    Returns:
+      List of strings corresponding to memories, sorted by time
+    """
+    rows = np.arange(num_memories, self._snapshot.size, dtype=np.int64)
+    return self._rows_to_text(rows, add_time=add_time)
 
   def retrieve_recent_with_importance(
       self,
@@ -343,11 +914,12 @@ class AssociativeMemory:
     Returns:
       List of strings corresponding to memories
     """
-    data = self._get_k_recent(k)
+    rows = self._get_k_recent(k)
+    importance = self._snapshot.importance[rows]
 
     return (
-        self._pd_to_text(data, add_time=add_time, sort_by_time=True),
-        list(data['importance']),
+        self._rows_to_text(rows, add_time=add_time, sort_by_time=False),
+        importance.tolist(),
     )
 
   def __len__(self):
@@ -356,5 +928,4 @@ class AssociativeMemory:
     Since memories cannot be deleted, the length cannot decrease, and can be
     used to check if the contents of the memory bank have changed.
     """
-    with self._memory_bank_lock:
-      return len(self._memory_bank)
+    return self._snapshot.size
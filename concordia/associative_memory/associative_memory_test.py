@@ -0,0 +1,292 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for associative_memory.py."""
+
+from concurrent import futures
+import datetime
+import tempfile
+import zlib
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from concordia.associative_memory import associative_memory
+from concordia.associative_memory import embedders
+from concordia.utils import measurements as measurements_lib
+import numpy as np
+
+_START = datetime.datetime(2024, 1, 1)
+
+
+def _embedder(text: str) -> np.ndarray:
+  """Deterministic random unit-norm embedding of the text."""
+  rng = np.random.default_rng(zlib.crc32(text.encode()))
+  embedding = rng.standard_normal(16)
+  return embedding / np.linalg.norm(embedding)
+
+
+def _make_memory(num_memories: int) -> associative_memory.AssociativeMemory:
+  memory = associative_memory.AssociativeMemory(_embedder, clock=lambda: _START)
+  for i in range(num_memories):
+    memory.add(
+        f'memory number {i}',
+        timestamp=_START + datetime.timedelta(minutes=i),
+        importance=(i % 7) / 7,
+    )
+  return memory
+
+
+class AssociativeMemoryTest(parameterized.TestCase):
+
+  def test_add_grows_storage(self):
+    memory = _make_memory(1000)
+    self.assertLen(memory, 1000)
+    self.assertEqual(
+        memory.retrieve_recent(k=2), ['memory number 998', 'memory number 999']
+    )
+
+  def test_duplicates_are_ignored(self):
+    memory = associative_memory.AssociativeMemory(_embedder)
+    self.assertEqual(memory.add('a memory', timestamp=_START), 1)
+    self.assertEqual(memory.add('a memory', timestamp=_START), 0)
+    later = _START + datetime.timedelta(minutes=1)
+    self.assertEqual(memory.extend(['a memory', 'a memory'], timestamp=later), 1)
+    self.assertLen(memory, 2)
+
+  def test_extend_embeds_in_batches(self):
+    batch_sizes = []
+
+    def embed_batch(texts):
+      batch_sizes.append(len(texts))
+      return np.stack([_embedder(text) for text in texts])
+
+    memory = associative_memory.AssociativeMemory(
+        embedders.FunctionBatchEmbedder(embed_batch)
+    )
+    texts = [f'memory {i}' for i in range(600)]
+    memory.extend(texts + texts[:10], timestamp=_START)
+    memory.extend(texts[:100], timestamp=_START)
+    self.assertLen(memory, 600)
+    self.assertEqual(batch_sizes, [256, 256, 88])
+    np.testing.assert_allclose(
+        memory.get_data_frame()['embedding'].iloc[300],
+        _embedder('memory 300'),
+        rtol=1e-6,
+    )
+
+  def test_get_data_frame(self):
+    memory = _make_memory(10)
+    data = memory.get_data_frame()
+    self.assertEqual(
+        list(data.columns), ['text', 'time', 'tags', 'embedding', 'importance']
+    )
+    self.assertLen(data, 10)
+    self.assertEqual(data['time'].iloc[3], _START + datetime.timedelta(minutes=3))
+    np.testing.assert_allclose(
+        data['embedding'].iloc[3], _embedder('memory number 3')
+    )
+
+  def test_save_and_load(self):
+    memory = _make_memory(100)
+    memory.add('ünïcode memory', timestamp=_START, tags=('a', 'b'))
+    memory.add('an earlier memory', timestamp=_START - datetime.timedelta(1))
+    path = self.enter_context(tempfile.TemporaryDirectory())
+    memory.save(path)
+
+    loaded = associative_memory.AssociativeMemory(_embedder)
+    loaded.load(path)
+    self.assertLen(loaded, len(memory))
+    self.assertTrue(memory.get_data_frame().equals(loaded.get_data_frame()))
+    self.assertEqual(
+        loaded.retrieve_associative('memory number 42', k=3),
+        memory.retrieve_associative('memory number 42', k=3),
+    )
+    self.assertEqual(loaded.retrieve_recent(k=2), memory.retrieve_recent(k=2))
+    self.assertEqual(
+        loaded.retrieve_by_regex('ünïcode'), memory.retrieve_by_regex('ünïcode')
+    )
+
+    # Duplicates of saved memories are still ignored, and new memories can be
+    # added after the loaded ones.
+    loaded.add('ünïcode memory', timestamp=_START, tags=('a', 'b'))
+    self.assertLen(loaded, len(memory))
+    loaded.add('a new memory', timestamp=_START + datetime.timedelta(days=1))
+    self.assertEqual(loaded.retrieve_recent(k=1), ['a new memory'])
+
+  def test_load_into_non_empty_memory_fails(self):
+    path = self.enter_context(tempfile.TemporaryDirectory())
+    _make_memory(3).save(path)
+    with self.assertRaises(ValueError):
+      _make_memory(1).load(path)
+
+  def test_save_and_load_empty_memory(self):
+    path = self.enter_context(tempfile.TemporaryDirectory())
+    associative_memory.AssociativeMemory(_embedder).save(path)
+    loaded = associative_memory.AssociativeMemory(_embedder)
+    loaded.load(path)
+    self.assertEmpty(loaded)
+    loaded.add('a memory', timestamp=_START)
+    self.assertEqual(loaded.retrieve_recent(k=1), ['a memory'])
+
+  def test_empty_memory(self):
+    memory = associative_memory.AssociativeMemory(_embedder)
+    self.assertEmpty(memory.get_data_frame())
+    self.assertEqual(memory.retrieve_associative('query', k=3), [])
+    self.assertEqual(memory.retrieve_recent(k=3), [])
+    self.assertEqual(memory.retrieve_by_regex('query'), [])
+
+  def test_retrieve_time_interval(self):
+    memory = _make_memory(10)
+    retrieved = memory.retrieve_time_interval(
+        _START + datetime.timedelta(minutes=2),
+        _START + datetime.timedelta(minutes=4),
+        add_time=True,
+    )
+    self.assertEqual(
+        retrieved,
+        [
+            '[01 Jan 2024 00:02:00] memory number 2',
+            '[01 Jan 2024 00:03:00] memory number 3',
+            '[01 Jan 2024 00:04:00] memory number 4',
+        ],
+    )
+
+  def test_time_index_handles_out_of_order_memories(self):
+    memory = associative_memory.AssociativeMemory(_embedder)
+    for minute in (0, 10, 5, 20, 15, 5):
+      memory.add(
+          f'minute {minute}',
+          timestamp=_START + datetime.timedelta(minutes=minute),
+          tags=[str(len(memory))],
+      )
+    self.assertEqual(
+        memory.retrieve_time_interval(
+            _START + datetime.timedelta(minutes=5),
+            _START + datetime.timedelta(minutes=15),
+        ),
+        ['minute 5', 'minute 5', 'minute 10', 'minute 15'],
+    )
+    self.assertEqual(
+        memory.retrieve_recent(k=3), ['minute 10', 'minute 15', 'minute 20']
+    )
+
+  def test_retrieve_added_after(self):
+    memory = associative_memory.AssociativeMemory(_embedder)
+    for minute in (0, 10, 5):
+      memory.add(
+          f'minute {minute}',
+          timestamp=_START + datetime.timedelta(minutes=minute),
+      )
+    self.assertEqual(
+        memory.retrieve_added_after(1), ['minute 5', 'minute 10']
+    )
+    self.assertEqual(memory.retrieve_added_after(3), [])
+
+  def test_retrieve_associative_finds_exact_match(self):
+    memory = _make_memory(100)
+    retrieved = memory.retrieve_associative(
+        'memory number 42',
+        k=1,
+        use_recency=False,
+        use_importance=False,
+        add_time=False,
+    )
+    self.assertEqual(retrieved, ['memory number 42'])
+
+  @parameterized.product(
+      use_recency=(True, False),
+      use_importance=(True, False),
+  )
+  def test_retrieve_associative_matches_reference(
+      self, use_recency, use_importance
+  ):
+    memory = _make_memory(300)
+    data = memory.get_data_frame()
+    query = 'number 123'
+    scores = data['embedding'].apply(lambda y: np.dot(_embedder(query), y))
+    if use_recency:
+      max_time = data['time'].max()
+      scores += data['time'].apply(
+          lambda y: 0.99 ** ((max_time - y) / datetime.timedelta(minutes=1))
+      )
+    if use_importance:
+      scores += data['importance']
+    expected = data['text'][scores.sort_values(ascending=False).index[:5]]
+
+    retrieved = memory.retrieve_associative(
+        query,
+        k=5,
+        use_recency=use_recency,
+        use_importance=use_importance,
+        add_time=False,
+        sort_by_time=False,
+    )
+    self.assertEqual(retrieved, list(expected))
+
+  def test_retrieve_associative_batch_matches_single_queries(self):
+    memory = _make_memory(200)
+    queries = ['number 7', 'memory 150', 'something else entirely']
+    expected = [memory.retrieve_associative(query, k=4) for query in queries]
+    self.assertEqual(memory.retrieve_associative_batch(queries, k=4), expected)
+
+  def test_reads_are_consistent_during_writes(self):
+    memory = associative_memory.AssociativeMemory(_embedder)
+
+    def write(start):
+      for i in range(start, start + 500):
+        # Every other memory arrives out of time order.
+        memory.add(
+            f'memory {i}',
+            timestamp=_START + datetime.timedelta(minutes=i * (-1) ** i),
+        )
+
+    def read():
+      for _ in range(100):
+        num_memories = len(memory)
+        recent = memory.retrieve_recent(k=num_memories)
+        self.assertLen(recent, num_memories)
+        matches = memory.retrieve_by_regex('memory', add_time=False)
+        self.assertGreaterEqual(len(matches), num_memories)
+        self.assertLen(set(matches), len(matches))
+        self.assertGreaterEqual(
+            len(memory.retrieve_associative('memory 3', k=5)),
+            min(5, num_memories),
+        )
+
+    with futures.ThreadPoolExecutor(max_workers=6) as executor:
+      tasks = [executor.submit(write, start) for start in (0, 500)]
+      tasks += [executor.submit(read) for _ in range(4)]
+      for task in tasks:
+        task.result()
+    self.assertLen(memory, 1000)
+
+  def test_lock_wait_is_published(self):
+    measurements = measurements_lib.Measurements()
+    memory = associative_memory.AssociativeMemory(
+        _embedder, measurements=measurements
+    )
+    memory.extend(['one', 'two'])
+    memory.add('three')
+
+    stats = []
+    measurements.get_channel(
+        associative_memory.DEFAULT_STATS_CHANNEL
+    ).subscribe(on_next=stats.append)
+    self.assertLen(stats, 2)
+    for datum in stats:
+      self.assertGreaterEqual(datum['lock_wait_seconds'], 0.0)
+
+
+if __name__ == '__main__':
+  absltest.main()
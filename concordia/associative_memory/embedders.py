@@ -0,0 +1,101 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Text embedders for associative memory.
+
+A plain embedder is any callable mapping one string to a vector. Embedders that
+can embed many strings in one vectorized call (e.g. a single forward pass of a
+sentence transformer) should subclass `BatchEmbedder`, which `embed_texts` uses
+to embed whole batches at once.
+"""
+
+import abc
+from collections.abc import Callable, Sequence
+
+import numpy as np
+
+# Maximum number of texts passed to a batch embedder in one call.
+DEFAULT_CHUNK_SIZE = 256
+
+
+class BatchEmbedder(metaclass=abc.ABCMeta):
+  """An embedder that embeds many texts in one call.
+
+  Instances can still be called on a single text, so they can be used wherever
+  a plain `Callable[[str], np.ndarray]` embedder is expected.
+  """
+
+  @abc.abstractmethod
+  def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+    """Embeds a batch of texts.
+
+    Args:
+      texts: the texts to embed.
+
+    Returns:
+      A [len(texts), embedding_size] matrix, one row per text.
+    """
+    raise NotImplementedError
+
+  def __call__(self, text: str) -> np.ndarray:
+    return self.embed_batch([text])[0]
+
+
+class FunctionBatchEmbedder(BatchEmbedder):
+  """A batch embedder backed by a function that embeds a list of texts.
+
+  For example, to embed with a sentence transformer:
+
+    embedder = FunctionBatchEmbedder(
+        lambda texts: st_model.encode(texts, show_progress_bar=False))
+  """
+
+  def __init__(self, embed_batch_fn: Callable[[list[str]], np.ndarray]):
+    """Constructor.
+
+    Args:
+      embed_batch_fn: maps a list of texts to a [len(texts), embedding_size]
+        matrix of their embeddings.
+    """
+    self._embed_batch_fn = embed_batch_fn
+
+  def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+    return np.asarray(self._embed_batch_fn(list(texts)))
+
+
+def embed_texts(
+    embedder: Callable[[str], np.ndarray],
+    texts: Sequence[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> np.ndarray:
+  """Embeds texts, in vectorized chunks if the embedder supports batches.
+
+  Args:
+    embedder: the embedder to use. If it is a `BatchEmbedder` then the texts are
+      embedded in chunks of at most `chunk_size`, otherwise the embedder is
+      called once per text.
+    texts: the texts to embed. Must not be empty.
+    chunk_size: maximum number of texts per call to a batch embedder.
+
+  Returns:
+    A [len(texts), embedding_size] matrix, one row per text.
+  """
+  if isinstance(embedder, BatchEmbedder):
+    chunks = []
+    for start in range(0, len(texts), chunk_size):
+      chunk = texts[start:start + chunk_size]
+      chunks.append(np.reshape(embedder.embed_batch(chunk), (len(chunk), -1)))
+    return np.concatenate(chunks)
+  return np.stack([np.ravel(embedder(text)) for text in texts])
@@ -0,0 +1,241 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""A content-addressed cache for text embeddings.
+
+Simulations embed the same strings over and over, e.g. shared memories given
+to every player, scene markers and the queries components issue every step.
+`CachedEmbedder` wraps any embedder and keys embeddings by a hash of the text.
+Recently used embeddings are kept in an in-memory LRU tier. Optionally, every
+embedding is also appended to an on-disk tier which is memory-mapped on read
+and survives process restarts.
+"""
+
+import collections
+from collections.abc import Callable, Sequence
+import hashlib
+import json
+import os
+import threading
+
+from concordia.associative_memory import embedders
+from concordia.utils import measurements as measurements_lib
+import numpy as np
+
+DEFAULT_STATS_CHANNEL = 'embedding_cache_stats'
+DEFAULT_STATS_INTERVAL = 1000
+
+_KEY_SIZE = 16
+_KEYS_FILENAME = 'keys.bin'
+_EMBEDDINGS_FILENAME = 'embeddings.f32'
+_METADATA_FILENAME = 'metadata.json'
+
+
+def _text_key(text: str) -> bytes:
+  return hashlib.blake2b(text.encode('utf-8'), digest_size=_KEY_SIZE).digest()
+
+
+class _DiskTier:
+  """Append-only embedding store in a directory, memory-mapped for reads.
+
+  Embeddings are appended as raw float32 rows to one file and their keys to
+  another, embedding first. After a crash the store is truncated to the rows
+  present in both files, so it is always consistent. The store supports a
+  single writing process at a time.
+  """
+
+  def __init__(self, directory: str):
+    os.makedirs(directory, exist_ok=True)
+    self._keys_path = os.path.join(directory, _KEYS_FILENAME)
+    self._embeddings_path = os.path.join(directory, _EMBEDDINGS_FILENAME)
+    self._metadata_path = os.path.join(directory, _METADATA_FILENAME)
+
+    self._embedding_size = None
+    if os.path.exists(self._metadata_path):
+      with open(self._metadata_path) as f:
+        self._embedding_size = json.load(f)['embedding_size']
+
+    self._rows: dict[bytes, int] = {}
+    self._num_rows = 0
+    if self._embedding_size is not None and os.path.exists(self._keys_path):
+      with open(self._keys_path, 'rb') as f:
+        keys = f.read()
+      row_bytes = 4 * self._embedding_size
+      num_rows = min(
+          len(keys) // _KEY_SIZE,
+          os.path.getsize(self._embeddings_path) // row_bytes,
+      )
+      for row in range(num_rows):
+        self._rows[keys[row * _KEY_SIZE:(row + 1) * _KEY_SIZE]] = row
+      self._num_rows = num_rows
+      # Drop any partially written rows.
+      with open(self._keys_path, 'r+b') as f:
+        f.truncate(num_rows * _KEY_SIZE)
+      with open(self._embeddings_path, 'r+b') as f:
+        f.truncate(num_rows * row_bytes)
+
+    self._mapped: np.ndarray | None = None
+
+  def get(self, key: bytes) -> np.ndarray | None:
+    row = self._rows.get(key)
+    if row is None:
+      return None
+    if self._mapped is None or row >= len(self._mapped):
+      # Remap to cover the rows appended since the last mapping.
+      self._mapped = np.memmap(
+          self._embeddings_path,
+          dtype=np.float32,
+          mode='r',
+          shape=(self._num_rows, self._embedding_size),
+      )
+    return np.array(self._mapped[row])
+
+  def put(self, key: bytes, embedding: np.ndarray) -> None:
+    if key in self._rows:
+      return
+    embedding = np.ravel(embedding).astype(np.float32)
+    if self._embedding_size is None:
+      self._embedding_size = len(embedding)
+      with open(self._metadata_path, 'w') as f:
+        json.dump({'embedding_size': self._embedding_size}, f)
+    elif len(embedding) != self._embedding_size:
+      raise ValueError(
+          f'Embedding of size {len(embedding)} does not match the size of the '
+          f'embeddings in the cache ({self._embedding_size}).'
+      )
+    with open(self._embeddings_path, 'ab') as f:
+      f.write(embedding.tobytes())
+    with open(self._keys_path, 'ab') as f:
+      f.write(key)
+    self._rows[key] = self._num_rows
+    self._num_rows += 1
+
+
+class CachedEmbedder(embedders.BatchEmbedder):
+  """Wraps an embedder with a cache keyed by a hash of the text."""
+
+  def __init__(
+      self,
+      embedder: Callable[[str], np.ndarray],
+      *,
+      max_size: int = 100_000,
+      cache_dir: str | None = None,
+      measurements: measurements_lib.Measurements | None = None,
+      channel: str = DEFAULT_STATS_CHANNEL,
+      stats_interval: int = DEFAULT_STATS_INTERVAL,
+  ):
+    """Constructor.
+
+    Args:
+      embedder: the embedder to cache. If it is an `embedders.BatchEmbedder`
+        then cache misses are embedded together in batches.
+      max_size: maximum number of embeddings in the in-memory LRU tier.
+      cache_dir: if not None, embeddings are also persisted to this directory
+        and reused by later processes that use the same directory.
+      measurements: the measurements object to publish the number of cache
+        hits and misses so far to, see `publish_stats`.
+      channel: the channel to publish the statistics to.
+      stats_interval: the statistics are published each time this many more
+        texts have been looked up. Embedding is on hot paths, so publishing on
+        every lookup would flood the channel.
+    """
+    self._embedder = embedder
+    self._max_size = max_size
+    self._memory_tier: collections.OrderedDict[bytes, np.ndarray] = (
+        collections.OrderedDict()
+    )
+    self._disk_tier = _DiskTier(cache_dir) if cache_dir else None
+    self._lock = threading.Lock()
+    self._measurements = measurements
+    self._channel = channel
+    self._stats_interval = stats_interval
+    self._hits = 0
+    self._misses = 0
+    self._lookups_since_publish = 0
+
+  def publish_stats(self) -> None:
+    """Publishes the number of cache hits and misses so far, and the hit rate."""
+    with self._lock:
+      self._lookups_since_publish = 0
+      hits, misses = self._hits, self._misses
+    if self._measurements is not None:
+      self._measurements.publish_datum(
+          self._channel,
+          {
+              'cache_hits': hits,
+              'cache_misses': misses,
+              'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+          },
+      )
+
+  def _count(self, num_hits: int, num_misses: int) -> bool:
+    """Counts lookups and returns whether the stats are due. Assumes lock."""
+    self._hits += num_hits
+    self._misses += num_misses
+    self._lookups_since_publish += num_hits + num_misses
+    return self._lookups_since_publish >= self._stats_interval
+
+  def _lookup(self, key: bytes) -> np.ndarray | None:
+    """Returns the cached embedding for a key. Assumes lock is held."""
+    embedding = self._memory_tier.get(key)
+    if embedding is not None:
+      self._memory_tier.move_to_end(key)
+      return embedding
+    if self._disk_tier is not None:
+      embedding = self._disk_tier.get(key)
+      if embedding is not None:
+        self._store_in_memory(key, embedding)
+    return embedding
+
+  def _store_in_memory(self, key: bytes, embedding: np.ndarray) -> None:
+    """Adds an embedding to the LRU tier. Assumes lock is held."""
+    self._memory_tier[key] = embedding
+    self._memory_tier.move_to_end(key)
+    while len(self._memory_tier) > self._max_size:
+      self._memory_tier.popitem(last=False)
+
+  def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+    if not texts:
+      return np.empty((0, 0), dtype=np.float32)
+    keys = [_text_key(text) for text in texts]
+    embeddings: list[np.ndarray | None] = [None] * len(texts)
+    missing: dict[bytes, list[int]] = {}
+    with self._lock:
+      for i, key in enumerate(keys):
+        embeddings[i] = self._lookup(key)
+        if embeddings[i] is None:
+          missing.setdefault(key, []).append(i)
+
+    if missing:
+      positions = list(missing.values())
+      new_embeddings = embedders.embed_texts(
+          self._embedder, [texts[indices[0]] for indices in positions]
+      )
+      with self._lock:
+        for key, indices, embedding in zip(
+            missing, positions, new_embeddings
+        ):
+          self._store_in_memory(key, embedding)
+          if self._disk_tier is not None:
+            self._disk_tier.put(key, embedding)
+          for i in indices:
+            embeddings[i] = embedding
+
+    num_misses = sum(len(indices) for indices in missing.values())
+    with self._lock:
+      stats_due = self._count(len(texts) - num_misses, num_misses)
+    if stats_due:
+      self.publish_stats()
+    return np.stack(embeddings)
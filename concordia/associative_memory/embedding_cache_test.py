@@ -0,0 +1,105 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for embedding_cache.py."""
+
+import tempfile
+import zlib
+
+from absl.testing import absltest
+from concordia.associative_memory import embedding_cache
+from concordia.utils import measurements as measurements_lib
+import numpy as np
+
+
+class _CountingEmbedder:
+
+  def __init__(self):
+    self.calls = []
+
+  def __call__(self, text: str) -> np.ndarray:
+    self.calls.append(text)
+    rng = np.random.default_rng(zlib.crc32(text.encode()))
+    return rng.standard_normal(8).astype(np.float32)
+
+
+class CachedEmbedderTest(absltest.TestCase):
+
+  def test_repeated_texts_are_embedded_once(self):
+    embedder = _CountingEmbedder()
+    measurements = measurements_lib.Measurements()
+    cached = embedding_cache.CachedEmbedder(
+        embedder, measurements=measurements
+    )
+    first = cached('some text')
+    second = cached('some text')
+    np.testing.assert_array_equal(first, second)
+    self.assertEqual(embedder.calls, ['some text'])
+
+    stats = []
+    measurements.get_channel(embedding_cache.DEFAULT_STATS_CHANNEL).subscribe(
+        on_next=stats.append
+    )
+    self.assertEmpty(stats)
+    cached.publish_stats()
+    self.assertEqual(
+        stats, [{'cache_hits': 1, 'cache_misses': 1, 'hit_rate': 0.5}]
+    )
+
+  def test_stats_are_published_periodically(self):
+    measurements = measurements_lib.Measurements()
+    cached = embedding_cache.CachedEmbedder(
+        _CountingEmbedder(), measurements=measurements, stats_interval=4
+    )
+    for i in range(10):
+      cached(f'text {i % 2}')
+
+    stats = []
+    measurements.get_channel(embedding_cache.DEFAULT_STATS_CHANNEL).subscribe(
+        on_next=stats.append
+    )
+    self.assertEqual(
+        stats,
+        [
+            {'cache_hits': 2, 'cache_misses': 2, 'hit_rate': 0.5},
+            {'cache_hits': 6, 'cache_misses': 2, 'hit_rate': 0.75},
+        ],
+    )
+
+  def test_least_recently_used_entries_are_evicted(self):
+    embedder = _CountingEmbedder()
+    cached = embedding_cache.CachedEmbedder(embedder, max_size=2)
+    cached.embed_batch(['a', 'b'])
+    cached('a')
+    cached('c')  # Evicts 'b'.
+    cached.embed_batch(['a', 'b'])
+    self.assertEqual(embedder.calls, ['a', 'b', 'c', 'b'])
+
+  def test_disk_tier_survives_restarts(self):
+    cache_dir = self.enter_context(tempfile.TemporaryDirectory())
+    embedder = _CountingEmbedder()
+    expected = embedding_cache.CachedEmbedder(
+        embedder, cache_dir=cache_dir
+    ).embed_batch(['x', 'y'])
+
+    embedder = _CountingEmbedder()
+    restarted = embedding_cache.CachedEmbedder(embedder, cache_dir=cache_dir)
+    np.testing.assert_array_equal(
+        restarted.embed_batch(['y', 'x']), expected[::-1]
+    )
+    self.assertEmpty(embedder.calls)
+
+
+if __name__ == '__main__':
+  absltest.main()
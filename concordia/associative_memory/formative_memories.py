@@ -249,8 +249,7 @@ class FormativeMemoryFactory:
 
     mem = self._blank_memory_factory_call()
     # All players share generic memories.
-    for item in self._shared_memories:
-      mem.add(item)
+    mem.extend(self._shared_memories)
 
     context = agent_config.context
     if agent_config.goal:
@@ -260,14 +259,16 @@ class FormativeMemoryFactory:
 
     if context:
       context_items = context.split('\n')
-      for item in context_items:
-        if item:
-          mem.add(item, importance=agent_config.formative_memory_importance)
+      mem.extend(
+          [item for item in context_items if item],
+          importance=agent_config.formative_memory_importance,
+      )
 
     if agent_config.specific_memories:
       specific_memories = agent_config.specific_memories.split('\n')
-      for item in specific_memories:
-        if item:
-          mem.add(item, importance=agent_config.formative_memory_importance)
+      mem.extend(
+          [item for item in specific_memories if item],
+          importance=agent_config.formative_memory_importance,
+      )
 
     return mem
@@ -0,0 +1,173 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""An inverted index from word tokens to memory rows.
+
+Most text lookups on memory are for a literal string such as a player name.
+The index narrows such a lookup down to the rows that could contain the string,
+so that only those rows need to be checked.
+"""
+
+import re
+import threading
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+_REGEX_METACHARACTERS = frozenset('.^$*+?{}[]\\|()')
+# Bounds the number of fragments whose matching tokens are remembered.
+_MAX_CACHED_FRAGMENTS = 1024
+
+
+def literal_from_regex(regex: str) -> str | None:
+  """Returns the literal string a regex searches for, if it is one.
+
+  Regexes without metacharacters, with only escaped metacharacters, and with a
+  leading or trailing '.*' (which does not change what `re.search` matches) are
+  literal searches.
+
+  Args:
+    regex: the regular expression.
+
+  Returns:
+    A string s such that `re.search(regex, text)` matches if and only if
+    `s in text`, or None if the regex is not a literal search.
+  """
+  regex = regex.removeprefix('.*')
+  if regex.endswith('.*') and not regex.endswith('\\.*'):
+    regex = regex[:-2]
+  literal = []
+  escaped = False
+  for char in regex:
+    if escaped:
+      if char not in _REGEX_METACHARACTERS:
+        # E.g. \d or \b, which are character classes or assertions.
+        return None
+      literal.append(char)
+      escaped = False
+    elif char == '\\':
+      escaped = True
+    elif char in _REGEX_METACHARACTERS:
+      return None
+    else:
+      literal.append(char)
+  if escaped:
+    return None
+  return ''.join(literal)
+
+
+def _matches(token: str, fragment: str, position: str) -> bool:
+  if position == 'prefix':
+    return token.startswith(fragment)
+  if position == 'suffix':
+    return token.endswith(fragment)
+  return fragment in token
+
+
+class TokenIndex:
+  """Maps each word token to the rows whose text contains it.
+
+  Callers must serialize calls to `add`, but `candidate_rows` may be called
+  concurrently with them and with each other. Concurrent readers may see rows
+  that were added after they started, which callers should filter out.
+  """
+
+  def __init__(self):
+    self._rows_by_token: dict[str, list[int]] = {}
+    # Maps a (fragment, position) pair to the set of known tokens that contain
+    # the fragment at that position, see `_matches`. The sets are replaced
+    # rather than modified, so readers can use them without holding the lock.
+    self._matching_tokens: dict[tuple[str, str], frozenset[str]] = {}
+    # Keeps the cached sets consistent with the tokens when a new token is
+    # added while a reader is filling the cache.
+    self._cache_lock = threading.Lock()
+
+  def add(self, row: int, text: str) -> None:
+    """Indexes the text of a new row. Rows must be added in increasing order."""
+    for token in set(_TOKEN_PATTERN.findall(text)):
+      rows = self._rows_by_token.get(token)
+      if rows is None:
+        with self._cache_lock:
+          self._rows_by_token[token] = [row]
+          for key, tokens in list(self._matching_tokens.items()):
+            if _matches(token, *key):
+              self._matching_tokens[key] = tokens | {token}
+      else:
+        rows.append(row)
+
+  def _get_matching_tokens(
+      self, fragment: str, position: str
+  ) -> frozenset[str]:
+    tokens = self._matching_tokens.get((fragment, position))
+    if tokens is None:
+      with self._cache_lock:
+        if len(self._matching_tokens) >= _MAX_CACHED_FRAGMENTS:
+          self._matching_tokens.clear()
+        tokens = frozenset(
+            token for token in self._rows_by_token
+            if _matches(token, fragment, position)
+        )
+        self._matching_tokens[(fragment, position)] = tokens
+    return tokens
+
+  def _get_rows_with_fragment(
+      self, fragment: str, position: str
+  ) -> np.ndarray:
+    """Returns the sorted rows with a token matching the fragment."""
+    if position == 'whole':
+      tokens = {fragment}
+    else:
+      tokens = self._get_matching_tokens(fragment, position)
+    postings = [self._rows_by_token.get(token, []) for token in tokens]
+    if not postings:
+      return np.empty(0, dtype=np.int64)
+    if len(postings) == 1:
+      return np.array(postings[0], dtype=np.int64)
+    return np.unique(np.concatenate(postings)).astype(np.int64)
+
+  def candidate_rows(self, literal: str) -> np.ndarray | None:
+    """Returns the rows that may contain a literal string.
+
+    Args:
+      literal: the string to search for.
+
+    Returns:
+      A sorted array containing every row whose text contains `literal`, and
+      possibly some rows that do not. None if the literal has no word tokens,
+      in which case every row is a candidate.
+    """
+    candidates = None
+    for match in _TOKEN_PATTERN.finditer(literal):
+      # A token with a non-word character before it in the literal must start
+      # a token of any text that contains the literal, and similarly for the
+      # end of the token. Otherwise it may be part of a longer token.
+      starts_token = match.start() > 0
+      ends_token = match.end() < len(literal)
+      if starts_token and ends_token:
+        position = 'whole'
+      elif starts_token:
+        position = 'prefix'
+      elif ends_token:
+        position = 'suffix'
+      else:
+        position = 'any'
+      rows = self._get_rows_with_fragment(match.group(), position)
+      if candidates is None:
+        candidates = rows
+      else:
+        candidates = np.intersect1d(candidates, rows, assume_unique=True)
+      if not candidates.size:
+        break
+    return candidates
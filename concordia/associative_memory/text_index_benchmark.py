@@ -0,0 +1,96 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+r"""Latency of indexed versus scanning retrieval by regex.
+
+Fills an associative memory with synthetic game master style events that
+mention players by name, then times looking up every player's memories the way
+`PlayerStatus` does, with the token index and with a full pandas scan.
+
+Usage:
+  python -m concordia.associative_memory.text_index_benchmark \
+      --num_memories=100000 --num_players=40
+"""
+
+import datetime
+import time
+
+from absl import app
+from absl import flags
+from concordia.associative_memory import associative_memory
+import numpy as np
+
+_NUM_MEMORIES = flags.DEFINE_integer(
+    'num_memories', 100_000, 'Number of memories in the memory bank.'
+)
+_NUM_PLAYERS = flags.DEFINE_integer(
+    'num_players', 40, 'Number of player names to look up.'
+)
+_SEED = flags.DEFINE_integer('seed', 0, 'Random seed.')
+
+_START = datetime.datetime(2024, 1, 1)
+_ACTIONS = (
+    'went to the market with',
+    'had a long conversation with',
+    'bought a loaf of bread from',
+    'argued about the election with',
+    'walked past the church and waved at',
+)
+
+
+def _time_lookups(fn, player_names) -> tuple[list[list[str]], float]:
+  start = time.perf_counter()
+  results = [fn(name) for name in player_names]
+  return results, time.perf_counter() - start
+
+
+def main(argv):
+  del argv
+  rng = np.random.default_rng(_SEED.value)
+  player_names = [f'Player{i} Surname{i}' for i in range(_NUM_PLAYERS.value)]
+
+  memory = associative_memory.AssociativeMemory(
+      lambda text: np.zeros(1), clock=lambda: _START
+  )
+  for i in range(_NUM_MEMORIES.value):
+    subject, target = rng.choice(player_names, size=2, replace=False)
+    action = _ACTIONS[rng.integers(len(_ACTIONS))]
+    memory.add(
+        f'{subject} {action} {target}.',
+        timestamp=_START + datetime.timedelta(minutes=i),
+    )
+  data = memory.get_data_frame()
+
+  def scan(name):
+    return data['text'][data['text'].str.contains(name)].tolist()
+
+  def indexed(name):
+    return memory.retrieve_by_regex(name, add_time=False, sort_by_time=False)
+
+  scan_results, scan_seconds = _time_lookups(scan, player_names)
+  indexed_results, indexed_seconds = _time_lookups(indexed, player_names)
+  if scan_results != indexed_results:
+    raise RuntimeError('Indexed and scanning lookups disagree.')
+
+  print(
+      f'Looked up {len(player_names)} players in {len(memory)} memories.'
+  )
+  print(f'Full scan:     {1000 * scan_seconds:.1f} ms')
+  print(f'Token index:   {1000 * indexed_seconds:.1f} ms')
+  print(f'Speedup: {scan_seconds / indexed_seconds:.1f}x')
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,75 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for text_index.py."""
+
+import datetime
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from concordia.associative_memory import associative_memory
+from concordia.associative_memory import text_index
+import numpy as np
+import pandas as pd
+
+_MEMORIES = (
+    'Alice went to the market.',
+    "Alice's cat is called Malice.",
+    'Bob and Alice talked for an hour.',
+    '[scene type] conversation',
+    '[FAIL] the bridge collapsed',
+    'Bob -- "hello there"',
+    'Alicesmith is a different person.',
+)
+
+
+class TextIndexTest(parameterized.TestCase):
+
+  @parameterized.parameters(
+      ('Alice', 'Alice'),
+      ('Bob and Alice', 'Bob and Alice'),
+      (r'\[scene type\].*', '[scene type]'),
+      (r'.*\[FAIL\]', '[FAIL]'),
+      ('a.b', None),
+      ('^Alice', None),
+      (r'\d+', None),
+      ('Alice|Bob', None),
+  )
+  def test_literal_from_regex(self, regex, expected):
+    self.assertEqual(text_index.literal_from_regex(regex), expected)
+
+  @parameterized.parameters(
+      'Alice',
+      'lice',
+      ' Alice ',
+      'Bob and',
+      ' -- "',
+      r'\[scene type\].*',
+      r'\[FAIL\].*',
+      'Al.ce',
+      '^Bob',
+      'nobody',
+  )
+  def test_retrieve_by_regex_matches_scan(self, regex):
+    memory = associative_memory.AssociativeMemory(
+        lambda text: np.ones(3), clock=lambda: datetime.datetime(2024, 1, 1)
+    )
+    memory.extend(_MEMORIES)
+    texts = pd.Series(_MEMORIES)
+    expected = texts[texts.str.contains(regex)].tolist()
+    self.assertEqual(memory.retrieve_by_regex(regex, add_time=False), expected)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -21,6 +21,7 @@ from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 import termcolor
 
 
@@ -60,7 +61,10 @@ class AllSimilarMemories(component.Component):
     self._clock_now = clock_now
     self._num_memories_to_retrieve = num_memories_to_retrieve
     self._name = name
-    self._last_update = datetime.datetime.min
+    self._inputs = change_tracker.ChangeTracker(
+        change_tracker.memory_version(self._memory),
+        change_tracker.component_states(self._components),
+    )
     self._history = []
 
   def name(self) -> str:
@@ -77,9 +81,8 @@ class AllSimilarMemories(component.Component):
     return self._components
 
   def update(self) -> None:
-    if self._clock_now() == self._last_update:
+    if not self._inputs.changed():
       return
-    self._last_update = self._clock_now()
 
     prompt = interactive_document.InteractiveDocument(self._model)
 
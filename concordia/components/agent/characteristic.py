@@ -21,6 +21,7 @@ from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 import termcolor
 
 
@@ -81,6 +82,11 @@ class Characteristic(component.Component):
     self._clock_now = state_clock_now
     self._num_memories_to_retrieve = num_memories_to_retrieve
     self._history = []
+    inputs = [change_tracker.memory_version(self._memory)]
+    if self._clock_now is not None:
+      # A state changes with time even if nothing new is remembered.
+      inputs.append(self._clock_now)
+    self._inputs = change_tracker.ChangeTracker(*inputs)
 
   def name(self) -> str:
     return self._characteristic_name
@@ -93,6 +99,9 @@ class Characteristic(component.Component):
       return self._history[-1].copy()
 
   def update(self) -> None:
+    if not self._inputs.changed():
+      return
+
     query = f"{self._agent_name}'s {self._characteristic_name}"
     if self._clock_now is not None:
       query = f'[{self._clock_now()}] {query}'
@@ -20,6 +20,7 @@ from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 import termcolor
 
 
@@ -59,7 +60,10 @@ class IllnessRepresentation(component.Component):
     self._clock_now = clock_now
     self._num_memories_to_retrieve = num_memories_to_retrieve
     self._name = name
-    self._last_update = datetime.datetime.min
+    self._inputs = change_tracker.ChangeTracker(
+        change_tracker.memory_version(self._memory),
+        change_tracker.component_states(self._components),
+    )
     self._history = []
 
   def name(self) -> str:
@@ -76,9 +80,8 @@ class IllnessRepresentation(component.Component):
     return self._components
 
   def update(self) -> None:
-    if self._clock_now() == self._last_update:
+    if not self._inputs.changed():
       return
-    self._last_update = self._clock_now()
 
     prompt = interactive_document.InteractiveDocument(self._model)
 
@@ -152,7 +155,8 @@ class IllnessRepresentation(component.Component):
         answer_prefix=f'{self._agent_name} believes that ',
     )
     self._state = f'{self._agent_name} believes that {summary}'
-    self._memory.add(f'[idea] {self._state}')
+    num_added = self._memory.add(f'[idea] {self._state}')
+    self._inputs.record(num_added)
 
     if self._verbose:
       print(termcolor.colored(prompt.view().text(), 'green'), end='')
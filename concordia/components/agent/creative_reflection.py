@@ -21,6 +21,7 @@ from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 import termcolor
 
 
@@ -72,7 +73,10 @@ class CreativeReflection(component.Component):
     self._components = self._source_of_abstraction
     self._name = name
     self._history = []
-    self._last_update = datetime.datetime.min
+    self._inputs = change_tracker.ChangeTracker(
+        change_tracker.memory_version(self._memory),
+        change_tracker.component_states(self._components),
+    )
 
   def name(self) -> str:
     return self._name
@@ -88,9 +92,8 @@ class CreativeReflection(component.Component):
     return self._components
 
   def update(self) -> None:
-    if self._clock_now() == self._last_update:
+    if not self._inputs.changed():
       return
-    self._last_update = self._clock_now()
 
     old_state = self._state
 
@@ -129,7 +132,8 @@ class CreativeReflection(component.Component):
     self._state = f'{self._agent_name} just realized that {observations}'
 
     if old_state != self._state:
-      self._memory.add(f'[idea] {observations}')
+      num_added = self._memory.add(f'[idea] {observations}')
+      self._inputs.record(num_added)
 
     self._last_chain = concat_interactive_documents(
         abstraction_chain, application_chain
@@ -21,6 +21,7 @@ from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 import termcolor
 
 
@@ -82,7 +83,10 @@ class DialecticalReflection(component.Component):
 
     self._name = name
     self._history = []
-    self._last_update = datetime.datetime.min
+    self._inputs = change_tracker.ChangeTracker(
+        change_tracker.memory_version(self._memory),
+        change_tracker.component_states(self._components),
+    )
 
   def name(self) -> str:
     return self._name
@@ -98,9 +102,8 @@ class DialecticalReflection(component.Component):
     return self._components
 
   def update(self) -> None:
-    if self._clock_now() == self._last_update:
+    if not self._inputs.changed():
       return
-    self._last_update = self._clock_now()
 
     old_state = self._state
     # The following query looks for conversations using the fact that their
@@ -112,20 +115,18 @@ class DialecticalReflection(component.Component):
         add_time=False
     )
     # The following query looks for memories of reading and learning.
-    prethoughts += self._memory.retrieve_associative(
-        'book, article, read, idea, concept, study, learn, research, theory',
+    queries = [
+        'book, article, read, idea, concept, study, learn, research, theory'
+    ]
+    if self._topic_component:
+      queries.append(self._topic_component.state())
+    for query_prethoughts in self._memory.retrieve_associative_batch(
+        queries,
         k=self._num_memories_to_retrieve,
         use_recency=False,
         add_time=False,
-    )
-
-    if self._topic_component:
-      prethoughts += self._memory.retrieve_associative(
-          self._topic_component.state(),
-          k=self._num_memories_to_retrieve,
-          use_recency=False,
-          add_time=False,
-      )
+    ):
+      prethoughts += query_prethoughts
 
     prethoughts = '-' + '\n-'.join(prethoughts) + '\n'
 
@@ -205,7 +206,8 @@ class DialecticalReflection(component.Component):
     self._state = f'{self._agent_name} just realized that {synthesis}'
 
     if old_state != self._state:
-      self._memory.add(f'[idea] {synthesis}')
+      num_added = self._memory.add(f'[idea] {synthesis}')
+      self._inputs.record(num_added)
 
     self._last_chain = concat_interactive_documents(
         thesis_chain, synthesis_chain)
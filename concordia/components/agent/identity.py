@@ -14,13 +14,13 @@
 
 
 """Agent identity component."""
-import concurrent
 import datetime
 from typing import Callable, Sequence
 from concordia.associative_memory import associative_memory
 from concordia.components.agent import characteristic
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 
 
 class SimIdentity(component.Component):
@@ -55,7 +55,6 @@ class SimIdentity(component.Component):
     self._agent_name = agent_name
     self._name = name
     self._clock_now = clock_now
-    self._last_update = datetime.datetime.min
     self._history = []
 
     self._identity_component_names = [
@@ -75,6 +74,9 @@ class SimIdentity(component.Component):
               characteristic_name=component_name,
           )
       )
+    self._inputs = change_tracker.ChangeTracker(
+        change_tracker.component_states(self._identity_components)
+    )
 
   def name(self) -> str:
     return self._name
@@ -87,18 +89,12 @@ class SimIdentity(component.Component):
       return self._history[-1].copy()
 
   def get_components(self) -> Sequence[component.Component]:
-    # Since this component handles updating of its subcomponents itself, we
-    # therefore do not need to return them here.
-    return []
+    # The subcomponents are updated before this component, concurrently.
+    return self._identity_components
 
   def update(self):
-    if self._clock_now() == self._last_update:
+    if not self._inputs.changed():
       return
-    self._last_update = self._clock_now()
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-      for c in self._identity_components:
-        executor.submit(c.update)
 
     self._state = '\n'.join(
         [f'{c.name()}: {c.state()}' for c in self._identity_components]
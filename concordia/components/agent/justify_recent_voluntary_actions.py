@@ -22,6 +22,7 @@ from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 import termcolor
 
 
@@ -94,7 +95,10 @@ class JustifyRecentVoluntaryActions(component.Component):
 
     self._name = name
     self._history = []
-    self._last_update = datetime.datetime.min
+    self._inputs = change_tracker.ChangeTracker(
+        change_tracker.memory_version(self._memory),
+        change_tracker.component_states(self._components),
+    )
 
   def name(self) -> str:
     return self._name
@@ -110,9 +114,8 @@ class JustifyRecentVoluntaryActions(component.Component):
     return self._components
 
   def update(self) -> None:
-    if self._clock_now() == self._last_update:
+    if not self._inputs.changed():
       return
-    self._last_update = self._clock_now()
 
     # First determine what voluntary actions the agent recently took.
     what_they_did_chain_of_thought = interactive_document.InteractiveDocument(
@@ -185,7 +188,8 @@ class JustifyRecentVoluntaryActions(component.Component):
     salient_justification = (
         f'[thought] {self._agent_name} {most_salient_justification}')
     self._state = salient_justification
-    self._memory.add(salient_justification)
+    num_added = self._memory.add(salient_justification)
+    self._inputs.record(num_added)
 
     self._last_chain = concat_interactive_documents(
         what_they_did_chain_of_thought, justification_chain_of_thought)
@@ -20,6 +20,7 @@ from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 import termcolor
 
 
@@ -67,10 +68,18 @@ class SimPlan(component.Component):
     self._goal_component = goal
     self._horizon = horizon
     self._clock_now = clock_now
-    self._last_update = datetime.datetime.min
 
     self._latest_memories = ''
     self._last_observation = []
+    self._num_observations = 0
+    inputs = [
+        change_tracker.memory_version(self._memory),
+        change_tracker.component_states(self._components),
+        lambda: self._num_observations,
+    ]
+    if self._goal_component:
+      inputs.append(change_tracker.component_states([self._goal_component]))
+    self._inputs = change_tracker.ChangeTracker(*inputs)
     self._current_plan = ''
     self._history = []
 
@@ -91,30 +100,28 @@ class SimPlan(component.Component):
 
   def observe(self, observation: str):
     self._last_observation.append(observation)
+    self._num_observations += 1
 
   def get_components(self) -> Sequence[component.Component]:
     return self._components
 
   def update(self):
-    if self._last_update == self._clock_now():
+    if not self._inputs.changed():
       return
-    self._last_update = self._clock_now()
 
     observation = '\n'.join(self._last_observation)
     self._last_observation = []
-    memories = self._memory.retrieve_associative(
-        observation,
+    queries = [observation]
+    if self._goal_component:
+      queries.append(self._goal_component.state())
+    memories = []
+    for query_memories in self._memory.retrieve_associative_batch(
+        queries,
         k=self._num_memories_to_retrieve,
         use_recency=True,
         add_time=True,
-    )
-    if self._goal_component:
-      memories = memories + self._memory.retrieve_associative(
-          self._goal_component.state(),
-          k=self._num_memories_to_retrieve,
-          use_recency=True,
-          add_time=True,
-      )
+    ):
+      memories += query_memories
     memories = '\n'.join(memories)
 
     components = '\n'.join([
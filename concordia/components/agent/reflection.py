@@ -94,8 +94,10 @@ class Reflection(component.Component):
 
     mems = []
     # make sure that the answer comes out of LLM in the right format
-    for question in questions.splitlines():
-      mems += self._memory.retrieve_associative(question, 10, add_time=True)
+    for question_mems in self._memory.retrieve_associative_batch(
+        questions.splitlines(), 10, add_time=True
+    ):
+      mems += question_mems
 
     mems = '\n'.join(mems)
 
@@ -22,6 +22,7 @@ from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 
 
 class Relationships(component.Component):
@@ -58,7 +59,9 @@ class Relationships(component.Component):
     self._verbose = verbose
     self._history = []
     self._clock_now = clock_now
-    self._last_update = self._clock_now() - datetime.timedelta(days=365)
+    self._inputs = change_tracker.ChangeTracker(
+        change_tracker.memory_version(self._memory)
+    )
 
   def name(self) -> str:
     return 'relationships'
@@ -81,9 +84,8 @@ class Relationships(component.Component):
     return self._partial_states[player_name]
 
   def update(self) -> None:
-    if self._clock_now() == self._last_update:
+    if not self._inputs.changed():
       return
-    self._last_update = self._clock_now()
     new_state = ''
     self._partial_states = {name: '' for name in self._other_agent_names}
     per_player_prompt = {}
@@ -14,13 +14,13 @@
 
 
 """Agent component for tracking the somatic state."""
-import concurrent
 import datetime
-from typing import Callable
+from typing import Callable, Sequence
 from concordia.associative_memory import associative_memory
 from concordia.components.agent import characteristic
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import change_tracker
 import termcolor
 
 
@@ -59,7 +59,6 @@ class SomaticState(component.Component):
     self._clock_now = clock_now
     self._summarize = summarize
     self._verbose = verbose
-    self._last_update = datetime.datetime.min
 
     self._characteristic_names = [
         'level of hunger',
@@ -90,6 +89,9 @@ class SomaticState(component.Component):
               extra_instructions=extra_instructions,
           )
       )
+    self._inputs = change_tracker.ChangeTracker(
+        change_tracker.component_states(self._characteristics)
+    )
 
   def name(self) -> str:
     return 'Somatic state'
@@ -110,15 +112,13 @@ class SomaticState(component.Component):
         current_log[comp.name()] = last_log
     return current_log
 
+  def get_components(self) -> Sequence[component.Component]:
+    # The characteristics are updated before this component, concurrently.
+    return self._characteristics
+
   def update(self):
-    if self._clock_now and self._last_update == self._clock_now():
+    if not self._inputs.changed():
       return
-    if self._clock_now:
-      self._last_update = self._clock_now()
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-      for c in self._characteristics:
-        executor.submit(c.update)
 
     self._state = '\n'.join([
         f"{self._agent_name}'s {c.name()}: " + c.state()
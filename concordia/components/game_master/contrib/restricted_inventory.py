@@ -15,7 +15,6 @@
 """A component to represent each agent's physical inventory or possessions."""
 
 from collections.abc import Callable, Mapping, Sequence
-import concurrent
 import copy
 import datetime
 
@@ -24,6 +23,7 @@ from concordia.associative_memory import associative_memory
 from concordia.components import game_master as gm_components
 from concordia.document import interactive_document
 from concordia.language_model import language_model
+from concordia.utils import concurrency
 from concordia.utils import helper_functions
 import numpy as np
 import termcolor
@@ -112,10 +112,7 @@ class RestrictedInventory(gm_components.inventory.Inventory):
       )
       return
 
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=len(self._item_types)
-    ) as executor:
-      executor.map(check_if_count_noun, self._item_types)
+    concurrency.map_parallel(check_if_count_noun, self._item_types)
 
     # Set the initial state's string representation.
     self.update()
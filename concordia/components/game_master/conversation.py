@@ -14,9 +14,10 @@
 
 """Component for the Game Master to handle conversations between players."""
 
-from collections.abc import Sequence
+from collections.abc import Mapping, Sequence
 import datetime
 import random
+from typing import Any
 
 from concordia import components as generic_components
 from concordia.agents import basic_agent
@@ -31,6 +32,7 @@ from concordia.language_model import language_model
 from concordia.typing import clock as clock_lib
 from concordia.typing import component
 from concordia.utils import helper_functions
+from concordia.utils import log_sink
 import termcolor
 
 CONVERSATIONALIST_STYLES = (
@@ -103,6 +105,7 @@ class Conversation(component.Component):
       npc_instructions: str = game_master.DEFAULT_GAME_MASTER_INSTRUCTIONS,
       max_conversation_length: int = 20,
       log_color: str = 'magenta',
+      log: log_sink.LogSink | None = None,
   ):
     """Initializes the generator of conversations.
 
@@ -127,13 +130,15 @@ class Conversation(component.Component):
         instructions.
       max_conversation_length: maximum number of rounds in a conversation scene.
       log_color: color in which to print logs
+      log: where to keep the log of the conversations. If None, all the log
+        entries are kept in memory.
     """
     self._players = players
     self._model = model
     self._cap_nonplayer_characters = cap_nonplayer_characters
     self._npc_instructions = npc_instructions
     self._shared_context = shared_context
-    self._history = []
+    self._history = log if log is not None else log_sink.LogSink()
     self._verbose = verbose
     self._log_color = log_color
     self._components = components or []
@@ -149,12 +154,16 @@ class Conversation(component.Component):
   def name(self) -> str:
     return 'Conversations'
 
-  def get_history(self):
-    return self._history.copy()
+  def get_history(self) -> Sequence[Mapping[str, Any]]:
+    """Returns the log entries, which are read lazily if spilled to disk."""
+    return self._history
+
+  def close(self) -> None:
+    self._history.close()
 
   def get_last_log(self):
     if self._history:
-      return self._history[-1].copy()
+      return dict(self._history[-1])
 
   def get_player_names(self):
     return [player.name for player in self._players]
@@ -195,6 +204,9 @@ class Conversation(component.Component):
             ),
         ],
         verbose=True,
+        # An NPC only lives for one conversation, and only its latest log
+        # entry is ever read.
+        log=log_sink.LogSink(max_entries_in_memory=1),
     )
     return npc
 
@@ -440,7 +452,7 @@ class Conversation(component.Component):
                 'Summary': 'Conversation chain of thought',
                 'Chain': document.view().text().splitlines(),
             },
-            'Scene log': convo_scene.get_history(),
+            'Scene log': list(convo_scene.get_history()),
         }
 
         conversation_summary = who_talked + ' ' + conversation_summary
@@ -16,7 +16,6 @@
 """Externality for the Game Master, which tracks direct effect on players."""
 
 from collections.abc import Callable, Sequence
-import concurrent.futures
 import datetime
 
 from concordia.agents import basic_agent
@@ -24,6 +23,7 @@ from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import concurrency
 from concordia.utils import helper_functions
 import termcolor
 
@@ -148,8 +148,7 @@ class DirectEffect(component.Component):
             '\nThe event had a direct effect on one of the players, resolving.'
         )
 
-      with concurrent.futures.ThreadPoolExecutor() as executor:
-        executor.map(_update_player, self._players)
+      concurrency.map_parallel(_update_player, self._players)
 
     update_log = {
         'date': self._clock_now(),
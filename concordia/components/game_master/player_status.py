@@ -17,16 +17,23 @@
 
 from collections.abc import Callable, Sequence
 import datetime
+import re
 import threading
 
 from concordia.associative_memory import associative_memory
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import concurrency
 
 
 class PlayerStatus(component.Component):
-  """Tracks the status of players."""
+  """Tracks the status of players.
+
+  The status of each player is inferred from the latest memories that mention
+  them. An update only asks again about the players mentioned in the memories
+  added since the last update, concurrently, and keeps the other statuses.
+  """
 
   def __init__(
       self,
@@ -56,7 +63,9 @@ class PlayerStatus(component.Component):
     self._verbose = verbose
     self._history = []
     self._clock_now = clock_now
-    self._last_memory_len = 0
+    self._num_memories_seen = 0
+    self._patterns = {name: re.compile(name) for name in self._player_names}
+    self._per_player_prompt = {}
     self._state_lock = threading.Lock()
 
   def name(self) -> str:
@@ -83,43 +92,76 @@ class PlayerStatus(component.Component):
     with self._state_lock:
       return self._partial_states[player_name]
 
+  def _get_player_status(self, player_name: str) -> tuple[str, list[str]]:
+    """Asks for the location and activity of a player.
+
+    Args:
+      player_name: the name of the player.
+
+    Returns:
+      The status of the player and the prompt used to infer it.
+    """
+    memories = self._memory.retrieve_by_regex(player_name)
+    memories = memories[-self._num_memories_to_retrieve:]
+    prompt = interactive_document.InteractiveDocument(self._model)
+    prompt.statement('Events:\n' + '\n'.join(memories) + '\n')
+    time_now = self._clock_now().strftime('[%d %b %Y %H:%M:%S]')
+    prompt.statement(f'The current time is: {time_now}\n')
+    player_loc = (
+        prompt.open_question(
+            'Given the above events and their time, what is the latest'
+            f' location of {player_name} and what are they doing?',
+            answer_prefix=f'{player_name} is ',
+        )
+        + '\n'
+    )
+    if self._verbose:
+      print(prompt.view().text())
+
+    # Indent player status outputs.
+    player_state_string = f'  {player_name} is ' + player_loc
+    return player_state_string, prompt.view().text().splitlines()
+
   def update(self) -> None:
     with self._state_lock:
-      if self._last_memory_len == len(self._memory):
+      num_memories = len(self._memory)
+      if num_memories == self._num_memories_seen:
+        return
+      # Only the players mentioned in new memories can have moved.
+      new_memories = self._memory.retrieve_added_after(
+          self._num_memories_seen
+      )
+      players_to_update = [
+          player_name
+          for player_name, pattern in self._patterns.items()
+          if player_name not in self._per_player_prompt
+          or any(pattern.search(memory) for memory in new_memories)
+      ]
+      if not players_to_update:
+        self._num_memories_seen = num_memories
         return
-      self._last_memory_len = len(self._memory)
-
-      self._state = ''
-      self._partial_states = {name: '' for name in self._player_names}
-      per_player_prompt = {}
-      for player_name in self._player_names:
-        memories = self._memory.retrieve_by_regex(player_name)
-        memories = memories[-self._num_memories_to_retrieve:]
-        prompt = interactive_document.InteractiveDocument(self._model)
-        prompt.statement('Events:\n' + '\n'.join(memories) + '\n')
-        time_now = self._clock_now().strftime('[%d %b %Y %H:%M:%S]')
-        prompt.statement(f'The current time is: {time_now}\n')
-        player_loc = (
-            prompt.open_question(
-                'Given the above events and their time, what is the latest'
-                f' location of {player_name} and what are they doing?',
-                answer_prefix=f'{player_name} is ',
-            )
-            + '\n'
-        )
-        per_player_prompt[player_name] = prompt.view().text().splitlines()
-        if self._verbose:
-          print(prompt.view().text())
 
-        # Indent player status outputs.
-        player_state_string = f'  {player_name} is ' + player_loc
+      statuses = concurrency.map_parallel(
+          self._get_player_status, players_to_update
+      )
+      # Only once every status is refreshed, so that the players are refreshed
+      # again on the next update if any of the queries fails.
+      self._num_memories_seen = num_memories
+      for player_name, (player_state_string, prompt) in zip(
+          players_to_update, statuses
+      ):
         self._partial_states[player_name] = player_state_string
-        self._state = self._state + player_state_string
+        self._per_player_prompt[player_name] = prompt
+      self._state = ''.join(
+          self._partial_states[player_name]
+          for player_name in self._player_names
+      )
 
       update_log = {
           'date': self._clock_now(),
           'state': self._state,
-          'partial states': self._partial_states,
-          'per player prompts': per_player_prompt,
+          'partial states': dict(self._partial_states),
+          'per player prompts': dict(self._per_player_prompt),
+          'updated players': players_to_update,
       }
       self._history.append(update_log)
@@ -22,6 +22,7 @@ from absl.testing import parameterized
 from concordia.associative_memory import associative_memory
 from concordia.components.game_master import player_status
 from concordia.language_model import language_model
+import numpy as np
 
 
 def _clock_now() -> datetime.datetime:
@@ -52,6 +53,65 @@ class PlayerStatusTest(parameterized.TestCase):
     expected = "\n".join([f"  {name} is {location}" for name in player_names])
     self.assertEqual(component.state(), expected + "\n")
 
+  def test_only_mentioned_players_are_updated(self):
+    model = mock.create_autospec(
+        language_model.LanguageModel, instance=True, spec_set=True)
+    model.sample_text.return_value = "at the library"
+    memory = associative_memory.AssociativeMemory(
+        lambda text: np.zeros(1), clock=_clock_now)
+    memory.add("Alice and Bob met at the library.")
+    component = player_status.PlayerStatus(
+        clock_now=_clock_now,
+        model=model,
+        memory=memory,
+        player_names=["Alice", "Bob", "Charlie"])
+    component.update()
+    self.assertEqual(model.sample_text.call_count, 3)
+
+    component.update()
+    self.assertEqual(model.sample_text.call_count, 3)
+
+    model.sample_text.return_value = "at the pub"
+    memory.add("Bob went to the pub.")
+    component.update()
+    self.assertEqual(model.sample_text.call_count, 4)
+    self.assertEqual(
+        component.state(),
+        "  Alice is at the library\n"
+        "  Bob is at the pub\n"
+        "  Charlie is at the library\n",
+    )
+    self.assertEqual(component.get_last_log()["updated players"], ["Bob"])
+
+  def test_players_are_updated_again_after_a_failure(self):
+    model = mock.create_autospec(
+        language_model.LanguageModel, instance=True, spec_set=True)
+    model.sample_text.return_value = "at the library"
+    memory = associative_memory.AssociativeMemory(
+        lambda text: np.zeros(1), clock=_clock_now)
+    component = player_status.PlayerStatus(
+        clock_now=_clock_now,
+        model=model,
+        memory=memory,
+        player_names=["Alice", "Bob"])
+    memory.add("Alice and Bob met at the library.")
+    component.update()
+
+    memory.add("Bob went to the pub.")
+    model.sample_text.side_effect = RuntimeError("model unavailable")
+    with self.assertRaises(RuntimeError):
+      component.update()
+
+    model.sample_text.side_effect = None
+    model.sample_text.return_value = "at the pub"
+    component.update()
+    self.assertEqual(component.get_last_log()["updated players"], ["Bob"])
+    self.assertEqual(
+        component.state(),
+        "  Alice is at the library\n"
+        "  Bob is at the pub\n",
+    )
+
 
 if __name__ == "__main__":
   absltest.main()
@@ -15,10 +15,12 @@
 
 """Utilities for chain-of-thought prompting."""
 
-from collections.abc import Collection, Iterable, Iterator, Sequence
+from collections.abc import Collection, Iterable, Iterator, Mapping, Sequence
 import contextlib
+from typing import Any
 
 from concordia.document import document
+from concordia.language_model import async_wrapper
 from concordia.language_model import language_model
 import numpy as np
 
@@ -51,6 +53,7 @@ class InteractiveDocument(document.Document):
       model: language_model.LanguageModel,
       contents: Iterable[document.Content] = (),
       rng: np.random.Generator | None = None,
+      async_model: language_model.AsyncLanguageModel | None = None,
   ) -> None:
     """Initializes the instance.
 
@@ -58,6 +61,8 @@ class InteractiveDocument(document.Document):
       model: language model to interact with.
       contents: initial contents of the document.
       rng: randomization source.
+      async_model: language model to interact with in the asynchronous
+        methods. If None then they call `model` in a worker thread.
     """
     super().__init__(contents)
     if rng:
@@ -65,6 +70,9 @@ class InteractiveDocument(document.Document):
     else:
       self._rng = np.random.default_rng()
     self._model = model
+    if async_model is None:
+      async_model = async_wrapper.ThreadedAsyncLanguageModel(model)
+    self._async_model = async_model
     self._model_view = self.view()
     # TODO: b/311191701 - debug log some useful stuff?
 
@@ -85,14 +93,19 @@ class InteractiveDocument(document.Document):
     """See base class."""
     # TODO: b/311192069 - what about rng?
     return InteractiveDocument(
-        model=self._model, contents=self.contents(), rng=self._rng
+        model=self._model,
+        contents=self.contents(),
+        rng=self._rng,
+        async_model=self._async_model,
     )
 
   @contextlib.contextmanager
   def edit(self) -> Iterator['InteractiveDocument']:
     """See base class."""
     # TODO: b/311192069 - what about rng?
-    edit = InteractiveDocument(model=self._model, rng=self._rng)
+    edit = InteractiveDocument(
+        model=self._model, rng=self._rng, async_model=self._async_model
+    )
     yield edit
     self.extend(edit.contents())
 
@@ -174,6 +187,35 @@ class InteractiveDocument(document.Document):
       )
     else:
       response = forced_response
+    return self._open_question_response(response, answer_prefix, answer_suffix)
+
+  async def open_question_async(
+      self,
+      question: str,
+      *,
+      forced_response: str | None = None,
+      answer_prefix: str = '',
+      answer_suffix: str = '',
+      max_tokens: int = DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = ('\n',),
+  ) -> str:
+    """Asynchronous version of `open_question`, using the async model."""
+    self._question(f'Question: {question}\n')
+    self._response(f'Answer: {answer_prefix}')
+    if forced_response is None:
+      response = await self._async_model.sample_text(
+          prompt=self._model_view.text(),
+          max_tokens=max_tokens,
+          terminators=terminators,
+      )
+    else:
+      response = forced_response
+    return self._open_question_response(response, answer_prefix, answer_suffix)
+
+  def _open_question_response(
+      self, response: str, answer_prefix: str, answer_suffix: str
+  ) -> str:
+    """Appends the response to an open question and returns it."""
     response = response.removeprefix(answer_prefix)
     self._model_response(response)
     self._response(f'{answer_suffix}\n')
@@ -191,6 +233,30 @@ class InteractiveDocument(document.Document):
     Returns:
       The index of the sampled answer.
     """
+    original_indices, keys = self._multiple_choice_question(question, answers)
+    idx, response, debug = self._model.sample_choice(
+        prompt=self._model_view.text(),
+        responses=keys,
+    )
+    self._multiple_choice_response(response, debug)
+    return original_indices[idx]
+
+  async def multiple_choice_question_async(
+      self, question: str, answers: Sequence[str]
+  ) -> int:
+    """Asynchronous version of `multiple_choice_question`."""
+    original_indices, keys = self._multiple_choice_question(question, answers)
+    idx, response, debug = await self._async_model.sample_choice(
+        prompt=self._model_view.text(),
+        responses=keys,
+    )
+    self._multiple_choice_response(response, debug)
+    return original_indices[idx]
+
+  def _multiple_choice_question(
+      self, question: str, answers: Sequence[str]
+  ) -> tuple[np.ndarray, list[str]]:
+    """Appends a multiple choice question, returns the order and the keys."""
     original_indices = self._rng.permutation(len(answers))
     options = {key: answers[i] for key, i in zip(_letters(), original_indices)}
     self._question(f'Question: {question}\n')
@@ -198,14 +264,15 @@ class InteractiveDocument(document.Document):
       self._question(f'  ({key}) {option}\n')
 
     self._response('Answer: (')
-    idx, response, debug = self._model.sample_choice(
-        prompt=self._model_view.text(),
-        responses=list(options.keys()),
-    )
+    return original_indices, list(options.keys())
+
+  def _multiple_choice_response(
+      self, response: str, debug: Mapping[str, Any]
+  ) -> None:
+    """Appends the response to a multiple choice question."""
     self._model_response(response)
     self._response(')\n')
     self.debug(f'[{debug}]')
-    return original_indices[idx]
 
   def yes_no_question(self, question: str) -> bool:
     """Presents a yes/no question to the agent.
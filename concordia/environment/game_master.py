@@ -14,11 +14,12 @@
 
 """A Generic Game Master."""
 
-from collections.abc import Callable, Sequence
-import concurrent.futures
+import asyncio
+from collections.abc import Callable, Mapping, Sequence
 import dataclasses
 import datetime
 import random
+from typing import Any
 
 from concordia import components as generic_components
 from concordia.agents import basic_agent
@@ -30,7 +31,9 @@ from concordia.typing import agent as simulacrum_agent
 from concordia.typing import clock as game_clock
 from concordia.typing import component
 from concordia.typing import game_master as simulacrum_game_master
-from concordia.utils import helper_functions
+from concordia.utils import component_graph
+from concordia.utils import concurrency
+from concordia.utils import log_sink
 import termcolor
 
 
@@ -97,8 +100,10 @@ class GameMaster(simulacrum_game_master.GameMaster):
       verbose: bool = False,
       concurrent_externalities: bool = True,
       concurrent_action: bool = False,
+      update_components_once_per_step: bool = False,
       use_default_instructions: bool = True,
       log_color: str = 'red',
+      log: log_sink.LogSink | None = None,
   ):
     """Game master constructor.
 
@@ -124,10 +129,17 @@ class GameMaster(simulacrum_game_master.GameMaster):
       concurrent_externalities: if true, runs externalities in separate threads
       concurrent_action: if true, runs player actions and events in separate
         threads
+      update_components_once_per_step: if true, updates the components once at
+        the start of each step rather than before each player's turn, so all
+        players see the components as they were at the start of the step.
+        Otherwise components still only redo work whose inputs changed since
+        their last update, e.g. after another player's event.
       use_default_instructions: set to False if you want to skip the standard
         instructions used for the game master, e.g. do this if you plan to pass
         custom instructions as a constant component instead.
       log_color: color in which to print logs
+      log: where to keep the log of the game master. If None, all the log
+        entries are kept in memory.
     """
     self._name = name
     self._model = model
@@ -139,6 +151,7 @@ class GameMaster(simulacrum_game_master.GameMaster):
     self._players_act_simultaneously = players_act_simultaneously
     self._action_spec = action_spec or simulacrum_agent.DEFAULT_ACTION_SPEC
     self._concurrent_action = concurrent_action
+    self._update_components_once_per_step = update_components_once_per_step
 
     components = list(components or [])
     if use_default_instructions:
@@ -153,6 +166,7 @@ class GameMaster(simulacrum_game_master.GameMaster):
         raise ValueError(f'Duplicate component name: {comp.name()}')
       else:
         self._components[comp.name()] = comp
+    self._component_graph = None
 
     self._verbose = verbose
 
@@ -163,7 +177,7 @@ class GameMaster(simulacrum_game_master.GameMaster):
       raise ValueError('Duplicate player names')
 
     self._concurrent_externalities = concurrent_externalities
-    self._log = []
+    self._log = log if log is not None else log_sink.LogSink()
 
     self.reset()
 
@@ -171,8 +185,18 @@ class GameMaster(simulacrum_game_master.GameMaster):
   def name(self) -> str:
     return self._name
 
-  def get_history(self):
-    return self._log.copy()
+  def get_history(self) -> Sequence[Mapping[str, Any]]:
+    """Returns the log entries, which are read lazily if spilled to disk."""
+    return self._log
+
+  def close(self) -> None:
+    """Closes the logs of the game master and its components.
+
+    Call this once the simulation ends. The logs can still be read afterwards.
+    """
+    self._log.close()
+    for comp in self._components.values():
+      comp.close()
 
   def insert_history(self, log_entry: LogEntry):
     """Insert a log entry into the game master's log, often used with scenes."""
@@ -202,13 +226,11 @@ class GameMaster(simulacrum_game_master.GameMaster):
   def update_from_player(self, player_name: str, action_attempt: str):
     prompt = interactive_document.InteractiveDocument(self._model)
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-      executor.map(
-          lambda construct: construct.update_before_event(
-              f'{player_name}: {action_attempt}'
-          ),
-          self._components.values(),
-      )
+    with concurrency.task_group() as group:
+      for construct in self._components.values():
+        group.submit(
+            construct.update_before_event, f'{player_name}: {action_attempt}'
+        )
 
     for comp in self._components.values():
       state_of_component = comp.state()
@@ -262,8 +284,7 @@ class GameMaster(simulacrum_game_master.GameMaster):
       return externality.update_after_event(event_statement)
 
     if self._concurrent_externalities:
-      with concurrent.futures.ThreadPoolExecutor() as executor:
-        executor.map(get_externality, self._components.values())
+      concurrency.map_parallel(get_externality, self._components.values())
     else:
       for externality in self._components.values():
         externality.update_after_event(event_statement)
@@ -297,23 +318,28 @@ class GameMaster(simulacrum_game_master.GameMaster):
 
   def update_components(self) -> None:
     # MULTI THREAD!
-    def _get_recursive_update_func(
-        comp: component.Component,
-    ) -> Callable[[], None]:
-      return lambda: helper_functions.apply_recursively(
-          comp, function_name='update'
+    self.get_component_graph().update()
+
+  async def update_components_async(self) -> None:
+    """Asynchronous version of `update_components`."""
+    # Components are synchronous, so they are updated in a worker thread.
+    await asyncio.to_thread(self.get_component_graph().update)
+
+  def get_component_graph(self) -> component_graph.ComponentGraph:
+    """Returns the graph that schedules the updates of the components."""
+    if self._component_graph is None:
+      self._component_graph = component_graph.ComponentGraph(
+          self._components.values()
       )
-
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-      for comp in self._components.values():
-        executor.submit(_get_recursive_update_func(comp))
+    return self._component_graph
 
   def _step_player(
       self,
       player: basic_agent.BasicAgent,
       action_spec: simulacrum_agent.ActionSpec | None = None,
   ):
-    self.update_components()
+    if not self._update_components_once_per_step:
+      self.update_components()
     self.view_for_player(player_name=player.name)
 
     if action_spec:
@@ -325,6 +351,27 @@ class GameMaster(simulacrum_game_master.GameMaster):
 
     self.update_from_player(action_attempt=action, player_name=player.name)
 
+  async def _step_player_async(
+      self,
+      player: basic_agent.BasicAgent,
+      action_spec: simulacrum_agent.ActionSpec | None = None,
+  ):
+    if not self._update_components_once_per_step:
+      await self.update_components_async()
+    self.view_for_player(player_name=player.name)
+
+    if action_spec:
+      action_spec_this_time = action_spec
+    else:
+      action_spec_this_time = self._action_spec
+
+    action = await player.act_async(action_spec_this_time)
+
+    # The game master's thought chains are synchronous.
+    await asyncio.to_thread(
+        self.update_from_player, action_attempt=action, player_name=player.name
+    )
+
   def step(
       self,
       *,
@@ -358,9 +405,11 @@ class GameMaster(simulacrum_game_master.GameMaster):
     if self._randomise_initiative:
       random.shuffle(players)
 
+    if self._update_components_once_per_step:
+      self.update_components()
+
     if self._concurrent_action:
-      with concurrent.futures.ThreadPoolExecutor() as executor:
-        executor.map(step_player_fn, players)
+      concurrency.map_parallel(step_player_fn, players)
     else:
       for player in players:
         step_player_fn(player)
@@ -369,6 +418,46 @@ class GameMaster(simulacrum_game_master.GameMaster):
     if self._players_act_simultaneously:
       self._clock.advance()
 
+  async def step_async(
+      self,
+      *,
+      active_players: Sequence[basic_agent.BasicAgent] | None = None,
+      action_spec: simulacrum_agent.ActionSpec | None = None,
+  ):
+    """Asynchronous version of `step`.
+
+    With `concurrent_action` all the players act concurrently on the running
+    event loop, instead of in a thread each.
+
+    Args:
+      active_players: Optionally specify players to take turns in this round.
+      action_spec: Optionally specify what kind of action to ask the agent to
+        generate.
+    """
+    if active_players:
+      players = list(active_players)
+    else:
+      players = list(self._players_by_name.values())
+
+    if self._randomise_initiative:
+      random.shuffle(players)
+
+    if self._update_components_once_per_step:
+      await self.update_components_async()
+
+    if self._concurrent_action:
+      await asyncio.gather(*(
+          self._step_player_async(player=player, action_spec=action_spec)
+          for player in players
+      ))
+    else:
+      for player in players:
+        await self._step_player_async(player=player, action_spec=action_spec)
+        if not self._players_act_simultaneously:
+          self._clock.advance()
+    if self._players_act_simultaneously:
+      self._clock.advance()
+
   def run_episode(self, max_steps: int = 20) -> list[str]:
     for _ in range(max_steps):
       self.step()
@@ -380,7 +469,9 @@ class GameMaster(simulacrum_game_master.GameMaster):
   def add_component(self, comp: component.Component) -> None:
     """Add a component to the game master."""
     self._components[comp.name()] = comp
+    self._component_graph = None
 
   def remove_component(self, component_name: str) -> None:
     """Remove a component from the game master by name."""
     del self._components[component_name]
+    self._component_graph = None
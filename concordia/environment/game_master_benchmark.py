@@ -0,0 +1,194 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+r"""Language model calls of the game master per step.
+
+Steps a game master that tracks the status of every player, with its
+components updated before each player's turn and once per step, and counts
+the calls the game master makes to its language model. The calls are counted
+from a recording of them, see `recording_wrapper`. By default the game master
+calls a mock model whose events each mention a few players. Pass a recording
+of a real run to replay its responses, and its latencies, instead.
+
+The status of a player is only asked for again after an event mentions them.
+When players take their turns one after the other, updating before each turn
+asks again about every player mentioned by the previous event, while updating
+once per step asks about each player mentioned during the step once. When
+players act concurrently, all the turns update the components before any event
+happens, so the calls they save depend on how the turns interleave.
+
+The time per step is only printed when replaying a recording, since the mock
+model answers at once and the times would only measure the benchmark itself.
+
+Usage:
+  python -m concordia.environment.game_master_benchmark \
+      --num_players=5,20,100 --num_steps=2 --players_per_event=3
+"""
+
+from collections.abc import Collection, Sequence
+import datetime
+import itertools
+import os
+import tempfile
+import threading
+import time
+
+from absl import app
+from absl import flags
+from concordia.agents import basic_agent
+from concordia.associative_memory import associative_memory
+from concordia.clocks import game_clock
+from concordia.components import game_master as gm_components
+from concordia.environment import game_master
+from concordia.language_model import language_model
+from concordia.language_model import recording_wrapper
+from concordia.tests import mock_model
+import numpy as np
+from typing_extensions import override
+
+_NUM_PLAYERS = flags.DEFINE_list(
+    'num_players', ['5', '20', '100'], 'Numbers of players to benchmark.'
+)
+_NUM_STEPS = flags.DEFINE_integer('num_steps', 2, 'Number of steps to run.')
+_CONCURRENT_ACTION = flags.DEFINE_bool(
+    'concurrent_action', False, 'Whether players act concurrently.'
+)
+_PLAYERS_PER_EVENT = flags.DEFINE_integer(
+    'players_per_event', 3, 'Number of players each mock event mentions.'
+)
+_REPLAY = flags.DEFINE_string(
+    'replay_language_model',
+    None,
+    'A recording of language model calls to replay for the game master.',
+)
+
+_START = datetime.datetime(2024, 1, 1, 8)
+
+
+class _NumberedModel(mock_model.MockModel):
+  """Numbers its responses, so that events are not deduplicated in memory.
+
+  Each response mentions the next few players in turn, as events involving
+  several players would.
+  """
+
+  def __init__(self, player_names: Sequence[str], players_per_event: int):
+    super().__init__()
+    self._player_names = player_names
+    self._players_per_event = min(players_per_event, len(player_names))
+    self._counter = itertools.count()
+    self._lock = threading.Lock()
+
+  @override
+  def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    del prompt, max_tokens, terminators, temperature, timeout, seed
+    with self._lock:
+      number = next(self._counter)
+    mentioned = [
+        self._player_names[(number + i) % len(self._player_names)]
+        for i in range(self._players_per_event)
+    ]
+    return f'Event number {number} involves {", ".join(mentioned)}.'
+
+
+def _make_model(player_names: Sequence[str]) -> language_model.LanguageModel:
+  numbered_model = _NumberedModel(player_names, _PLAYERS_PER_EVENT.value)
+  if _REPLAY.value is None:
+    return numbered_model
+  return recording_wrapper.ReplayLanguageModel(
+      _REPLAY.value,
+      latency=recording_wrapper.recorded_latency(),
+      fallback=numbered_model,
+  )
+
+
+def _count_lines(path: str) -> int:
+  with open(path, encoding='utf-8') as f:
+    return sum(1 for _ in f)
+
+
+def _run(num_players: int, once_per_step: bool, path: str) -> tuple[int, float]:
+  """Returns the game master's model calls and seconds per step."""
+  clock = game_clock.FixedIntervalClock(
+      start=_START, step_size=datetime.timedelta(minutes=10)
+  )
+  agent_model = mock_model.MockModel()
+  # Zero padded, so that no name is a prefix of another one.
+  players = [
+      basic_agent.BasicAgent(agent_model, f'Player{i:03d}', clock, [])
+      for i in range(num_players)
+  ]
+  memory = associative_memory.AssociativeMemory(
+      lambda text: np.zeros(1), clock=clock.now
+  )
+  model = recording_wrapper.RecordingLanguageModel(
+      _make_model([player.name for player in players]), path
+  )
+  player_status = gm_components.player_status.PlayerStatus(
+      clock_now=clock.now,
+      model=model,
+      memory=memory,
+      player_names=[player.name for player in players],
+  )
+  env = game_master.GameMaster(
+      model=model,
+      memory=memory,
+      clock=clock,
+      players=players,
+      components=[player_status],
+      player_observes_event=False,
+      concurrent_action=_CONCURRENT_ACTION.value,
+      update_components_once_per_step=once_per_step,
+  )
+  start = time.perf_counter()
+  for _ in range(_NUM_STEPS.value):
+    env.step()
+  seconds = time.perf_counter() - start
+  model.close()
+  return _count_lines(path) // _NUM_STEPS.value, seconds / _NUM_STEPS.value
+
+
+def main(argv):
+  del argv
+  with tempfile.TemporaryDirectory() as directory:
+    replay = _REPLAY.value is not None
+    print(
+        'players  calls/step (per turn)  calls/step (per step)'
+        + ('  speedup' if replay else '')
+    )
+    for num_players in map(int, _NUM_PLAYERS.value):
+      before, before_seconds = _run(
+          num_players, False, os.path.join(directory, f'{num_players}_a')
+      )
+      after, after_seconds = _run(
+          num_players, True, os.path.join(directory, f'{num_players}_b')
+      )
+      row = f'{num_players:7d}  {before:21d}  {after:21d}'
+      if replay:
+        row += f'  {before_seconds / after_seconds:6.1f}x'
+      print(row)
+
+
+if __name__ == '__main__':
+  app.run(main)
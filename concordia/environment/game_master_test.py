@@ -14,6 +14,10 @@
 
 """Test the sequence of calls made by the game master to the components."""
 
+import asyncio
+import os
+import tempfile
+
 from absl.testing import absltest
 from absl.testing import parameterized
 from concordia.agents import basic_agent
@@ -21,8 +25,10 @@ from concordia.associative_memory import associative_memory
 from concordia.associative_memory import importance_function
 from concordia.clocks import game_clock
 from concordia.environment import game_master
+from concordia.language_model import async_wrapper
 from concordia.tests import mock_model
 from concordia.typing import component
+from concordia.utils import log_sink
 import numpy as np
 
 
@@ -82,6 +88,9 @@ class CallTrackingComponent(component.Component):
     self.calls_sequence.append('terminate_episode')
     return False
 
+  def close(self) -> None:
+    self.calls_sequence.append('close')
+
 
 class GameMasterTest(parameterized.TestCase):
 
@@ -162,6 +171,118 @@ class GameMasterTest(parameterized.TestCase):
     ]
     self.assertEqual(bob_call_tracker.calls_sequence, bob_expected_calls)
 
+  def test_components_update_once_per_step(self):
+    gm_call_tracker = CallTrackingComponent()
+    model = mock_model.MockModel()
+    clock = game_clock.FixedIntervalClock()
+    players = [
+        basic_agent.BasicAgent(model, name, clock, [CallTrackingComponent()])
+        for name in ('Alice', 'Bob')
+    ]
+    game_master_memory = associative_memory.AssociativeMemory(
+        embedder, clock=clock.now
+    )
+    env = game_master.GameMaster(
+        model=model,
+        memory=game_master_memory,
+        clock=clock,
+        players=players,
+        components=[gm_call_tracker],
+        player_observes_event=False,
+        update_components_once_per_step=True,
+    )
+    env.step()
+
+    self.assertEqual(
+        gm_call_tracker.calls_sequence,
+        [
+            'update',
+            'partial_state Alice',
+            'update_before_event',
+            'state',
+            'update_after_event',
+            'partial_state Bob',
+            'update_before_event',
+            'state',
+            'update_after_event',
+        ],
+    )
+
+  def test_close_closes_the_logs(self):
+    directory = self.enter_context(tempfile.TemporaryDirectory())
+    gm_call_tracker = CallTrackingComponent()
+    model = mock_model.MockModel()
+    clock = game_clock.FixedIntervalClock()
+    player = basic_agent.BasicAgent(
+        model,
+        'Alice',
+        clock,
+        [],
+        log=log_sink.LogSink(os.path.join(directory, 'Alice.jsonl.gz')),
+    )
+    env = game_master.GameMaster(
+        model=model,
+        memory=associative_memory.AssociativeMemory(embedder, clock=clock.now),
+        clock=clock,
+        players=[player],
+        components=[gm_call_tracker],
+        log=log_sink.LogSink(os.path.join(directory, 'gm.jsonl.gz')),
+    )
+    env.step()
+    env.close()
+    player.close()
+
+    self.assertEqual(gm_call_tracker.calls_sequence[-1], 'close')
+    self.assertLen(env.get_history(), 1)
+    with self.assertRaisesRegex(ValueError, 'closed'):
+      env.insert_history(
+          game_master.LogEntry(clock.now(), 'event', 'summary')
+      )
+    with self.assertRaisesRegex(ValueError, 'closed'):
+      player.act()
+
+  def test_async_step_calls_sequence(self):
+    gm_call_tracker = CallTrackingComponent()
+    model = mock_model.MockModel()
+    async_model = async_wrapper.ThreadedAsyncLanguageModel(model)
+    clock = game_clock.FixedIntervalClock()
+    alice_call_tracker = CallTrackingComponent()
+    alice = basic_agent.BasicAgent(
+        model,
+        'Alice',
+        clock,
+        [alice_call_tracker],
+        async_model=async_model,
+    )
+    game_master_memory = associative_memory.AssociativeMemory(
+        embedder, clock=clock.now
+    )
+    env = game_master.GameMaster(
+        model=model,
+        memory=game_master_memory,
+        clock=clock,
+        players=[alice],
+        components=[gm_call_tracker],
+        player_observes_event=False,
+    )
+    asyncio.run(env.step_async())
+
+    self.assertEqual(
+        gm_call_tracker.calls_sequence,
+        [
+            'update',
+            'partial_state Alice',
+            'update_before_event',
+            'state',
+            'update_after_event',
+        ],
+    )
+    self.assertEqual(
+        alice_call_tracker.calls_sequence,
+        ['update', 'observe', 'state', 'state', 'update_after_event'],
+    )
+    self.assertLen(game_master_memory, 1)
+
 
 if __name__ == '__main__':
   absltest.main()
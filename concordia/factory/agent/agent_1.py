@@ -25,6 +25,7 @@ from concordia.components import agent as agent_components
 from concordia.factory.agent import basic_agent__main_role
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import log_sink
 
 
 def get_dialectical_reflection_component(
@@ -55,6 +56,7 @@ def build_agent(
     memory: associative_memory.AssociativeMemory,
     clock: game_clock.MultiIntervalClock,
     update_time_interval: datetime.timedelta,
+    log_dir: str | None = None,
 ) -> basic_agent.BasicAgent:
   """Build an agent.
 
@@ -64,6 +66,8 @@ def build_agent(
     memory: The agent's memory object.
     clock: The clock to use.
     update_time_interval: Agent calls update every time this interval passes.
+    log_dir: if not None, the directory to write the agent's log to, keeping
+      only its latest entries in memory.
 
   Returns:
     An agent.
@@ -180,6 +184,7 @@ def build_agent(
       verbose=False,
       components=[instructions, overarching_goal, information],
       update_interval=update_time_interval,
+      log=log_sink.in_directory(log_dir, agent_name),
   )
 
   return agent
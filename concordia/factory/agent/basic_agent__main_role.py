@@ -25,6 +25,7 @@ from concordia.clocks import game_clock
 from concordia.components import agent as agent_components
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import log_sink
 
 DEFAULT_PLANNING_HORIZON = 'the rest of the day, focusing most on the near term'
 
@@ -114,6 +115,7 @@ def build_agent(
     memory: associative_memory.AssociativeMemory,
     clock: game_clock.MultiIntervalClock,
     update_time_interval: datetime.timedelta,
+    log_dir: str | None = None,
 ) -> basic_agent.BasicAgent:
   """Build an agent.
 
@@ -123,6 +125,8 @@ def build_agent(
     memory: The agent's memory object.
     clock: The clock to use.
     update_time_interval: Agent calls update every time this interval passes.
+    log_dir: if not None, the directory to write the agent's log to, keeping
+      only its latest entries in memory.
 
   Returns:
     An agent.
@@ -241,6 +245,7 @@ def build_agent(
                   overarching_goal,
                   sequential],
       update_interval=update_time_interval,
+      log=log_sink.in_directory(log_dir, agent_name),
   )
 
   return agent
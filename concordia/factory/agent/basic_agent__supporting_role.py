@@ -26,6 +26,7 @@ from concordia.components import agent as agent_components
 from concordia.factory.agent import basic_agent__main_role
 from concordia.language_model import language_model
 from concordia.typing import component
+from concordia.utils import log_sink
 
 
 def build_agent(
@@ -35,6 +36,7 @@ def build_agent(
     clock: game_clock.MultiIntervalClock,
     update_time_interval: datetime.timedelta,
     additional_components: Sequence[component.Component] = (),
+    log_dir: str | None = None,
 ) -> basic_agent.BasicAgent:
   """Build an agent.
 
@@ -45,6 +47,8 @@ def build_agent(
     clock: The clock to use.
     update_time_interval: Agent calls update every time this interval passes.
     additional_components: Additional components to add to the agent.
+    log_dir: if not None, the directory to write the agent's log to, keeping
+      only its latest entries in memory.
 
   Returns:
     An agent.
@@ -149,7 +153,8 @@ def build_agent(
       clock=clock,
       components=[instructions,
                   sequential],
-      update_interval=update_time_interval
+      update_interval=update_time_interval,
+      log=log_sink.in_directory(log_dir, agent_name),
   )
 
   return agent
@@ -24,6 +24,7 @@ from concordia.clocks import game_clock
 from concordia.components import agent as agent_components
 from concordia.factory.agent import basic_agent__main_role
 from concordia.language_model import language_model
+from concordia.utils import log_sink
 
 
 def build_agent(
@@ -32,6 +33,7 @@ def build_agent(
     memory: associative_memory.AssociativeMemory,
     clock: game_clock.MultiIntervalClock,
     update_time_interval: datetime.timedelta,
+    log_dir: str | None = None,
 ) -> basic_agent.BasicAgent:
   """Build an agent.
 
@@ -41,6 +43,8 @@ def build_agent(
     memory: The agent's memory object.
     clock: The clock to use.
     update_time_interval: Agent calls update every time this interval passes.
+    log_dir: if not None, the directory to write the agent's log to, keeping
+      only its latest entries in memory.
 
   Returns:
     An agent.
@@ -139,7 +143,8 @@ def build_agent(
       components=[instructions,
                   overarching_goal,
                   information],
-      update_interval=update_time_interval
+      update_interval=update_time_interval,
+      log=log_sink.in_directory(log_dir, agent_name),
   )
 
   return agent
@@ -31,6 +31,7 @@ from concordia.typing import agent as agent_lib
 from concordia.typing import component
 from concordia.typing import scene as scene_lib
 from concordia.utils import html as html_lib
+from concordia.utils import log_sink
 import numpy as np
 
 
@@ -49,6 +50,7 @@ def build_game_master(
     additional_components: Sequence[component.Component] | None = tuple([]),
     npc_context: str = '',
     verbose: bool = False,
+    log_dir: str | None = None,
 ) -> tuple[game_master.GameMaster, associative_memory.AssociativeMemory]:
   """Build a game master (i.e., an environment).
 
@@ -72,10 +74,15 @@ def build_game_master(
       environment.
     npc_context: extra context provided only to non-player characters
     verbose: whether or not to print verbose debug information
+    log_dir: if not None, the directory to write the logs of the game master
+      and its conversations to, keeping only their latest entries in memory.
 
   Returns:
     A tuple consisting of a game master and its memory.
   """
+  game_master_log = log_sink.in_directory(log_dir, 'game_master_log')
+  conversation_log = log_sink.in_directory(log_dir, 'conversation_log')
+
   if memory:
     game_master_memory = memory
   else:
@@ -117,6 +124,7 @@ def build_game_master(
       components=[player_status],
       cap_nonplayer_characters=cap_nonplayer_characters_in_conversation,
       shared_context=f'{shared_context}\n{npc_context}',
+      log=conversation_log,
   )
 
   direct_effect_externality = gm_components.direct_effect.DirectEffect(
@@ -162,6 +170,7 @@ def build_game_master(
       randomise_initiative=True,
       player_observes_event=False,
       verbose=verbose,
+      log=game_master_log,
   )
 
   return env, game_master_memory
@@ -0,0 +1,137 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Wrappers between synchronous and asynchronous language models."""
+
+import asyncio
+from collections.abc import Collection, Coroutine, Mapping, Sequence
+import threading
+from typing import Any, TypeVar
+
+from concordia.language_model import language_model
+from typing_extensions import override
+
+_T = TypeVar('_T')
+
+
+class ThreadedAsyncLanguageModel(language_model.AsyncLanguageModel):
+  """Wraps a synchronous language model so that it can be awaited.
+
+  Calls run in the default executor of the running event loop, a bounded
+  thread pool shared by every caller on that loop. Use this for models that
+  have no native asynchronous implementation, e.g. local models.
+  """
+
+  def __init__(self, model: language_model.LanguageModel) -> None:
+    """Wrap the underlying synchronous language model.
+
+    Args:
+      model: the language model to wrap.
+    """
+    self._model = model
+
+  @override
+  async def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    return await asyncio.to_thread(
+        self._model.sample_text,
+        prompt,
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+        timeout=timeout,
+        seed=seed,
+    )
+
+  @override
+  async def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, Mapping[str, Any]]:
+    return await asyncio.to_thread(
+        self._model.sample_choice, prompt, responses, seed=seed
+    )
+
+
+class SyncLanguageModel(language_model.LanguageModel):
+  """Wraps an asynchronous language model so that it can be called directly.
+
+  This lets synchronous code, e.g. components, share an asynchronous model.
+  Requests run on one event loop in a background thread, so however many
+  threads call the model, their requests are multiplexed over a single loop.
+  The wrapped model must not be used from any other event loop, since
+  asynchronous HTTP clients are bound to the loop they are first used on.
+  """
+
+  def __init__(self, model: language_model.AsyncLanguageModel) -> None:
+    """Wrap the underlying asynchronous language model.
+
+    Args:
+      model: the language model to wrap.
+    """
+    self._model = model
+    self._loop = asyncio.new_event_loop()
+    self._thread = threading.Thread(
+        target=self._loop.run_forever, name='SyncLanguageModel', daemon=True
+    )
+    self._thread.start()
+
+  def _run(self, coroutine: Coroutine[Any, Any, _T]) -> _T:
+    if threading.current_thread() is self._thread:
+      raise RuntimeError('SyncLanguageModel called from its own event loop.')
+    return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+  @override
+  def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    return self._run(
+        self._model.sample_text(
+            prompt,
+            max_tokens=max_tokens,
+            terminators=terminators,
+            temperature=temperature,
+            timeout=timeout,
+            seed=seed,
+        )
+    )
+
+  @override
+  def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, Mapping[str, Any]]:
+    return self._run(self._model.sample_choice(prompt, responses, seed=seed))
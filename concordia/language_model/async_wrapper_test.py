@@ -0,0 +1,55 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for async_wrapper.py."""
+
+import asyncio
+from concurrent import futures
+
+from absl.testing import absltest
+from concordia.language_model import async_wrapper
+from concordia.tests import mock_model
+
+
+class AsyncWrapperTest(absltest.TestCase):
+
+  def test_threaded_model_can_be_awaited(self):
+    model = async_wrapper.ThreadedAsyncLanguageModel(
+        mock_model.MockModel('response')
+    )
+
+    async def sample():
+      return await asyncio.gather(
+          model.sample_text('prompt'),
+          model.sample_choice('prompt', ['a', 'b']),
+      )
+
+    self.assertEqual(asyncio.run(sample()), ['response', (0, 'a', {})])
+
+  def test_async_model_can_be_called_from_many_threads(self):
+    model = async_wrapper.SyncLanguageModel(
+        async_wrapper.ThreadedAsyncLanguageModel(
+            mock_model.MockModel('response')
+        )
+    )
+    with futures.ThreadPoolExecutor(max_workers=8) as executor:
+      responses = list(
+          executor.map(lambda _: model.sample_text('prompt'), range(32))
+      )
+    self.assertEqual(responses, ['response'] * 32)
+    self.assertEqual(model.sample_choice('prompt', ['a', 'b']), (0, 'a', {}))
+
+
+if __name__ == '__main__':
+  absltest.main()
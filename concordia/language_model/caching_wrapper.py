@@ -0,0 +1,239 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Wrapper to cache the responses of an underlying language model.
+
+Simulations send many identical prompts, within a run and across runs, e.g.
+the same multiple choice question at every step or `is_count_noun` for the
+same item. `CachingLanguageModel` memoizes responses keyed by the prompt and
+all the sampling parameters. Responses are kept in an in-memory LRU tier and,
+optionally, in a SQLite database that persists across runs.
+"""
+
+import collections
+from collections.abc import Collection, Mapping, Sequence
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from concordia.language_model import language_model
+from concordia.utils import measurements as measurements_lib
+from typing_extensions import override
+
+DEFAULT_STATS_CHANNEL = 'language_model_cache_stats'
+
+
+def _cache_key(*parts: Any) -> str:
+  serialized = json.dumps(parts, ensure_ascii=False)
+  return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+class _SqliteTier:
+  """Responses stored in a SQLite database, keyed by cache key."""
+
+  def __init__(self, path: str):
+    self._connection = sqlite3.connect(path, check_same_thread=False)
+    with self._connection:
+      self._connection.execute(
+          'CREATE TABLE IF NOT EXISTS responses ('
+          'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)'
+      )
+
+  def get(self, key: str) -> tuple[float, Any] | None:
+    row = self._connection.execute(
+        'SELECT created, value FROM responses WHERE key = ?', (key,)
+    ).fetchone()
+    if row is None:
+      return None
+    created, value = row
+    return created, json.loads(value)
+
+  def put(self, key: str, created: float, value: Any) -> None:
+    with self._connection:
+      self._connection.execute(
+          'INSERT OR REPLACE INTO responses (key, value, created) '
+          'VALUES (?, ?, ?)',
+          (key, json.dumps(value), created),
+      )
+
+  def delete(self, key: str) -> None:
+    with self._connection:
+      self._connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+
+
+class CachingLanguageModel(language_model.LanguageModel):
+  """Wraps an underlying language model and caches its responses.
+
+  Text samples at a non-zero temperature are only cached if a seed is given,
+  since otherwise callers expect a fresh sample on every call. For the same
+  reason choices are only cached if a seed is given: the models served over an
+  API choose by sampling text again at rising temperatures until it names a
+  response, so an unseeded choice may differ from call to call. Models that
+  choose deterministically, e.g. by scoring the responses as
+  `PyTorchGemmaLanguageModel` does, can set `cache_choices_without_seed`.
+  """
+
+  def __init__(
+      self,
+      model: language_model.LanguageModel,
+      *,
+      max_size: int = 10_000,
+      ttl: datetime.timedelta | None = None,
+      cache_path: str | None = None,
+      namespace: str = '',
+      cache_choices_without_seed: bool = False,
+      measurements: measurements_lib.Measurements | None = None,
+      channel: str = DEFAULT_STATS_CHANNEL,
+  ) -> None:
+    """Wrap the underlying language model with a response cache.
+
+    Args:
+      model: A language model to wrap with a cache.
+      max_size: maximum number of responses in the in-memory LRU tier.
+      ttl: if not None, responses older than this are sampled again.
+      cache_path: if not None, responses are also stored in a SQLite database
+        at this path and reused by later runs that use the same path.
+      namespace: included in every cache key. Use e.g. the name of the
+        underlying model so that different models can share a database.
+      cache_choices_without_seed: whether to cache `sample_choice` results
+        when no seed is given. Only set this if the model chooses
+        deterministically.
+      measurements: the measurements object to publish cache hits and misses
+        to.
+      channel: the channel to publish the statistics to.
+    """
+    self._model = model
+    self._max_size = max_size
+    self._ttl = None if ttl is None else ttl.total_seconds()
+    self._namespace = namespace
+    self._cache_choices_without_seed = cache_choices_without_seed
+    self._measurements = measurements
+    self._channel = channel
+    self._memory_tier: collections.OrderedDict[str, tuple[float, Any]] = (
+        collections.OrderedDict()
+    )
+    self._sqlite_tier = _SqliteTier(cache_path) if cache_path else None
+    self._lock = threading.Lock()
+
+  def _is_fresh(self, created: float) -> bool:
+    return self._ttl is None or time.time() - created < self._ttl
+
+  def _lookup(self, key: str) -> Any | None:
+    """Returns the cached value for a key, or None."""
+    with self._lock:
+      entry = self._memory_tier.get(key)
+      if entry is None and self._sqlite_tier is not None:
+        entry = self._sqlite_tier.get(key)
+      if entry is None:
+        return None
+      created, value = entry
+      if not self._is_fresh(created):
+        self._memory_tier.pop(key, None)
+        if self._sqlite_tier is not None:
+          self._sqlite_tier.delete(key)
+        return None
+      self._store_in_memory(key, entry)
+      return value
+
+  def _store_in_memory(self, key: str, entry: tuple[float, Any]) -> None:
+    """Adds an entry to the LRU tier. Assumes lock is held."""
+    self._memory_tier[key] = entry
+    self._memory_tier.move_to_end(key)
+    while len(self._memory_tier) > self._max_size:
+      self._memory_tier.popitem(last=False)
+
+  def _store(self, key: str, value: Any) -> None:
+    created = time.time()
+    with self._lock:
+      self._store_in_memory(key, (created, value))
+      if self._sqlite_tier is not None:
+        try:
+          self._sqlite_tier.put(key, created, value)
+        except TypeError:
+          # The value is not JSON serializable, so only cache it in memory.
+          pass
+
+  def _publish(self, hit: bool) -> None:
+    if self._measurements is not None:
+      self._measurements.publish_datum(
+          self._channel,
+          {'cache_hits': int(hit), 'cache_misses': int(not hit)},
+      )
+
+  @override
+  def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    def _sample_text():
+      return self._model.sample_text(
+          prompt,
+          max_tokens=max_tokens,
+          terminators=terminators,
+          temperature=temperature,
+          timeout=timeout,
+          seed=seed,
+      )
+
+    if temperature != 0 and seed is None:
+      return _sample_text()
+
+    key = _cache_key(
+        self._namespace,
+        'sample_text',
+        prompt,
+        max_tokens,
+        list(terminators),
+        temperature,
+        seed,
+    )
+    response = self._lookup(key)
+    self._publish(hit=response is not None)
+    if response is None:
+      response = _sample_text()
+      self._store(key, response)
+    return response
+
+  @override
+  def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, Mapping[str, Any]]:
+    if seed is None and not self._cache_choices_without_seed:
+      return self._model.sample_choice(prompt, responses, seed=seed)
+
+    key = _cache_key(
+        self._namespace, 'sample_choice', prompt, list(responses), seed
+    )
+    choice = self._lookup(key)
+    self._publish(hit=choice is not None)
+    if choice is None:
+      choice = self._model.sample_choice(prompt, responses, seed=seed)
+      self._store(key, choice)
+    idx, response, info = choice
+    return idx, response, info
@@ -0,0 +1,146 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for caching_wrapper.py."""
+
+import datetime
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from concordia.language_model import caching_wrapper
+from concordia.language_model import language_model
+from concordia.utils import measurements as measurements_lib
+
+
+def _mock_model() -> mock.Mock:
+  model = mock.create_autospec(
+      language_model.LanguageModel, instance=True, spec_set=True
+  )
+  model.sample_text.side_effect = lambda prompt, **kwargs: f'response {prompt}'
+  model.sample_choice.return_value = (1, 'b', {'score': 0.5})
+  return model
+
+
+class CachingLanguageModelTest(absltest.TestCase):
+
+  def test_identical_prompts_are_sampled_once(self):
+    model = _mock_model()
+    measurements = measurements_lib.Measurements()
+    cached = caching_wrapper.CachingLanguageModel(
+        model, measurements=measurements
+    )
+    for _ in range(3):
+      self.assertEqual(
+          cached.sample_text('prompt', temperature=0.0), 'response prompt'
+      )
+    self.assertEqual(model.sample_text.call_count, 1)
+
+    stats = []
+    measurements.get_channel(caching_wrapper.DEFAULT_STATS_CHANNEL).subscribe(
+        on_next=stats.append
+    )
+    self.assertEqual([datum['cache_hits'] for datum in stats], [0, 1, 1])
+
+  def test_parameters_are_part_of_the_key(self):
+    model = _mock_model()
+    cached = caching_wrapper.CachingLanguageModel(model)
+    cached.sample_text('prompt', temperature=0.0)
+    cached.sample_text('prompt', temperature=0.0, max_tokens=10)
+    cached.sample_text('prompt', temperature=0.0, terminators=('\n',))
+    cached.sample_text('prompt', temperature=0.0, seed=1)
+    self.assertEqual(model.sample_text.call_count, 4)
+
+  def test_unseeded_samples_at_non_zero_temperature_are_not_cached(self):
+    model = _mock_model()
+    cached = caching_wrapper.CachingLanguageModel(model)
+    cached.sample_text('prompt', temperature=0.5)
+    cached.sample_text('prompt', temperature=0.5)
+    self.assertEqual(model.sample_text.call_count, 2)
+    cached.sample_text('prompt', temperature=0.5, seed=3)
+    cached.sample_text('prompt', temperature=0.5, seed=3)
+    self.assertEqual(model.sample_text.call_count, 3)
+
+  def test_seeded_choices_are_cached(self):
+    model = _mock_model()
+    cached = caching_wrapper.CachingLanguageModel(model)
+    for _ in range(2):
+      self.assertEqual(
+          cached.sample_choice('prompt', ['a', 'b'], seed=1),
+          (1, 'b', {'score': 0.5}),
+      )
+    self.assertEqual(model.sample_choice.call_count, 1)
+    cached.sample_choice('prompt', ['a', 'b', 'c'], seed=1)
+    self.assertEqual(model.sample_choice.call_count, 2)
+
+  def test_unseeded_choices_are_not_cached(self):
+    model = _mock_model()
+    cached = caching_wrapper.CachingLanguageModel(model)
+    cached.sample_choice('prompt', ['a', 'b'])
+    cached.sample_choice('prompt', ['a', 'b'])
+    self.assertEqual(model.sample_choice.call_count, 2)
+
+  def test_unseeded_choices_of_deterministic_models_are_cached(self):
+    model = _mock_model()
+    cached = caching_wrapper.CachingLanguageModel(
+        model, cache_choices_without_seed=True
+    )
+    cached.sample_choice('prompt', ['a', 'b'])
+    cached.sample_choice('prompt', ['a', 'b'])
+    self.assertEqual(model.sample_choice.call_count, 1)
+
+  def test_lru_eviction(self):
+    model = _mock_model()
+    cached = caching_wrapper.CachingLanguageModel(model, max_size=2)
+    for prompt in ('a', 'b', 'a', 'c', 'a', 'b'):
+      cached.sample_text(prompt, temperature=0.0)
+    # 'b' was evicted when 'c' was added, since 'a' was used more recently.
+    self.assertEqual(model.sample_text.call_count, 4)
+
+  def test_expired_responses_are_sampled_again(self):
+    model = _mock_model()
+    cached = caching_wrapper.CachingLanguageModel(
+        model, ttl=datetime.timedelta(0)
+    )
+    cached.sample_text('prompt', temperature=0.0)
+    cached.sample_text('prompt', temperature=0.0)
+    self.assertEqual(model.sample_text.call_count, 2)
+
+  def test_responses_persist_across_instances(self):
+    cache_dir = self.enter_context(tempfile.TemporaryDirectory())
+    cache_path = os.path.join(cache_dir, 'cache.sqlite')
+    first = caching_wrapper.CachingLanguageModel(
+        _mock_model(), cache_path=cache_path
+    )
+    first.sample_text('prompt', temperature=0.0)
+    first.sample_choice('prompt', ['a', 'b'], seed=1)
+
+    model = _mock_model()
+    second = caching_wrapper.CachingLanguageModel(
+        model, cache_path=cache_path
+    )
+    self.assertEqual(
+        second.sample_text('prompt', temperature=0.0), 'response prompt'
+    )
+    self.assertEqual(
+        second.sample_choice('prompt', ['a', 'b'], seed=1),
+        (1, 'b', {'score': 0.5}),
+    )
+    model.sample_text.assert_not_called()
+    model.sample_choice.assert_not_called()
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,261 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Pooled HTTP clients for models served over HTTP.
+
+Many threads share each model, so its requests should share a bounded pool of
+kept-alive connections rather than open a connection per request. The clients
+made here are thread safe and keep connections alive between requests. Their
+utilization can be published to a measurements channel.
+
+Synchronous clients are sized to the shared thread pool of
+`concordia.utils.concurrency` by default, since each request holds a thread.
+Asynchronous clients serve many coroutines from one thread, so they default to
+`DEFAULT_MAX_ASYNC_CONNECTIONS` instead. Requests beyond the size of a pool wait
+for a connection, and fail with `httpx.PoolTimeout` if none is freed within
+their timeout, so pass `max_connections` to serve more concurrent requests.
+
+HTTP/2 is off by default: it is only used if the `h2` package is installed,
+e.g. with `pip install gdm-concordia[http2]`.
+"""
+
+from collections.abc import AsyncIterator, Iterator
+import importlib.util
+import threading
+import time
+from typing import Any
+
+from concordia.utils import concurrency
+from concordia.utils import measurements as measurements_lib
+import httpx
+
+DEFAULT_STATS_CHANNEL = 'language_model_connection_stats'
+DEFAULT_KEEPALIVE_SECONDS = 60.0
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_MAX_ASYNC_CONNECTIONS = 512
+
+
+class _Utilization:
+  """Counts the requests in progress on a pool and publishes the count."""
+
+  def __init__(
+      self,
+      max_connections: int,
+      measurements: measurements_lib.Measurements | None,
+      channel: str,
+  ):
+    self._max_connections = max_connections
+    self._measurements = measurements
+    self._channel = channel
+    self._lock = threading.Lock()
+    self._in_flight = 0
+
+  def _publish(self, datum: dict[str, Any]) -> None:
+    if self._measurements is not None:
+      self._measurements.publish_datum(self._channel, datum)
+
+  def start(self) -> float:
+    with self._lock:
+      self._in_flight += 1
+      in_flight = self._in_flight
+    self._publish({
+        'in_flight': in_flight,
+        'utilization': in_flight / self._max_connections,
+    })
+    return time.perf_counter()
+
+  def end(self, start: float) -> None:
+    with self._lock:
+      self._in_flight -= 1
+      in_flight = self._in_flight
+    self._publish({
+        'in_flight': in_flight,
+        'utilization': in_flight / self._max_connections,
+        'request_seconds': time.perf_counter() - start,
+    })
+
+
+class _MeasuredStream(httpx.SyncByteStream):
+  """A response body that counts as in progress until it is closed."""
+
+  def __init__(
+      self, stream: httpx.SyncByteStream, utilization: _Utilization, start: float
+  ):
+    self._stream = stream
+    self._utilization = utilization
+    self._start = start
+    self._closed = False
+
+  def __iter__(self) -> Iterator[bytes]:
+    yield from self._stream
+
+  def close(self) -> None:
+    if not self._closed:
+      self._closed = True
+      self._stream.close()
+      self._utilization.end(self._start)
+
+
+class _AsyncMeasuredStream(httpx.AsyncByteStream):
+  """A response body that counts as in progress until it is closed."""
+
+  def __init__(
+      self,
+      stream: httpx.AsyncByteStream,
+      utilization: _Utilization,
+      start: float,
+  ):
+    self._stream = stream
+    self._utilization = utilization
+    self._start = start
+    self._closed = False
+
+  async def __aiter__(self) -> AsyncIterator[bytes]:
+    async for chunk in self._stream:
+      yield chunk
+
+  async def aclose(self) -> None:
+    if not self._closed:
+      self._closed = True
+      await self._stream.aclose()
+      self._utilization.end(self._start)
+
+
+class _MeasuredTransport(httpx.BaseTransport):
+  """Publishes the utilization of the connections of a transport."""
+
+  def __init__(self, transport: httpx.BaseTransport, utilization: _Utilization):
+    self._transport = transport
+    self._utilization = utilization
+
+  def handle_request(self, request: httpx.Request) -> httpx.Response:
+    start = self._utilization.start()
+    try:
+      response = self._transport.handle_request(request)
+    except BaseException:
+      self._utilization.end(start)
+      raise
+    response.stream = _MeasuredStream(
+        response.stream, self._utilization, start
+    )
+    return response
+
+  def close(self) -> None:
+    self._transport.close()
+
+
+class _AsyncMeasuredTransport(httpx.AsyncBaseTransport):
+  """Publishes the utilization of the connections of a transport."""
+
+  def __init__(
+      self, transport: httpx.AsyncBaseTransport, utilization: _Utilization
+  ):
+    self._transport = transport
+    self._utilization = utilization
+
+  async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+    start = self._utilization.start()
+    try:
+      response = await self._transport.handle_async_request(request)
+    except BaseException:
+      self._utilization.end(start)
+      raise
+    response.stream = _AsyncMeasuredStream(
+        response.stream, self._utilization, start
+    )
+    return response
+
+  async def aclose(self) -> None:
+    await self._transport.aclose()
+
+
+def _pool_settings(
+    max_connections: int, http2: bool
+) -> tuple[httpx.Limits, bool]:
+  limits = httpx.Limits(
+      max_connections=max_connections,
+      max_keepalive_connections=max_connections,
+      keepalive_expiry=DEFAULT_KEEPALIVE_SECONDS,
+  )
+  http2 = http2 and importlib.util.find_spec('h2') is not None
+  return limits, http2
+
+
+def make_client(
+    *,
+    base_url: str = '',
+    max_connections: int | None = None,
+    http2: bool = True,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    measurements: measurements_lib.Measurements | None = None,
+    channel: str = DEFAULT_STATS_CHANNEL,
+) -> httpx.Client:
+  """Returns a thread safe HTTP client with a pool of kept-alive connections.
+
+  Args:
+    base_url: the URL that relative request URLs are resolved against.
+    max_connections: the maximum number of connections in the pool. If None,
+      the number of threads in the shared pool of `concurrency`.
+    http2: whether to use HTTP/2 when the `h2` package is installed.
+    timeout: the default timeout of requests, in seconds.
+    measurements: the measurements object to publish the number of requests in
+      progress and their duration to.
+    channel: the channel to publish the statistics to.
+  """
+  if max_connections is None:
+    max_connections = concurrency.get_max_workers()
+  limits, http2 = _pool_settings(max_connections, http2)
+  utilization = _Utilization(max_connections, measurements, channel)
+  return httpx.Client(
+      base_url=base_url,
+      timeout=timeout,
+      transport=_MeasuredTransport(
+          httpx.HTTPTransport(limits=limits, http2=http2), utilization
+      ),
+  )
+
+
+def make_async_client(
+    *,
+    base_url: str = '',
+    max_connections: int | None = None,
+    http2: bool = True,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    measurements: measurements_lib.Measurements | None = None,
+    channel: str = DEFAULT_STATS_CHANNEL,
+) -> httpx.AsyncClient:
+  """Returns an asynchronous HTTP client with a pool of kept-alive connections.
+
+  Args:
+    base_url: the URL that relative request URLs are resolved against.
+    max_connections: the maximum number of connections in the pool. If None,
+      `DEFAULT_MAX_ASYNC_CONNECTIONS`.
+    http2: whether to use HTTP/2 when the `h2` package is installed.
+    timeout: the default timeout of requests, in seconds.
+    measurements: the measurements object to publish the number of requests in
+      progress and their duration to.
+    channel: the channel to publish the statistics to.
+  """
+  if max_connections is None:
+    max_connections = DEFAULT_MAX_ASYNC_CONNECTIONS
+  limits, http2 = _pool_settings(max_connections, http2)
+  utilization = _Utilization(max_connections, measurements, channel)
+  return httpx.AsyncClient(
+      base_url=base_url,
+      timeout=timeout,
+      transport=_AsyncMeasuredTransport(
+          httpx.AsyncHTTPTransport(limits=limits, http2=http2), utilization
+      ),
+  )
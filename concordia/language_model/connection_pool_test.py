@@ -0,0 +1,138 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for connection_pool.py."""
+
+import asyncio
+from concurrent import futures
+from http import server
+import socket
+import threading
+import time
+
+from absl.testing import absltest
+from concordia.language_model import connection_pool
+from concordia.utils import concurrency
+from concordia.utils import measurements as measurements_lib
+import httpx
+
+# Simulates the cost of setting up a connection, e.g. a TLS handshake.
+_CONNECTION_SETUP_SECONDS = 0.02
+
+
+class _Handler(server.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def setup(self):
+    super().setup()
+    # Headers and body are written separately, so do not delay the body.
+    self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    with self.server.lock:
+      self.server.connections += 1
+    time.sleep(_CONNECTION_SETUP_SECONDS)
+
+  def do_GET(self):  # pylint: disable=invalid-name
+    if self.server.barrier is not None:
+      # Answers only once all the requests are in progress together.
+      self.server.barrier.wait()
+    body = b'ok'
+    self.send_response(200)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+class _StubServer(server.ThreadingHTTPServer):
+  daemon_threads = True
+  request_queue_size = 128
+
+  def __init__(self):
+    super().__init__(('127.0.0.1', 0), _Handler)
+    self.lock = threading.Lock()
+    self.connections = 0
+    self.barrier = None
+
+  @property
+  def url(self) -> str:
+    return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class ConnectionPoolTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._server = _StubServer()
+    threading.Thread(target=self._server.serve_forever, daemon=True).start()
+    self.addCleanup(self._server.server_close)
+    self.addCleanup(self._server.shutdown)
+
+  def test_connections_are_reused(self):
+    num_calls = 10
+    start = time.perf_counter()
+    for _ in range(num_calls):
+      httpx.get(self._server.url)
+    unpooled_seconds = time.perf_counter() - start
+    self.assertEqual(self._server.connections, num_calls)
+
+    client = connection_pool.make_client(base_url=self._server.url)
+    self.addCleanup(client.close)
+    start = time.perf_counter()
+    for _ in range(num_calls):
+      self.assertEqual(client.get('/').text, 'ok')
+    pooled_seconds = time.perf_counter() - start
+    self.assertEqual(self._server.connections, num_calls + 1)
+    self.assertLess(pooled_seconds, unpooled_seconds / 2)
+
+  def test_concurrent_requests_share_the_pool(self):
+    measurements = measurements_lib.Measurements()
+    client = connection_pool.make_client(
+        base_url=self._server.url, max_connections=4, measurements=measurements
+    )
+    self.addCleanup(client.close)
+    with futures.ThreadPoolExecutor(max_workers=4) as executor:
+      responses = list(executor.map(lambda _: client.get('/'), range(64)))
+    self.assertTrue(all(response.text == 'ok' for response in responses))
+    self.assertLessEqual(self._server.connections, 4)
+
+    stats = []
+    measurements.get_channel(connection_pool.DEFAULT_STATS_CHANNEL).subscribe(
+        on_next=stats.append
+    )
+    durations = [datum for datum in stats if 'request_seconds' in datum]
+    self.assertLen(durations, 64)
+    self.assertEqual(stats[-1]['in_flight'], 0)
+    self.assertLessEqual(max(datum['utilization'] for datum in stats), 1)
+
+  def test_async_pool_is_not_limited_by_the_thread_pool(self):
+    num_requests = concurrency.get_max_workers() + 8
+    self._server.barrier = threading.Barrier(num_requests, timeout=10)
+
+    async def get_concurrently():
+      async with connection_pool.make_async_client(
+          base_url=self._server.url, timeout=30
+      ) as client:
+        return await asyncio.gather(
+            *(client.get('/') for _ in range(num_requests))
+        )
+
+    responses = asyncio.run(get_concurrently())
+    self.assertTrue(all(response.text == 'ok' for response in responses))
+    self.assertEqual(self._server.connections, num_requests)
+
+
+if __name__ == '__main__':
+  absltest.main()
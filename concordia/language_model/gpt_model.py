@@ -15,17 +15,121 @@
 
 """Language Model that uses OpenAI's GPT models."""
 
-from collections.abc import Collection, Sequence
+from collections.abc import AsyncIterator, Callable, Collection, Iterator, Sequence
+from typing import Any
+
+from concordia.language_model import connection_pool
 from concordia.language_model import language_model
+from concordia.language_model import multiple_choice
 from concordia.utils import measurements as measurements_lib
 from concordia.utils import sampling
 import openai
 from typing_extensions import override
 
-_MAX_MULTIPLE_CHOICE_ATTEMPTS = 20
+
+def _make_messages(prompt: str) -> list[dict[str, str]]:
+  """Returns the chat messages that ask the model to continue the prompt."""
+  return [
+      {'role': 'system',
+       'content': ('You always continue sentences provided ' +
+                   'by the user and you never repeat what ' +
+                   'the user already said.')},
+      {'role': 'user',
+       'content': 'Question: Is Jake a turtle?\nAnswer: Jake is '},
+      {'role': 'assistant',
+       'content': 'not a turtle.'},
+      {'role': 'user',
+       'content': ('Question: What is Priya doing right now?\nAnswer: ' +
+                   'Priya is currently ')},
+      {'role': 'assistant',
+       'content': 'sleeping.'},
+      {'role': 'user',
+       'content': prompt}
+  ]
+
+
+def _stream_content(
+    client: openai.OpenAI, request: dict[str, Any]
+) -> Iterator[str]:
+  """Yields the text of a streamed completion, closing it when done.
+
+  The request is only sent once iteration starts, so that a stream that is
+  never read does not hold a connection.
+
+  Args:
+    client: the client to send the request with.
+    request: the arguments of the request.
+  """
+  with client.chat.completions.create(**request) as stream:
+    for chunk in stream:
+      if chunk.choices and chunk.choices[0].delta.content:
+        yield chunk.choices[0].delta.content
+
+
+async def _astream_content(
+    stream: openai.AsyncStream[openai.types.chat.ChatCompletionChunk],
+) -> AsyncIterator[str]:
+  """Yields the text of a streamed completion, closing it when done."""
+  async with stream:
+    async for chunk in stream:
+      if chunk.choices and chunk.choices[0].delta.content:
+        yield chunk.choices[0].delta.content
+
+
+def _make_choice_prompt(prompt: str, responses: Sequence[str]) -> str:
+  return (
+      prompt
+      + '\nRespond EXACTLY with one of the following strings:\n'
+      + '\n'.join(responses) + '.'
+  )
+
+
+class _GptModel:
+  """What the synchronous and asynchronous GPT models share."""
+
+  def __init__(
+      self,
+      model_name: str,
+      measurements: measurements_lib.Measurements | None,
+      channel: str,
+  ):
+    self._model_name = model_name
+    self._measurements = measurements
+    self._channel = channel
+
+  def _request(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int,
+      terminators: Collection[str],
+      temperature: float,
+      timeout: float,
+      seed: int | None,
+  ) -> dict[str, Any]:
+    """Returns the arguments of a streamed request to sample text."""
+    # gpt models do not support `max_tokens` > 4096.
+    max_tokens = min(max_tokens, 4000)
+    return dict(
+        model=self._model_name,
+        messages=_make_messages(prompt),
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        stop=terminators,
+        seed=seed,
+        stream=True,
+    )
+
+  def _publish_text_length(self, response: str) -> None:
+    if self._measurements is not None:
+      self._measurements.publish_datum(
+          self._channel,
+          {'raw_text_length': len(response)},
+      )
 
 
-class GptLanguageModel(language_model.LanguageModel):
+class GptLanguageModel(_GptModel, language_model.LanguageModel):
   """Language Model that uses OpenAI GPT models."""
 
   def __init__(
@@ -34,6 +138,7 @@ class GptLanguageModel(language_model.LanguageModel):
       model_name: str,
       measurements: measurements_lib.Measurements | None = None,
       channel: str = language_model.DEFAULT_STATS_CHANNEL,
+      max_connections: int | None = None,
   ):
     """Initializes the instance.
 
@@ -41,15 +146,20 @@ class GptLanguageModel(language_model.LanguageModel):
       api_key: The API key to use when accessing the OpenAI API.
       model_name: The language model to use. For more details, see
         https://platform.openai.com/docs/guides/text-generation/which-model-should-i-use.
-      measurements: The measurements object to log usage statistics to.
+      measurements: The measurements object to log usage statistics to. The
+        utilization of the connections is published to
+        `connection_pool.DEFAULT_STATS_CHANNEL`.
       channel: The channel to write the statistics to.
+      max_connections: The maximum number of connections kept open to the API.
+        If None, the number of threads in the shared thread pool.
     """
+    super().__init__(model_name, measurements, channel)
     self._api_key = api_key
-    self._model_name = model_name
-    self._measurements = measurements
-    self._channel = channel
     self._client = openai.OpenAI(
         api_key=api_key,
+        http_client=connection_pool.make_client(
+            max_connections=max_connections, measurements=measurements
+        ),
     )
 
   @override
@@ -63,43 +173,43 @@ class GptLanguageModel(language_model.LanguageModel):
       timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
       seed: int | None = None,
   ) -> str:
-    # gpt models do not support `max_tokens` > 4096.
-    max_tokens = min(max_tokens, 4000)
+    response = ''.join(
+        self.sample_text_stream(
+            prompt,
+            max_tokens=max_tokens,
+            terminators=terminators,
+            temperature=temperature,
+            timeout=timeout,
+            seed=seed,
+        )
+    )
+    self._publish_text_length(response)
+    return response
 
-    messages = [
-        {'role': 'system',
-         'content': ('You always continue sentences provided ' +
-                     'by the user and you never repeat what ' +
-                     'the user already said.')},
-        {'role': 'user',
-         'content': 'Question: Is Jake a turtle?\nAnswer: Jake is '},
-        {'role': 'assistant',
-         'content': 'not a turtle.'},
-        {'role': 'user',
-         'content': ('Question: What is Priya doing right now?\nAnswer: ' +
-                     'Priya is currently ')},
-        {'role': 'assistant',
-         'content': 'sleeping.'},
-        {'role': 'user',
-         'content': prompt}
-    ]
-
-    response = self._client.chat.completions.create(
-        model=self._model_name,
-        messages=messages,
-        temperature=temperature,
+  @override
+  def sample_text_stream(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+      stop: Callable[[str], bool] | None = None,
+  ) -> Iterator[str]:
+    request = self._request(
+        prompt,
         max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
         timeout=timeout,
-        stop=terminators,
         seed=seed,
     )
-
-    if self._measurements is not None:
-      self._measurements.publish_datum(
-          self._channel,
-          {'raw_text_length': len(response.choices[0].message.content)},
-      )
-    return response.choices[0].message.content
+    # Closing the stream ends the request, so the model stops generating.
+    return sampling.stream_until(
+        _stream_content(self._client, request), terminators, stop
+    )
 
   @override
   def sample_choice(
@@ -109,38 +219,95 @@ class GptLanguageModel(language_model.LanguageModel):
       *,
       seed: int | None = None,
   ) -> tuple[int, str, dict[str, float]]:
-    prompt = (
-        prompt
-        + '\nRespond EXACTLY with one of the following strings:\n'
-        + '\n'.join(responses) + '.'
+    prompt = _make_choice_prompt(prompt, responses)
+    return multiple_choice.sample_by_retrying(
+        lambda temperature: self.sample_text(
+            prompt, temperature=temperature, seed=seed
+        ),
+        responses,
+        measurements=self._measurements,
+        channel=self._channel,
     )
 
-    sample = ''
-    answer = ''
-    for attempts in range(_MAX_MULTIPLE_CHOICE_ATTEMPTS):
-      # Increase temperature after the first failed attempt.
-      temperature = sampling.dynamically_adjust_temperature(
-          attempts, _MAX_MULTIPLE_CHOICE_ATTEMPTS)
-
-      sample = self.sample_text(
-          prompt,
-          temperature=temperature,
-          seed=seed,
-      )
-      answer = sampling.extract_choice_response(sample)
-      try:
-        idx = responses.index(answer)
-      except ValueError:
-        continue
-      else:
-        if self._measurements is not None:
-          self._measurements.publish_datum(
-              self._channel, {'choices_calls': attempts}
-          )
-        debug = {}
-        return idx, responses[idx], debug
-
-    raise language_model.InvalidResponseError(
-        (f'Too many multiple choice attempts.\nLast attempt: {sample}, ' +
-         f'extracted: {answer}')
+
+class AsyncGptLanguageModel(_GptModel, language_model.AsyncLanguageModel):
+  """Asynchronous Language Model that uses OpenAI GPT models."""
+
+  def __init__(
+      self,
+      api_key: str,
+      model_name: str,
+      measurements: measurements_lib.Measurements | None = None,
+      channel: str = language_model.DEFAULT_STATS_CHANNEL,
+      max_connections: int | None = None,
+  ):
+    """Initializes the instance.
+
+    Args:
+      api_key: The API key to use when accessing the OpenAI API.
+      model_name: The language model to use. For more details, see
+        https://platform.openai.com/docs/guides/text-generation/which-model-should-i-use.
+      measurements: The measurements object to log usage statistics to. The
+        utilization of the connections is published to
+        `connection_pool.DEFAULT_STATS_CHANNEL`.
+      channel: The channel to write the statistics to.
+      max_connections: The maximum number of connections kept open to the API.
+        If None, `connection_pool.DEFAULT_MAX_ASYNC_CONNECTIONS`.
+    """
+    super().__init__(model_name, measurements, channel)
+    self._api_key = api_key
+    self._client = openai.AsyncOpenAI(
+        api_key=api_key,
+        http_client=connection_pool.make_async_client(
+            max_connections=max_connections, measurements=measurements
+        ),
+    )
+
+  @override
+  async def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    stream = await self._client.chat.completions.create(
+        **self._request(
+            prompt,
+            max_tokens=max_tokens,
+            terminators=terminators,
+            temperature=temperature,
+            timeout=timeout,
+            seed=seed,
+        )
+    )
+    # Closing the stream ends the request, so the model stops generating.
+    response = ''.join([
+        chunk
+        async for chunk in sampling.astream_until(
+            _astream_content(stream), terminators
+        )
+    ])
+    self._publish_text_length(response)
+    return response
+
+  @override
+  async def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, dict[str, float]]:
+    prompt = _make_choice_prompt(prompt, responses)
+    return await multiple_choice.sample_by_retrying_async(
+        lambda temperature: self.sample_text(
+            prompt, temperature=temperature, seed=seed
+        ),
+        responses,
+        measurements=self._measurements,
+        channel=self._channel,
     )
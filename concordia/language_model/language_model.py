@@ -16,9 +16,11 @@
 """Base class for a language model."""
 
 import abc
-from collections.abc import Collection, Mapping, Sequence
+from collections.abc import Callable, Collection, Iterator, Mapping, Sequence
 from typing import Any
 
+from concordia.utils import sampling
+
 DEFAULT_TEMPERATURE = 0.5
 DEFAULT_TERMINATORS = ()
 DEFAULT_TIMEOUT_SECONDS = 60
@@ -68,6 +70,53 @@ class LanguageModel(metaclass=abc.ABCMeta):
     """
     raise NotImplementedError
 
+  def sample_text_stream(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = DEFAULT_TERMINATORS,
+      temperature: float = DEFAULT_TEMPERATURE,
+      timeout: float = DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+      stop: Callable[[str], bool] | None = None,
+  ) -> Iterator[str]:
+    """Samples text from the model, yielding it as it is generated.
+
+    Generation is aborted as soon as the response reaches a terminator, `stop`
+    returns True or the caller closes the iterator, for models that support
+    streaming. Models that do should implement `sample_text` by joining this
+    stream. The default implementation yields the response of `sample_text`.
+    Nothing is requested until the stream is first iterated, so a stream that
+    is never read holds no connection and costs no generation.
+
+    Args:
+      prompt: the initial text to condition on.
+      max_tokens: the maximum number of tokens in the response.
+      terminators: the response will be terminated before any of these
+        characters.
+      temperature: temperature for the model.
+      timeout: timeout for the request.
+      seed: optional seed for the sampling. If None a random seed will be used.
+      stop: optional predicate, called with the response so far after each
+        chunk. Once it returns True the response ends.
+
+    Yields:
+      Consecutive chunks of the sampled response.
+
+    Raises:
+      TimeoutError: if the operation times out.
+    """
+    response = self.sample_text(
+        prompt,
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+        timeout=timeout,
+        seed=seed,
+    )
+    yield from sampling.stream_until([response], terminators, stop)
+
   @abc.abstractmethod
   def sample_choice(
       self,
@@ -95,3 +144,37 @@ class LanguageModel(metaclass=abc.ABCMeta):
         a number of times.
     """
     raise NotImplementedError
+
+
+class AsyncLanguageModel(metaclass=abc.ABCMeta):
+  """Language model with coroutine sampling methods.
+
+  The asynchronous counterpart of `LanguageModel`, for models whose requests
+  can be awaited, so that many requests can be in flight on a single event loop
+  without a thread per request.
+  """
+
+  @abc.abstractmethod
+  async def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = DEFAULT_TERMINATORS,
+      temperature: float = DEFAULT_TEMPERATURE,
+      timeout: float = DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    """Samples text from the model, see `LanguageModel.sample_text`."""
+    raise NotImplementedError
+
+  @abc.abstractmethod
+  async def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, Mapping[str, Any]]:
+    """Samples a response, see `LanguageModel.sample_choice`."""
+    raise NotImplementedError
@@ -16,66 +16,88 @@
 """Language Model wrapper for Mistral models."""
 
 from collections.abc import Collection, Sequence
+from typing import Any
+
 from concordia.language_model import language_model
+from concordia.language_model import multiple_choice
 from concordia.utils import measurements as measurements_lib
-from concordia.utils import sampling
+from mistralai.async_client import MistralAsyncClient
 from mistralai.client import MistralClient
 from mistralai.models.chat_completion import ChatMessage
 from typing_extensions import override
 
-_MAX_MULTIPLE_CHOICE_ATTEMPTS = 20
-
 # At least one Mistral model supports completion mode.
 COMPLETION_MODELS = (
     'codestral-latest',
 )
 
 
-class MistralLanguageModel(language_model.LanguageModel):
-  """Language Model wrapper that uses Mistral models."""
+def _make_messages(prompt: str) -> list[ChatMessage]:
+  """Returns the chat messages that ask the model to continue the prompt."""
+  return [
+      ChatMessage(role='system',
+                  content=('You always continue sentences provided ' +
+                           'by the user and you never repeat what ' +
+                           'the user already said.')),
+      ChatMessage(role='user',
+                  content='Question: Is Jake a turtle?\nAnswer: Jake is '),
+      ChatMessage(role='assistant',
+                  content='not a turtle.'),
+      ChatMessage(role='user',
+                  content=('Question: What is Priya doing right '
+                           'now?\nAnswer: Priya is currently ')),
+      ChatMessage(role='assistant',
+                  content='sleeping.'),
+      ChatMessage(role='user',
+                  content=prompt)
+  ]
+
+
+def _make_choice_prompt(prompt: str, responses: Sequence[str]) -> str:
+  return prompt + '\nChoose one:\n' + '\n'.join(responses) + '\nchoice=('
+
+
+def _trim_completion(result: str) -> str:
+  """Removes the occasional sentence fragment from the end of the result."""
+  last_stop = result.rfind('.')
+  if last_stop >= 0:
+    result = result[:last_stop + 1]
+  return result
+
+
+# The name of the client method to call, and its arguments.
+_Request = tuple[str, dict[str, Any]]
+
+
+class _MistralModel:
+  """What the synchronous and asynchronous Mistral models share."""
 
   def __init__(
       self,
-      api_key: str,
       model_name: str,
-      measurements: measurements_lib.Measurements | None = None,
-      channel: str = language_model.DEFAULT_STATS_CHANNEL,
+      measurements: measurements_lib.Measurements | None,
+      channel: str,
   ):
-    """Initializes the instance.
-
-    Args:
-      api_key: The API key to use when accessing the OpenAI API.
-      model_name: The language model to use. For more details, see
-        https://docs.mistral.ai/getting-started/models/.
-      measurements: The measurements object to log usage statistics to.
-      channel: The channel to write the statistics to.
-    """
-    self._api_key = api_key
     self._model_name = model_name
     self._measurements = measurements
     self._channel = channel
-    self._client = MistralClient(api_key=api_key)
-
-    self._completion = False
-    if self._model_name in COMPLETION_MODELS:
-      self._completion = True
+    self._completion = self._model_name in COMPLETION_MODELS
 
-  def _complete_text(
+  def _complete_request(
       self,
       prompt: str,
       *,
-      suffix: str | None = None,
-      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
-      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
-      temperature: float = language_model.DEFAULT_TEMPERATURE,
-      seed: int | None = None,
-  ) -> str:
+      suffix: str | None,
+      max_tokens: int,
+      terminators: Collection[str],
+      temperature: float,
+      seed: int | None,
+  ) -> _Request:
     if not terminators:
       # It is essential to set a terminator since these models otherwise always
       # continue till max_tokens.
       terminators = ('\n\n',)
-
-    response = self._client.completion(
+    return 'completion', dict(
         model=self._model_name,
         prompt=prompt,
         suffix=suffix,
@@ -85,91 +107,128 @@ class MistralLanguageModel(language_model.LanguageModel):
         random_seed=seed,
     )
 
-    result = response.choices[0].message.content
-
-    if self._measurements is not None:
-      self._measurements.publish_datum(
-          self._channel,
-          {'raw_text_length': len(result)},
-      )
-    # Remove the occasional sentence fragment from the end of the result.
-    last_stop = result.rfind('.')
-    if last_stop >= 0:
-      result = result[:last_stop + 1]
-    return result
-
-  def _chat_text(
+  def _chat_request(
       self,
       prompt: str,
       *,
-      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
-      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
-      temperature: float = language_model.DEFAULT_TEMPERATURE,
-      seed: int | None = None,
-  ) -> str:
-    del terminators
-    messages = [
-        ChatMessage(role='system',
-                    content=('You always continue sentences provided ' +
-                             'by the user and you never repeat what ' +
-                             'the user already said.')),
-        ChatMessage(role='user',
-                    content='Question: Is Jake a turtle?\nAnswer: Jake is '),
-        ChatMessage(role='assistant',
-                    content='not a turtle.'),
-        ChatMessage(role='user',
-                    content=('Question: What is Priya doing right '
-                             'now?\nAnswer: Priya is currently ')),
-        ChatMessage(role='assistant',
-                    content='sleeping.'),
-        ChatMessage(role='user',
-                    content=prompt)
-    ]
-    response = self._client.chat(
+      max_tokens: int,
+      temperature: float,
+      seed: int | None,
+  ) -> _Request:
+    return 'chat', dict(
         model=self._model_name,
-        messages=messages,
+        messages=_make_messages(prompt),
         temperature=temperature,
         max_tokens=max_tokens,
         random_seed=seed,
     )
-    return response.choices[0].message.content
 
-  @override
-  def sample_text(
+  def _text_request(
       self,
       prompt: str,
       *,
-      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
-      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
-      temperature: float = language_model.DEFAULT_TEMPERATURE,
-      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
-      seed: int | None = None,
-  ) -> str:
-    del timeout
-
+      max_tokens: int,
+      terminators: Collection[str],
+      temperature: float,
+      seed: int | None,
+  ) -> _Request:
+    """Returns the request to sample text."""
     if self._completion:
-      response = self._complete_text(
-          prompt=prompt,
+      return self._complete_request(
+          prompt,
           suffix='.\n',
           max_tokens=max_tokens,
           terminators=terminators,
           temperature=temperature,
           seed=seed,
       )
-    else:
-      response = self._chat_text(
-          prompt=prompt,
-          max_tokens=max_tokens,
-          terminators=terminators,
+    return self._chat_request(
+        prompt, max_tokens=max_tokens, temperature=temperature, seed=seed
+    )
+
+  def _choice_request(
+      self, prompt: str, *, temperature: float, seed: int | None
+  ) -> _Request:
+    """Returns the request of an attempt to sample a choice."""
+    if self._completion:
+      return self._complete_request(
+          prompt,
+          suffix=')',
+          max_tokens=256,
+          terminators=(' ', '\n'),
           temperature=temperature,
           seed=seed,
       )
+    return self._chat_request(
+        prompt, max_tokens=3, temperature=temperature, seed=seed
+    )
 
+  def _parse_response(self, method: str, response: Any) -> str:
+    """Returns the text of the response to a request."""
+    result = response.choices[0].message.content
+    if method != 'completion':
+      return result
+    self._publish_text_length(result)
+    return _trim_completion(result)
+
+  def _publish_text_length(self, response: str) -> None:
     if self._measurements is not None:
       self._measurements.publish_datum(
           self._channel,
           {'raw_text_length': len(response)},
       )
+
+
+class MistralLanguageModel(_MistralModel, language_model.LanguageModel):
+  """Language Model wrapper that uses Mistral models."""
+
+  def __init__(
+      self,
+      api_key: str,
+      model_name: str,
+      measurements: measurements_lib.Measurements | None = None,
+      channel: str = language_model.DEFAULT_STATS_CHANNEL,
+  ):
+    """Initializes the instance.
+
+    Args:
+      api_key: The API key to use when accessing the OpenAI API.
+      model_name: The language model to use. For more details, see
+        https://docs.mistral.ai/getting-started/models/.
+      measurements: The measurements object to log usage statistics to.
+      channel: The channel to write the statistics to.
+    """
+    super().__init__(model_name, measurements, channel)
+    self._api_key = api_key
+    self._client = MistralClient(api_key=api_key)
+
+  def _sample(self, request: _Request) -> str:
+    method, arguments = request
+    response = getattr(self._client, method)(**arguments)
+    return self._parse_response(method, response)
+
+  @override
+  def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    del timeout
+    response = self._sample(
+        self._text_request(
+            prompt,
+            max_tokens=max_tokens,
+            terminators=terminators,
+            temperature=temperature,
+            seed=seed,
+        )
+    )
+    self._publish_text_length(response)
     return response
 
   @override
@@ -180,50 +239,85 @@ class MistralLanguageModel(language_model.LanguageModel):
       *,
       seed: int | None = None,
   ) -> tuple[int, str, dict[str, float]]:
-    prompt = (
-        prompt
-        + '\nChoose one:\n'
-        + '\n'.join(responses)
-        + '\nchoice=('
+    prompt = _make_choice_prompt(prompt, responses)
+    return multiple_choice.sample_by_retrying(
+        lambda temperature: self._sample(
+            self._choice_request(prompt, temperature=temperature, seed=seed)
+        ),
+        responses,
+        measurements=self._measurements,
+        channel=self._channel,
     )
 
-    sample = ''
-    answer = ''
-    for attempts in range(_MAX_MULTIPLE_CHOICE_ATTEMPTS):
-      # Increase temperature after the first failed attempt.
-      temperature = sampling.dynamically_adjust_temperature(
-          attempts, _MAX_MULTIPLE_CHOICE_ATTEMPTS)
-
-      if self._completion:
-        sample = self._complete_text(
-            prompt=prompt,
-            suffix=')',
-            max_tokens=256,
-            terminators=(' ', '\n'),
-            temperature=temperature,
-            seed=seed,
-        )
-      else:
-        sample = self._chat_text(
+
+class AsyncMistralLanguageModel(
+    _MistralModel, language_model.AsyncLanguageModel
+):
+  """Asynchronous Language Model wrapper that uses Mistral models."""
+
+  def __init__(
+      self,
+      api_key: str,
+      model_name: str,
+      measurements: measurements_lib.Measurements | None = None,
+      channel: str = language_model.DEFAULT_STATS_CHANNEL,
+  ):
+    """Initializes the instance.
+
+    Args:
+      api_key: The API key to use when accessing the Mistral API.
+      model_name: The language model to use. For more details, see
+        https://docs.mistral.ai/getting-started/models/.
+      measurements: The measurements object to log usage statistics to.
+      channel: The channel to write the statistics to.
+    """
+    super().__init__(model_name, measurements, channel)
+    self._api_key = api_key
+    self._client = MistralAsyncClient(api_key=api_key)
+
+  async def _sample(self, request: _Request) -> str:
+    method, arguments = request
+    response = await getattr(self._client, method)(**arguments)
+    return self._parse_response(method, response)
+
+  @override
+  async def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    del timeout
+    response = await self._sample(
+        self._text_request(
             prompt,
-            max_tokens=3,
+            max_tokens=max_tokens,
+            terminators=terminators,
             temperature=temperature,
             seed=seed,
         )
-      answer = sampling.extract_choice_response(sample)
-      try:
-        idx = responses.index(answer)
-      except ValueError:
-        continue
-      else:
-        if self._measurements is not None:
-          self._measurements.publish_datum(
-              self._channel, {'choices_calls': attempts}
-          )
-        debug = {}
-        return idx, responses[idx], debug
-
-    raise language_model.InvalidResponseError(
-        (f'Too many multiple choice attempts.\nLast attempt: {sample}, ' +
-         f'extracted: {answer}')
+    )
+    self._publish_text_length(response)
+    return response
+
+  @override
+  async def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, dict[str, float]]:
+    prompt = _make_choice_prompt(prompt, responses)
+    return await multiple_choice.sample_by_retrying_async(
+        lambda temperature: self._sample(
+            self._choice_request(prompt, temperature=temperature, seed=seed)
+        ),
+        responses,
+        measurements=self._measurements,
+        channel=self._channel,
     )
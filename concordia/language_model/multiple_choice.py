@@ -0,0 +1,116 @@
+# Copyright 2024 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Multiple choice by sampling text until it names one of the responses.
+
+Models served over an API cannot score responses, so they sample text and
+extract a choice from it, retrying at increasing temperatures until the choice
+is one of the responses. The synchronous and asynchronous models share these
+attempts, which only differ in how the text is sampled.
+"""
+
+from collections.abc import Awaitable, Callable, Generator, Sequence
+
+from concordia.language_model import language_model
+from concordia.utils import measurements as measurements_lib
+from concordia.utils import sampling
+
+MAX_ATTEMPTS = 20
+
+_Choice = tuple[int, str, dict[str, float]]
+
+
+def _attempts(
+    responses: Sequence[str],
+    max_attempts: int,
+    measurements: measurements_lib.Measurements | None,
+    channel: str,
+) -> Generator[float, str, _Choice]:
+  """Yields the temperature of each attempt, and is sent the sampled text."""
+  sample = ''
+  answer = ''
+  for attempts in range(max_attempts):
+    # Increase temperature after the first failed attempt.
+    temperature = sampling.dynamically_adjust_temperature(
+        attempts, max_attempts)
+
+    sample = yield temperature
+    answer = sampling.extract_choice_response(sample)
+    try:
+      idx = responses.index(answer)
+    except ValueError:
+      continue
+    else:
+      if measurements is not None:
+        measurements.publish_datum(channel, {'choices_calls': attempts})
+      debug = {}
+      return idx, responses[idx], debug
+
+  raise language_model.InvalidResponseError(
+      (f'Too many multiple choice attempts.\nLast attempt: {sample}, ' +
+       f'extracted: {answer}')
+  )
+
+
+def sample_by_retrying(
+    sample: Callable[[float], str],
+    responses: Sequence[str],
+    *,
+    max_attempts: int = MAX_ATTEMPTS,
+    measurements: measurements_lib.Measurements | None = None,
+    channel: str = language_model.DEFAULT_STATS_CHANNEL,
+) -> _Choice:
+  """Samples text until it names one of the responses.
+
+  Args:
+    sample: samples text at the given temperature, for the model to name its
+      choice in.
+    responses: the responses to choose from.
+    max_attempts: the number of attempts after which to give up.
+    measurements: if not None, the number of failed attempts is published to
+      it.
+    channel: the channel to publish to.
+
+  Returns:
+    (index, response, info), as for `LanguageModel.sample_choice`.
+
+  Raises:
+    InvalidResponseError: if none of the attempts named a response.
+  """
+  attempts = _attempts(responses, max_attempts, measurements, channel)
+  try:
+    temperature = next(attempts)
+    while True:
+      temperature = attempts.send(sample(temperature))
+  except StopIteration as stop:
+    return stop.value
+
+
+async def sample_by_retrying_async(
+    sample: Callable[[float], Awaitable[str]],
+    responses: Sequence[str],
+    *,
+    max_attempts: int = MAX_ATTEMPTS,
+    measurements: measurements_lib.Measurements | None = None,
+    channel: str = language_model.DEFAULT_STATS_CHANNEL,
+) -> _Choice:
+  """Asynchronous version of `sample_by_retrying`, for awaited samples."""
+  attempts = _attempts(responses, max_attempts, measurements, channel)
+  try:
+    temperature = next(attempts)
+    while True:
+      temperature = attempts.send(await sample(temperature))
+  except StopIteration as stop:
+    return stop.value
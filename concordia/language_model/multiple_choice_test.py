@@ -0,0 +1,70 @@
+# Copyright 2024 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for multiple_choice.py."""
+
+import asyncio
+
+from absl.testing import absltest
+from concordia.language_model import language_model
+from concordia.language_model import multiple_choice
+from concordia.utils import measurements as measurements_lib
+
+
+class SampleByRetryingTest(absltest.TestCase):
+
+  def test_retries_until_a_response_is_named(self):
+    samples = iter(['I am not sure.', '(d)', 'b)'])
+    temperatures = []
+
+    def sample(temperature):
+      temperatures.append(temperature)
+      return next(samples)
+
+    measurements = measurements_lib.Measurements()
+    choice = multiple_choice.sample_by_retrying(
+        sample, ['a', 'b', 'c'], measurements=measurements, channel='stats'
+    )
+    self.assertEqual(choice, (1, 'b', {}))
+    self.assertEqual(temperatures, [0.0, 0.0, 0.5])
+    stats = []
+    measurements.get_channel('stats').subscribe(on_next=stats.append)
+    self.assertEqual(stats, [{'choices_calls': 2}])
+
+  def test_gives_up_after_max_attempts(self):
+    calls = []
+
+    def sample(temperature):
+      calls.append(temperature)
+      return 'no choice here'
+
+    with self.assertRaises(language_model.InvalidResponseError):
+      multiple_choice.sample_by_retrying(sample, ['a', 'b'], max_attempts=3)
+    self.assertLen(calls, 3)
+
+  def test_async(self):
+    samples = iter(['(z)', '(a)'])
+
+    async def sample(temperature):
+      del temperature
+      return next(samples)
+
+    choice = asyncio.run(
+        multiple_choice.sample_by_retrying_async(sample, ['a', 'b'])
+    )
+    self.assertEqual(choice, (0, 'a', {}))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -12,18 +12,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Ollama Language Model, a wrapper for models running on the local machine."""
+"""Ollama Language Model, a wrapper for models running on the local machine.
 
-from collections.abc import Collection, Sequence
+Requests go to the REST API of the Ollama server, and pass on `max_tokens` as
+the number of tokens to predict, as well as the seed and timeout, so responses
+are at most `max_tokens` long.
 
+Every request sends the whole prompt. Questions about an `InteractiveDocument`
+still only cost the model the text added since the previous question, since
+the server keeps the keys and values of its recent prompts and reuses their
+longest common prefix with a new one. The `context` that `/api/generate`
+returns is not sent back: the server would wrap the new text in another chat
+turn after it, so the model would not see the same prompt, and the parameter
+is deprecated.
+"""
+
+from collections.abc import AsyncIterator, Callable, Collection, Iterator, Sequence
+import json
+from typing import Any
+
+from concordia.language_model import connection_pool
 from concordia.language_model import language_model
+from concordia.language_model import multiple_choice
 from concordia.utils import measurements as measurements_lib
 from concordia.utils import sampling
-from langchain import llms
+import httpx
 
 from typing_extensions import override
 
-_MAX_MULTIPLE_CHOICE_ATTEMPTS = 20
 _DEFAULT_TEMPERATURE = 0.5
 _DEFAULT_TERMINATORS = ()
 _DEFAULT_SYSTEM_MESSAGE = (
@@ -31,9 +47,119 @@ _DEFAULT_SYSTEM_MESSAGE = (
     'when you see \'Bob is\', you should continue the sentence after '
     'the word \'is\'.'
 )
+DEFAULT_BASE_URL = 'http://localhost:11434'
+
+
+def _make_request(
+    model_name: str,
+    prompt: str,
+    *,
+    max_tokens: int,
+    terminators: Sequence[str],
+    temperature: float,
+    seed: int | None,
+) -> dict[str, Any]:
+  """Returns the body of a streamed request to Ollama's generate endpoint."""
+  options = {
+      'num_predict': max_tokens,
+      'stop': list(terminators),
+      'temperature': temperature,
+  }
+  if seed is not None:
+    options['seed'] = seed
+  return {
+      'model': model_name,
+      'prompt': prompt,
+      'stream': True,
+      'options': options,
+  }
+
+
+def _timeout(timeout: float) -> float | None:
+  return timeout if timeout > 0 else None
+
+
+def _stream_response(
+    client: httpx.Client, request: dict[str, Any], timeout: float
+) -> Iterator[str]:
+  """Yields the text of a streamed response, closing it when done."""
+  with client.stream(
+      'POST', '/api/generate', json=request, timeout=_timeout(timeout)
+  ) as response:
+    response.raise_for_status()
+    for line in response.iter_lines():
+      if line:
+        chunk = json.loads(line)
+        if chunk.get('response'):
+          yield chunk['response']
+
+
+async def _astream_response(
+    client: httpx.AsyncClient, request: dict[str, Any], timeout: float
+) -> AsyncIterator[str]:
+  """Yields the text of a streamed response, closing it when done."""
+  async with client.stream(
+      'POST', '/api/generate', json=request, timeout=_timeout(timeout)
+  ) as response:
+    response.raise_for_status()
+    async for line in response.aiter_lines():
+      if line:
+        chunk = json.loads(line)
+        if chunk.get('response'):
+          yield chunk['response']
+
+
+class _OllamaModel:
+  """What the synchronous and asynchronous Ollama models share."""
+
+  def __init__(
+      self,
+      model_name: str,
+      system_message: str,
+      measurements: measurements_lib.Measurements | None,
+      channel: str,
+  ) -> None:
+    self._model_name = model_name
+    self._system_message = system_message
+    self._terminators = []
+    if 'llama3' in self._model_name:
+      self._terminators.extend(['<|eot_id|>'])
+
+    self._measurements = measurements
+    self._channel = channel
+
+  def _add_system_message(self, prompt: str) -> str:
+    return f'{self._system_message}\n\n{prompt}'
+
+  def _request(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int,
+      terminators: Collection[str],
+      temperature: float,
+      seed: int | None,
+  ) -> tuple[dict[str, Any], list[str]]:
+    """Returns the body of a request to sample text, and its terminators."""
+    terminators = [*self._terminators, *terminators]
+    request = _make_request(
+        self._model_name,
+        self._add_system_message(prompt),
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+        seed=seed,
+    )
+    return request, terminators
+
+  def _publish_text_length(self, response: str) -> None:
+    if self._measurements is not None:
+      self._measurements.publish_datum(
+          self._channel,
+          {'raw_text_length': len(response)})
 
 
-class OllamaLanguageModel(language_model.LanguageModel):
+class OllamaLanguageModel(_OllamaModel, language_model.LanguageModel):
   """Language Model that uses Ollama LLM models."""
 
   def __init__(
@@ -41,6 +167,8 @@ class OllamaLanguageModel(language_model.LanguageModel):
       model_name: str,
       *,
       system_message: str = _DEFAULT_SYSTEM_MESSAGE,
+      base_url: str = DEFAULT_BASE_URL,
+      max_connections: int | None = None,
       measurements: measurements_lib.Measurements | None = None,
       channel: str = language_model.DEFAULT_STATS_CHANNEL,
   ) -> None:
@@ -51,18 +179,20 @@ class OllamaLanguageModel(language_model.LanguageModel):
           https://github.com/ollama/ollama.
         system_message: System message to prefix to requests when prompting the
           model.
-        measurements: The measurements object to log usage statistics to.
+        base_url: The URL of the Ollama server.
+        max_connections: The maximum number of connections kept open to the
+          server. If None, the number of threads in the shared thread pool.
+        measurements: The measurements object to log usage statistics to. The
+          utilization of the connections is published to
+          `connection_pool.DEFAULT_STATS_CHANNEL`.
         channel: The channel to write the statistics to.
     """
-    self._model_name = model_name
-    self._system_message = system_message
-    self._terminators = []
-    if 'llama3' in self._model_name:
-      self._terminators.extend(['<|eot_id|>'])
-    self._client = llms.Ollama(model=model_name, stop=self._terminators)
-
-    self._measurements = measurements
-    self._channel = channel
+    super().__init__(model_name, system_message, measurements, channel)
+    self._client = connection_pool.make_client(
+        base_url=base_url,
+        max_connections=max_connections,
+        measurements=measurements,
+    )
 
   @override
   def sample_text(
@@ -75,61 +205,139 @@ class OllamaLanguageModel(language_model.LanguageModel):
       timeout: float = -1,
       seed: int | None = None,
   ) -> str:
-    del max_tokens, timeout, seed  # Unused.
-
-    prompt_with_system_message = f'{self._system_message}\n\n{prompt}'
-
-    terminators = (self._terminators.extend(terminators)
-                   if terminators is not None else self._terminators)
+    response = ''.join(
+        self.sample_text_stream(
+            prompt,
+            max_tokens=max_tokens,
+            terminators=terminators,
+            temperature=temperature,
+            timeout=timeout,
+            seed=seed,
+        )
+    )
+    self._publish_text_length(response)
+    return response
 
-    response = self._client(
-        prompt_with_system_message,
-        stop=terminators,
+  @override
+  def sample_text_stream(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = _DEFAULT_TERMINATORS,
+      temperature: float = _DEFAULT_TEMPERATURE,
+      timeout: float = -1,
+      seed: int | None = None,
+      stop: Callable[[str], bool] | None = None,
+  ) -> Iterator[str]:
+    request, terminators = self._request(
+        prompt,
+        max_tokens=max_tokens,
+        terminators=terminators,
         temperature=temperature,
+        seed=seed,
+    )
+    # Closing the stream ends the request, so the model stops generating.
+    return sampling.stream_until(
+        _stream_response(self._client, request, timeout), terminators, stop
     )
 
-    if self._measurements is not None:
-      self._measurements.publish_datum(
-          self._channel,
-          {'raw_text_length': len(response)})
+  @override
+  def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, dict[str, float]]:
+    # sample_text adds the system message.
+    return multiple_choice.sample_by_retrying(
+        lambda temperature: self.sample_text(
+            prompt, temperature=temperature, seed=seed
+        ),
+        responses,
+        measurements=self._measurements,
+        channel=self._channel,
+    )
+
+
+class AsyncOllamaLanguageModel(_OllamaModel, language_model.AsyncLanguageModel):
+  """Asynchronous Language Model that uses Ollama LLM models."""
 
+  def __init__(
+      self,
+      model_name: str,
+      *,
+      system_message: str = _DEFAULT_SYSTEM_MESSAGE,
+      base_url: str = DEFAULT_BASE_URL,
+      max_connections: int | None = None,
+      measurements: measurements_lib.Measurements | None = None,
+      channel: str = language_model.DEFAULT_STATS_CHANNEL,
+  ) -> None:
+    """Initializes the instance.
+
+    Args:
+        model_name: The language model to use. For more details, see
+          https://github.com/ollama/ollama.
+        system_message: System message to prefix to requests when prompting the
+          model.
+        base_url: The URL of the Ollama server.
+        max_connections: The maximum number of connections kept open to the
+          server. If None, `connection_pool.DEFAULT_MAX_ASYNC_CONNECTIONS`.
+        measurements: The measurements object to log usage statistics to. The
+          utilization of the connections is published to
+          `connection_pool.DEFAULT_STATS_CHANNEL`.
+        channel: The channel to write the statistics to.
+    """
+    super().__init__(model_name, system_message, measurements, channel)
+    self._client = connection_pool.make_async_client(
+        base_url=base_url,
+        max_connections=max_connections,
+        measurements=measurements,
+    )
+
+  @override
+  async def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = _DEFAULT_TERMINATORS,
+      temperature: float = _DEFAULT_TEMPERATURE,
+      timeout: float = -1,
+      seed: int | None = None,
+  ) -> str:
+    request, terminators = self._request(
+        prompt,
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+        seed=seed,
+    )
+    # Closing the stream ends the request, so the model stops generating.
+    response = ''.join([
+        chunk
+        async for chunk in sampling.astream_until(
+            _astream_response(self._client, request, timeout), terminators
+        )
+    ])
+    self._publish_text_length(response)
     return response
 
   @override
-  def sample_choice(
+  async def sample_choice(
       self,
       prompt: str,
       responses: Sequence[str],
       *,
       seed: int | None = None,
   ) -> tuple[int, str, dict[str, float]]:
-    prompt_with_system_message = f'{self._system_message}\n\n{prompt}'
-    sample = ''
-    answer = ''
-    for attempts in range(_MAX_MULTIPLE_CHOICE_ATTEMPTS):
-      # Increase temperature after the first failed attempt.
-      temperature = sampling.dynamically_adjust_temperature(
-          attempts, _MAX_MULTIPLE_CHOICE_ATTEMPTS)
-
-      sample = self.sample_text(
-          prompt_with_system_message,
-          temperature=temperature,
-          seed=seed,
-      )
-      answer = sampling.extract_choice_response(sample)
-      try:
-        idx = responses.index(answer)
-      except ValueError:
-        continue
-      else:
-        if self._measurements is not None:
-          self._measurements.publish_datum(
-              self._channel, {'choices_calls': attempts}
-          )
-        debug = {}
-        return idx, responses[idx], debug
-
-    raise language_model.InvalidResponseError(
-        (f'Too many multiple choice attempts.\nLast attempt: {sample}, ' +
-         f'extracted: {answer}')
+    # sample_text adds the system message.
+    return await multiple_choice.sample_by_retrying_async(
+        lambda temperature: self.sample_text(
+            prompt, temperature=temperature, seed=seed
+        ),
+        responses,
+        measurements=self._measurements,
+        channel=self._channel,
     )
@@ -0,0 +1,193 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for ollama_model.py against a stub Ollama server."""
+
+import asyncio
+from http import server
+import json
+import socket
+import threading
+
+from absl.testing import absltest
+from concordia.language_model import ollama_model
+
+
+class _Handler(server.BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def setup(self):
+    super().setup()
+    self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    with self.server.lock:
+      self.server.connections += 1
+
+  def do_POST(self):  # pylint: disable=invalid-name
+    length = int(self.headers['Content-Length'])
+    self.server.requests.append(json.loads(self.rfile.read(length)))
+    lines = [{'response': chunk, 'done': False} for chunk in self.server.chunks]
+    lines.append({'response': '', 'done': True})
+    body = b''.join(json.dumps(line).encode() + b'\n' for line in lines)
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/x-ndjson')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+class _StubServer(server.ThreadingHTTPServer):
+  daemon_threads = True
+
+  def __init__(self):
+    super().__init__(('127.0.0.1', 0), _Handler)
+    self.lock = threading.Lock()
+    self.connections = 0
+    self.requests = []
+    self.chunks = ['Bob is ', 'asleep.']
+
+
+def _start_server(test: absltest.TestCase) -> _StubServer:
+  stub_server = _StubServer()
+  threading.Thread(target=stub_server.serve_forever, daemon=True).start()
+  test.addCleanup(stub_server.server_close)
+  test.addCleanup(stub_server.shutdown)
+  return stub_server
+
+
+def _base_url(stub_server: _StubServer) -> str:
+  return f'http://127.0.0.1:{stub_server.server_address[1]}'
+
+
+class OllamaLanguageModelTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._server = _start_server(self)
+    self._model = ollama_model.OllamaLanguageModel(
+        'llama3', base_url=_base_url(self._server)
+    )
+
+  def test_sample_text(self):
+    response = self._model.sample_text(
+        'prompt', max_tokens=10, terminators=('\n',), temperature=0.0, seed=1
+    )
+    self.assertEqual(response, 'Bob is asleep.')
+    request = self._server.requests[0]
+    self.assertEqual(request['model'], 'llama3')
+    self.assertEndsWith(request['prompt'], '\n\nprompt')
+    self.assertEqual(
+        request['options'],
+        {
+            'num_predict': 10,
+            'stop': ['<|eot_id|>', '\n'],
+            'temperature': 0.0,
+            'seed': 1,
+        },
+    )
+
+  def test_sample_text_ends_at_terminators(self):
+    self._server.chunks = ['Bob is asleep.', ' Alice is awake.']
+    self.assertEqual(
+        self._model.sample_text('prompt', terminators=('.',)), 'Bob is asleep'
+    )
+
+  def test_sample_choice(self):
+    self._server.chunks = ['(c)']
+    self.assertEqual(
+        self._model.sample_choice('prompt', ['a', 'b', 'c']), (2, 'c', {})
+    )
+    self.assertEqual(
+        self._server.requests[0]['prompt'].count(
+            ollama_model._DEFAULT_SYSTEM_MESSAGE
+        ),
+        1,
+    )
+
+  def test_stream_is_only_requested_once_read(self):
+    stream = self._model.sample_text_stream('prompt')
+    self.assertEmpty(self._server.requests)
+    self.assertEqual(''.join(stream), 'Bob is asleep.')
+    self.assertLen(self._server.requests, 1)
+
+  def test_calls_reuse_a_connection(self):
+    for _ in range(5):
+      self._model.sample_text('prompt')
+    self.assertEqual(self._server.connections, 1)
+
+
+class AsyncOllamaLanguageModelTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._server = _start_server(self)
+    self._model = ollama_model.AsyncOllamaLanguageModel(
+        'llama3', base_url=_base_url(self._server)
+    )
+
+  def test_sample_text(self):
+    response = asyncio.run(
+        self._model.sample_text(
+            'prompt', max_tokens=10, terminators=('\n',), temperature=0.0,
+            seed=1,
+        )
+    )
+    self.assertEqual(response, 'Bob is asleep.')
+    request = self._server.requests[0]
+    self.assertEqual(request['model'], 'llama3')
+    self.assertEndsWith(request['prompt'], '\n\nprompt')
+    self.assertEqual(
+        request['options'],
+        {
+            'num_predict': 10,
+            'stop': ['<|eot_id|>', '\n'],
+            'temperature': 0.0,
+            'seed': 1,
+        },
+    )
+
+  def test_sample_text_ends_at_terminators(self):
+    self._server.chunks = ['Bob is asleep.', ' Alice is awake.']
+    response = asyncio.run(
+        self._model.sample_text('prompt', terminators=('.',))
+    )
+    self.assertEqual(response, 'Bob is asleep')
+
+  def test_sample_choice(self):
+    self._server.chunks = ['I choose (', 'b)']
+    self.assertEqual(
+        asyncio.run(self._model.sample_choice('prompt', ['a', 'b'])),
+        (1, 'b', {}),
+    )
+    self.assertEqual(
+        self._server.requests[0]['prompt'].count(
+            ollama_model._DEFAULT_SYSTEM_MESSAGE
+        ),
+        1,
+    )
+
+  def test_concurrent_calls(self):
+    async def sample_concurrently():
+      return await asyncio.gather(
+          *(self._model.sample_text('prompt') for _ in range(4))
+      )
+
+    self.assertEqual(asyncio.run(sample_concurrently()), ['Bob is asleep.'] * 4)
+    self.assertLen(self._server.requests, 4)
+
+
+if __name__ == '__main__':
+  absltest.main()
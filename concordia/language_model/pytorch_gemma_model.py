@@ -14,18 +14,225 @@
 
 """Pytorch Gemma Language Model, for models running on the local machine."""
 
-from collections.abc import Collection, Sequence
+import collections
+from collections.abc import Callable, Collection, Iterator, Sequence
+import copy
+import dataclasses
 import os
+import queue
+import threading
+import time
+from typing import Any
 
 from concordia.language_model import language_model
 from concordia.utils import measurements as measurements_lib
 from concordia.utils import sampling
 import numpy as np
+import torch
 import transformers
 
 from typing_extensions import override
 
 
+@dataclasses.dataclass(frozen=True)
+class _TextRequest:
+  """A pending call to `sample_text_stream`.
+
+  The batching thread puts chunks of the response in `chunks` as they are
+  generated, followed by None once the response is complete, or by the
+  exception that stopped it. The caller sets `cancelled` once it stops reading.
+  """
+
+  prompt: str
+  max_tokens: int
+  terminators: Collection[str]
+  chunks: queue.SimpleQueue = dataclasses.field(
+      default_factory=queue.SimpleQueue
+  )
+  cancelled: threading.Event = dataclasses.field(
+      default_factory=threading.Event
+  )
+
+
+def _read_chunks(
+    requests: queue.SimpleQueue, request: _TextRequest
+) -> Iterator[str]:
+  """Queues the request and yields the chunks of its response.
+
+  The request is only queued once iteration starts, so that a stream that is
+  never read is never generated.
+
+  Args:
+    requests: the queue of requests of the batching thread.
+    request: the request to queue.
+  """
+  requests.put(request)
+  try:
+    while (chunk := request.chunks.get()) is not None:
+      if isinstance(chunk, Exception):
+        raise chunk
+      yield chunk
+  finally:
+    request.cancelled.set()
+
+
+def _truncate_at_terminators(text: str, terminators: Collection[str]) -> str:
+  """Returns the text up to the first occurrence of any terminator."""
+  end = len(text)
+  for terminator in terminators:
+    index = text.find(terminator)
+    if index != -1:
+      end = min(end, index)
+  return text[:end]
+
+
+class _StreamResponses(transformers.StoppingCriteria):
+  """Streams each sequence of a batch to its caller, and stops it when done.
+
+  A sequence is done once it produces a terminator, reaches its token limit or
+  its caller stops reading it.
+  """
+
+  def __init__(
+      self,
+      tokenizer: transformers.PreTrainedTokenizerBase,
+      prompt_length: int,
+      requests: Sequence[_TextRequest],
+  ):
+    self._tokenizer = tokenizer
+    self._prompt_length = prompt_length
+    self._requests = requests
+    self._streamed = [''] * len(requests)
+    self._done = [False] * len(requests)
+
+  def stream(self, index: int, text: str) -> None:
+    """Puts the text of a sequence that is new since the last call."""
+    # The last characters may be incomplete until the next token arrives.
+    text = text.rstrip('\ufffd')
+    streamed = self._streamed[index]
+    if len(text) > len(streamed) and text.startswith(streamed):
+      self._requests[index].chunks.put(text[len(streamed):])
+      self._streamed[index] = text
+
+  def __call__(
+      self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+  ) -> torch.BoolTensor:
+    new_tokens = input_ids[:, self._prompt_length:]
+    for i, (tokens, request) in enumerate(zip(new_tokens, self._requests)):
+      if self._done[i]:
+        continue
+      text = self._tokenizer.decode(
+          tokens, skip_special_tokens=True, clean_up_tokenization_spaces=False
+      )
+      self.stream(i, text)
+      self._done[i] = (
+          len(tokens) >= request.max_tokens
+          or request.cancelled.is_set()
+          or any(terminator in text for terminator in request.terminators)
+      )
+    return torch.tensor(self._done, dtype=torch.bool, device=input_ids.device)
+
+
+def _repeat_cache(past_key_values, batch_size: int):
+  """Repeats the cached keys and values of a single sequence for a batch."""
+  if hasattr(past_key_values, 'batch_repeat_interleave'):
+    past_key_values.batch_repeat_interleave(batch_size)
+    return past_key_values
+  return tuple(
+      tuple(t.expand(batch_size, *t.shape[1:]) for t in layer)
+      for layer in past_key_values
+  )
+
+
+def _crop_cache(past_key_values, length: int):
+  """Keeps the cached keys and values of the first `length` tokens."""
+  if hasattr(past_key_values, 'crop'):
+    # A negative argument is the number of tokens to remove, which both old
+    # and new versions of transformers accept.
+    num_removed = _cache_length(past_key_values) - length
+    if num_removed > 0:
+      past_key_values.crop(-num_removed)
+    return past_key_values
+  return tuple(
+      tuple(t[:, :, :length] for t in layer) for layer in past_key_values
+  )
+
+
+def _cache_length(past_key_values) -> int:
+  """Returns the number of tokens whose keys and values are cached."""
+  if hasattr(past_key_values, 'get_seq_length'):
+    return past_key_values.get_seq_length()
+  return past_key_values[0][0].shape[2]
+
+
+def _common_prefix_length(a: Sequence[int], b: Sequence[int]) -> int:
+  length = min(len(a), len(b))
+  mismatches = np.flatnonzero(np.asarray(a[:length]) != np.asarray(b[:length]))
+  return int(mismatches[0]) if mismatches.size else length
+
+
+class _PrefixCache:
+  """Keys and values of recent prompts, reused by prompts that extend them.
+
+  Questions about an `InteractiveDocument` resend the whole document each
+  time, so most of each prompt was already run through the model for the
+  previous question. Entries are copied in and out, since the model extends the
+  caches it is given in place.
+  """
+
+  def __init__(self, max_size: int):
+    self._max_size = max_size
+    self._entries: collections.OrderedDict[tuple[int, ...], Any] = (
+        collections.OrderedDict()
+    )
+    self._lock = threading.Lock()
+
+  def get(self, token_ids: Sequence[int]) -> tuple[int, Any]:
+    """Returns the longest cached prefix of the tokens and its keys and values.
+
+    The prefix leaves out at least the last token, so that the model is run on
+    it to predict the next one.
+
+    Args:
+      token_ids: the tokens of the prompt.
+
+    Returns:
+      The length of the prefix and a copy of its keys and values, or 0 and None
+      if no cached prompt shares a prefix with the tokens.
+    """
+    best_length, best_key = 0, None
+    with self._lock:
+      for key in self._entries:
+        length = _common_prefix_length(key, token_ids)
+        if length > best_length:
+          best_length, best_key = length, key
+      if best_key is None:
+        return 0, None
+      self._entries.move_to_end(best_key)
+      past_key_values = self._entries[best_key]
+    best_length = min(best_length, len(token_ids) - 1)
+    if best_length <= 0:
+      return 0, None
+    return best_length, _crop_cache(
+        copy.deepcopy(past_key_values), best_length
+    )
+
+  def add(self, token_ids: Sequence[int], past_key_values: Any) -> None:
+    """Caches the keys and values of the tokens."""
+    if self._max_size <= 0:
+      return
+    key = tuple(token_ids)
+    past_key_values = copy.deepcopy(past_key_values)
+    with self._lock:
+      # Entries that the new one extends are of no further use.
+      for old_key in list(self._entries):
+        if _common_prefix_length(old_key, key) == len(old_key):
+          del self._entries[old_key]
+      self._entries[key] = past_key_values
+      while len(self._entries) > self._max_size:
+        self._entries.popitem(last=False)
+
+
 class PyTorchGemmaLanguageModel(language_model.LanguageModel):
   """Pytorch Language Model API, for models running on the local machine."""
 
@@ -36,14 +243,26 @@ class PyTorchGemmaLanguageModel(language_model.LanguageModel):
       model_name: str = 'google/gemma-2b-it',
       measurements: measurements_lib.Measurements | None = None,
       channel: str = language_model.DEFAULT_STATS_CHANNEL,
+      max_batch_size: int = 8,
+      batch_window_seconds: float = 0.02,
+      prefix_cache_size: int = 8,
   ) -> None:
     """Initializes the instance.
 
+    Concurrent calls to `sample_text` are generated together in batches.
+
     Args:
         model_name: The local language model to use. For more details,
           see transformers.AutoModelForCausalLM at huggingface.
         measurements: The measurements object to log usage statistics to.
         channel: The channel to write the statistics to.
+        max_batch_size: The maximum number of prompts generated together.
+        batch_window_seconds: How long to wait for other calls to join a batch
+          once a call arrives.
+        prefix_cache_size: The number of recent prompts whose keys and values
+          are kept, so that prompts extending them only run the model on their
+          new tokens. Each entry holds the keys and values of a whole prompt,
+          so this trades memory for speed. 0 disables the cache.
     """
     self._model_name = model_name
     self._tokenizer_name = model_name
@@ -54,6 +273,10 @@ class PyTorchGemmaLanguageModel(language_model.LanguageModel):
         self._model_name)
     self._tokenizer = transformers.AutoTokenizer.from_pretrained(
         self._tokenizer_name)
+    # Prompts of a batch are padded on the left so that they all end where
+    # generation starts.
+    self._batch_tokenizer = transformers.AutoTokenizer.from_pretrained(
+        self._tokenizer_name, padding_side='left')
 
     self._measurements = measurements
     self._channel = channel
@@ -62,6 +285,102 @@ class PyTorchGemmaLanguageModel(language_model.LanguageModel):
         'You always continue sentences provided by the user and you never ' +
         'repeat what the user already said.')
 
+    self._prefix_cache = _PrefixCache(prefix_cache_size)
+    self._max_batch_size = max_batch_size
+    self._batch_window_seconds = batch_window_seconds
+    self._requests = queue.SimpleQueue()
+    self._batcher = threading.Thread(
+        target=self._serve_batches,
+        name='PyTorchGemmaLanguageModel',
+        daemon=True,
+    )
+    self._batcher.start()
+
+  def _make_prompt(self, prompt: str) -> str:
+    """Returns the prompt, preceded by the system message.
+
+    Text and choices share the prompt, so that a choice about a document
+    continues from the cached keys and values of a text question about it.
+
+    Args:
+      prompt: the prompt to continue.
+    """
+    return f'{self._text_system_message}\n\n{prompt}'
+
+  def _next_batch(self) -> list[_TextRequest]:
+    """Waits for a request, then collects those that arrive soon after it."""
+    batch = [self._requests.get()]
+    deadline = time.monotonic() + self._batch_window_seconds
+    while len(batch) < self._max_batch_size:
+      remaining = deadline - time.monotonic()
+      if remaining <= 0:
+        break
+      try:
+        batch.append(self._requests.get(timeout=remaining))
+      except queue.Empty:
+        break
+    return batch
+
+  def _serve_batches(self) -> None:
+    while True:
+      batch = self._next_batch()
+      try:
+        self._generate_batch(batch)
+      except Exception as e:  # pylint: disable=broad-exception-caught
+        for request in batch:
+          request.chunks.put(e)
+      else:
+        for request in batch:
+          request.chunks.put(None)
+
+  def _generate_batch(self, batch: Sequence[_TextRequest]) -> None:
+    """Generates the responses to a batch of requests together."""
+    inputs = self._batch_tokenizer(
+        [request.prompt for request in batch],
+        return_tensors='pt',
+        padding=True,
+    )
+    prompt_length = inputs.input_ids.shape[1]
+    streamer = _StreamResponses(self._batch_tokenizer, prompt_length, batch)
+    # Only unpadded prompts can continue from cached keys and values.
+    past_key_values = None
+    if len(batch) == 1:
+      _, past_key_values = self._prefix_cache.get(inputs.input_ids[0].tolist())
+    outputs = self._model.generate(
+        inputs.input_ids,
+        attention_mask=inputs.attention_mask,
+        past_key_values=past_key_values,
+        max_new_tokens=max(request.max_tokens for request in batch),
+        stopping_criteria=transformers.StoppingCriteriaList([streamer]),
+        pad_token_id=self._batch_tokenizer.pad_token_id,
+        return_dict_in_generate=True,
+    )
+    if len(batch) == 1:
+      # The next question about the same document extends the prompt and
+      # this response.
+      cached_length = _cache_length(outputs.past_key_values)
+      self._prefix_cache.add(
+          outputs.sequences[0, :cached_length].tolist(),
+          outputs.past_key_values,
+      )
+    for i, (tokens, request) in enumerate(zip(outputs.sequences, batch)):
+      response = self._batch_tokenizer.decode(
+          np.int64(tokens[prompt_length:prompt_length + request.max_tokens]),
+          skip_special_tokens=True,
+          clean_up_tokenization_spaces=False,
+      )
+      streamer.stream(i, response)
+      if self._measurements is not None:
+        self._measurements.publish_datum(
+            self._channel,
+            {
+                'raw_text_length': len(
+                    _truncate_at_terminators(response, request.terminators)
+                ),
+                'batch_size': len(batch),
+            },
+        )
+
   @override
   def sample_text(
       self,
@@ -73,37 +392,101 @@ class PyTorchGemmaLanguageModel(language_model.LanguageModel):
       timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
       seed: int | None = None,
   ) -> str:
+    return ''.join(
+        self.sample_text_stream(
+            prompt,
+            max_tokens=max_tokens,
+            terminators=terminators,
+            temperature=temperature,
+            timeout=timeout,
+            seed=seed,
+        )
+    )
+
+  @override
+  def sample_text_stream(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+      stop: Callable[[str], bool] | None = None,
+  ) -> Iterator[str]:
     del temperature, timeout, seed  # Unused.
 
-    prompt_with_system_message = f'{self._text_system_message}\n\n{prompt}'
-    prompt_length = len(prompt_with_system_message)
+    request = _TextRequest(
+        prompt=self._make_prompt(prompt),
+        max_tokens=max_tokens,
+        terminators=tuple(terminators),
+    )
+    return sampling.stream_until(
+        _read_chunks(self._requests, request), terminators, stop
+    )
 
-    inputs = self._tokenizer(prompt_with_system_message, return_tensors='pt')
+  @torch.no_grad()
+  def _score_responses(
+      self, prompt: str, responses: Sequence[str]
+  ) -> list[float]:
+    """Returns the log-probability of each response as a continuation.
 
-    generated_tokens = self._model.generate(
-        inputs.input_ids,
-        max_new_tokens=max_tokens,
-        return_dict_in_generate=True,
-        output_scores=True,
-    )
+    The prompt is run through the model once, continuing from the cached keys
+    and values of any recent prompt it extends. Its keys and values are then
+    shared by a single batched pass over all the responses.
+
+    Args:
+      prompt: the prompt that the responses continue, without the system
+        message.
+      responses: the candidate continuations.
 
-    response = self._tokenizer.decode(
-        np.int64(generated_tokens.sequences[0]),
-        skip_special_tokens=True,
-        clean_up_tokenization_spaces=False,
+    Returns:
+      The sum of the log-probabilities of the tokens of each response.
+    """
+    prompt_ids = self._tokenizer(self._make_prompt(prompt)).input_ids
+    cached_length, past_key_values = self._prefix_cache.get(prompt_ids)
+    prefix = self._model(
+        torch.tensor([prompt_ids[cached_length:]]),
+        past_key_values=past_key_values,
+        use_cache=True,
     )
-    response = response[prompt_length:]
+    self._prefix_cache.add(prompt_ids, prefix.past_key_values)
+    # The first token of each response is predicted from the end of the prompt.
+    first_log_probs = torch.log_softmax(prefix.logits[0, -1].float(), dim=-1)
 
-    # It would be better to implement terminators in the model generation, but
-    # this is a quick way to implement our API for now.
-    for terminator in terminators:
-      response = response[:response.find(terminator)]
+    response_ids = [
+        self._tokenizer(response, add_special_tokens=False).input_ids
+        for response in responses
+    ]
+    length = max(map(len, response_ids))
+    if not length:
+      return [0.0] * len(responses)
+    tokens = torch.full(
+        (len(responses), length), self._tokenizer.pad_token_id or 0
+    )
+    mask = torch.zeros((len(responses), length), dtype=torch.long)
+    for i, ids in enumerate(response_ids):
+      tokens[i, :len(ids)] = torch.tensor(ids)
+      mask[i, :len(ids)] = 1
 
-    if self._measurements is not None:
-      self._measurements.publish_datum(
-          self._channel, {'raw_text_length': len(response)}
-      )
-    return response
+    prompt_mask = torch.ones(
+        (len(responses), len(prompt_ids)), dtype=torch.long
+    )
+    outputs = self._model(
+        tokens,
+        attention_mask=torch.cat([prompt_mask, mask], dim=1),
+        past_key_values=_repeat_cache(prefix.past_key_values, len(responses)),
+    )
+    log_probs = torch.log_softmax(outputs.logits[:, :-1].float(), dim=-1)
+    token_log_probs = torch.cat(
+        [
+            first_log_probs[tokens[:, :1]],
+            log_probs.gather(-1, tokens[:, 1:].unsqueeze(-1)).squeeze(-1),
+        ],
+        dim=1,
+    )
+    return (token_log_probs * mask).sum(dim=1).tolist()
 
   @override
   def sample_choice(
@@ -113,30 +496,12 @@ class PyTorchGemmaLanguageModel(language_model.LanguageModel):
       *,
       seed: int | None = None,
   ) -> tuple[int, str, dict[str, float]]:
-    del seed  # Unused.
+    del seed  # Unused, scoring the responses is deterministic.
 
-    inputs = self._tokenizer(prompt, return_tensors='pt')
-    generated_tokens = self._model.generate(
-        inputs.input_ids,
-        max_new_tokens=1,
-        return_dict_in_generate=True,
-        output_scores=True,
-    )
-    sample = self._tokenizer.batch_decode(
-        [np.argmax(generated_tokens.scores[0][0])],
-        skip_special_tokens=True,
-        clean_up_tokenization_spaces=False)[0]
-    answer = sampling.extract_choice_response(sample)
-    try:
-      idx = responses.index(answer)
-      print(f'sample: {sample}, response: {idx}')
-    except ValueError:
-      raise language_model.InvalidResponseError(
-          f'Invalid response: {answer}. '
-          f'LLM Input: {prompt}\nLLM Output: {sample}'
-      ) from None
+    scores = self._score_responses(prompt, responses)
+    idx = int(np.argmax(scores))
 
     if self._measurements is not None:
       self._measurements.publish_datum(self._channel, {'choices_calls': 1})
-    debug = {}
+    debug = dict(zip(responses, scores))
     return idx, responses[idx], debug
@@ -0,0 +1,277 @@
+# Copyright 2024 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for pytorch_gemma_model.py with a tiny randomly initialised Gemma."""
+
+from concurrent import futures
+import queue
+import string
+import tempfile
+import unittest
+from unittest import mock
+
+from absl.testing import absltest
+from concordia.utils import measurements as measurements_lib
+
+try:
+  # pylint: disable=g-import-not-at-top
+  from concordia.language_model import pytorch_gemma_model
+  import tokenizers
+  import torch
+  import transformers
+  # pylint: enable=g-import-not-at-top
+except ImportError:
+  torch = None
+
+_SPECIAL_TOKENS = ('<pad>', '<bos>', '<eos>', '<unk>')
+
+
+def _save_tiny_gemma(directory: str) -> None:
+  """Saves a 2 layer Gemma with a character level tokenizer to a directory."""
+  vocab = {
+      token: i
+      for i, token in enumerate([*_SPECIAL_TOKENS, *string.printable])
+  }
+  tokenizer = tokenizers.Tokenizer(
+      tokenizers.models.WordLevel(vocab, unk_token='<unk>')
+  )
+  tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Split(
+      tokenizers.Regex(r'[\s\S]'), behavior='isolated'
+  )
+  tokenizer.decoder = tokenizers.decoders.Fuse()
+  tokenizer.post_processor = tokenizers.processors.TemplateProcessing(
+      single='<bos> $A', special_tokens=[('<bos>', vocab['<bos>'])]
+  )
+  transformers.PreTrainedTokenizerFast(
+      tokenizer_object=tokenizer,
+      pad_token='<pad>',
+      bos_token='<bos>',
+      eos_token='<eos>',
+      unk_token='<unk>',
+  ).save_pretrained(directory)
+
+  # pylint: disable-next=unexpected-keyword-arg
+  config = transformers.GemmaConfig(
+      vocab_size=len(vocab),
+      hidden_size=32,
+      intermediate_size=64,
+      num_hidden_layers=2,
+      num_attention_heads=2,
+      num_key_value_heads=1,
+      head_dim=16,
+      pad_token_id=vocab['<pad>'],
+      bos_token_id=vocab['<bos>'],
+      eos_token_id=vocab['<eos>'],
+      # Large random weights make the responses vary from token to token.
+      initializer_range=1.0,
+  )
+  torch.manual_seed(0)
+  transformers.GemmaForCausalLM(config).save_pretrained(directory)
+
+
+@unittest.skipIf(torch is None, 'torch and transformers are not installed.')
+class PyTorchGemmaLanguageModelTest(absltest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    cls._directory = tempfile.TemporaryDirectory()
+    _save_tiny_gemma(cls._directory.name)
+
+  @classmethod
+  def tearDownClass(cls):
+    cls._directory.cleanup()
+    super().tearDownClass()
+
+  def _make_model(self, **kwargs):
+    return pytorch_gemma_model.PyTorchGemmaLanguageModel(
+        model_name=self._directory.name, **kwargs
+    )
+
+  def _spy_on_generate(self, model):
+    """Returns a queue of the number of tokens each call to generate made.
+
+    Generation runs on the batching thread, and may still be running after
+    the caller has read its response, so tests wait on the queue.
+
+    Args:
+      model: the model to spy on.
+    """
+    num_new_tokens = queue.Queue()
+    generate = model._model.generate
+
+    def spy(input_ids, **kwargs):
+      outputs = generate(input_ids, **kwargs)
+      num_new_tokens.put(outputs.sequences.shape[1] - input_ids.shape[1])
+      return outputs
+
+    self.enter_context(mock.patch.object(model._model, 'generate', spy))
+    return num_new_tokens
+
+  def _spy_on_prefix_cache(self, model):
+    """Returns the length of the cached prefix found for each prompt."""
+    cached_lengths = []
+    get = model._prefix_cache.get
+
+    def spy(token_ids):
+      cached_length, past_key_values = get(token_ids)
+      cached_lengths.append(cached_length)
+      return cached_length, past_key_values
+
+    self.enter_context(mock.patch.object(model._prefix_cache, 'get', spy))
+    return cached_lengths
+
+  def test_concurrent_calls_are_batched(self):
+    prompts = ['Alice', 'Bob went', 'Charlie is at the', 'Dorothy']
+    expected = [
+        self._make_model(prefix_cache_size=0).sample_text(prompt, max_tokens=8)
+        for prompt in prompts
+    ]
+
+    measurements = measurements_lib.Measurements()
+    model = self._make_model(
+        measurements=measurements,
+        channel='stats',
+        max_batch_size=len(prompts),
+        batch_window_seconds=5.0,
+    )
+    with futures.ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+      responses = list(
+          executor.map(
+              lambda prompt: model.sample_text(prompt, max_tokens=8), prompts
+          )
+      )
+
+    self.assertEqual(responses, expected)
+    stats = []
+    measurements.get_channel('stats').subscribe(on_next=stats.append)
+    self.assertEqual(
+        [datum['batch_size'] for datum in stats], [len(prompts)] * len(prompts)
+    )
+
+  def test_generation_stops_at_max_tokens(self):
+    model = self._make_model(prefix_cache_size=0)
+    num_new_tokens = self._spy_on_generate(model)
+    response = model.sample_text('Alice', max_tokens=5)
+    # Each character of the tiny tokenizer is a token.
+    self.assertLen(response, 5)
+    self.assertEqual(num_new_tokens.get(timeout=60), 5)
+
+  def test_generation_stops_at_terminators(self):
+    model = self._make_model(prefix_cache_size=0)
+    response = model.sample_text('Alice', max_tokens=20, terminators=())
+    self.assertLen(response, 20)
+    end = 5
+    terminator = response[end]
+    self.assertNotIn(terminator, response[:end])
+
+    num_new_tokens = self._spy_on_generate(model)
+    self.assertEqual(
+        model.sample_text('Alice', max_tokens=20, terminators=(terminator,)),
+        response[:end],
+    )
+    # Generation stops at the token that completes the terminator.
+    self.assertEqual(num_new_tokens.get(timeout=60), end + 1)
+
+  def test_stream_stops_when_the_caller_stops_reading(self):
+    model = self._make_model(prefix_cache_size=0)
+    num_new_tokens = self._spy_on_generate(model)
+    stream = model.sample_text_stream(
+        'Alice', max_tokens=50, stop=lambda text: len(text) >= 3
+    )
+    self.assertLen(''.join(stream), 3)
+    self.assertLess(num_new_tokens.get(timeout=60), 50)
+
+  def test_stream_is_only_generated_once_read(self):
+    model = self._make_model(prefix_cache_size=0)
+    num_new_tokens = self._spy_on_generate(model)
+    stream = model.sample_text_stream('Alice', max_tokens=5)
+    with self.assertRaises(queue.Empty):
+      num_new_tokens.get(timeout=1)
+    self.assertLen(''.join(stream), 5)
+    self.assertEqual(num_new_tokens.get(timeout=60), 5)
+
+  def test_prefix_cache_matches_uncached_generation(self):
+    document = 'Alice went to the market. '
+    questions = ['Where is Alice?', 'What did Alice buy?']
+    cached = self._make_model()
+    uncached = self._make_model(prefix_cache_size=0)
+    for question in questions:
+      self.assertEqual(
+          cached.sample_text(document + question, max_tokens=8),
+          uncached.sample_text(document + question, max_tokens=8),
+      )
+      document += question
+
+  def test_prefix_cache_matches_uncached_scores(self):
+    document = 'Alice went to the market. Is she there? '
+    responses = ['yes', 'no', 'maybe']
+    cached = self._make_model()
+    uncached = self._make_model(prefix_cache_size=0)
+    cached.sample_choice(document, responses)
+    cached_lengths = self._spy_on_prefix_cache(cached)
+
+    prompt = document + 'Answer (a), (b) or (c): '
+    _, _, cached_scores = cached.sample_choice(prompt, responses)
+    _, _, uncached_scores = uncached.sample_choice(prompt, responses)
+    self.assertGreater(cached_lengths[0], len(document))
+    for response in responses:
+      self.assertAlmostEqual(
+          cached_scores[response], uncached_scores[response], places=4
+      )
+
+  def test_choice_reuses_the_cache_of_a_text_question(self):
+    document = 'Alice went to the market. Where is Alice? '
+    responses = ['yes', 'no', 'maybe']
+    cached = self._make_model()
+    uncached = self._make_model(prefix_cache_size=0)
+    document += cached.sample_text(document, max_tokens=8, terminators=())
+    cached_lengths = self._spy_on_prefix_cache(cached)
+
+    prompt = document + ' Is she there? '
+    _, _, cached_scores = cached.sample_choice(prompt, responses)
+    _, _, uncached_scores = uncached.sample_choice(prompt, responses)
+    self.assertGreater(cached_lengths[0], len(document))
+    for response in responses:
+      self.assertAlmostEqual(
+          cached_scores[response], uncached_scores[response], places=4
+      )
+
+  def test_sample_choice_returns_the_most_likely_response(self):
+    model = self._make_model(prefix_cache_size=0)
+    responses = ['yes', 'no', 'maybe']
+    idx, response, scores = model.sample_choice('Is Alice here? ', responses)
+
+    self.assertEqual(list(scores), responses)
+    self.assertEqual(idx, max(range(3), key=lambda i: scores[responses[i]]))
+    self.assertEqual(response, responses[idx])
+    # Each score is the log-likelihood of the response after the prompt.
+    prompt_ids = model._tokenizer(model._make_prompt('Is Alice here? '))
+    for candidate in responses:
+      ids = torch.tensor([
+          prompt_ids.input_ids
+          + model._tokenizer(candidate, add_special_tokens=False).input_ids
+      ])
+      with torch.no_grad():
+        log_probs = torch.log_softmax(model._model(ids).logits[0], dim=-1)
+      num_prompt_tokens = len(prompt_ids.input_ids)
+      expected = sum(
+          log_probs[position - 1, ids[0, position]].item()
+          for position in range(num_prompt_tokens, ids.shape[1])
+      )
+      self.assertAlmostEqual(scores[candidate], expected, places=4)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,245 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Record the calls to a language model and replay them later.
+
+`RecordingLanguageModel` wraps a real model and appends every call, with its
+response and latency, to a JSON lines file. `ReplayLanguageModel` serves those
+responses back to the same prompts, optionally after a simulated latency. This
+lets simulations be profiled and benchmarked along the control flow of a real
+run without calling the model, unlike `NoLanguageModel`, whose empty responses
+take different code paths.
+"""
+
+import collections
+from collections.abc import Callable, Collection, Mapping, Sequence
+import hashlib
+import json
+import threading
+import time
+from typing import Any
+
+from concordia.language_model import language_model
+import numpy as np
+from typing_extensions import override
+
+
+def _key(*parts: Any) -> str:
+  serialized = json.dumps(parts, ensure_ascii=False)
+  return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+def _text_key(
+    prompt: str, max_tokens: int, terminators: Collection[str]
+) -> str:
+  return _key('sample_text', prompt, max_tokens, list(terminators))
+
+
+def _choice_key(prompt: str, responses: Sequence[str]) -> str:
+  return _key('sample_choice', prompt, list(responses))
+
+
+class RecordingLanguageModel(language_model.LanguageModel):
+  """Wraps an underlying language model and records its calls to a file."""
+
+  def __init__(self, model: language_model.LanguageModel, path: str) -> None:
+    """Wrap the underlying language model and record its calls.
+
+    Args:
+      model: the language model to record.
+      path: the JSON lines file to append the calls to.
+    """
+    self._model = model
+    self._file = open(path, 'a', encoding='utf-8')
+    self._lock = threading.Lock()
+
+  def _record(self, record: Mapping[str, Any]) -> None:
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with self._lock:
+      self._file.write(line + '\n')
+      self._file.flush()
+
+  def close(self) -> None:
+    """Closes the recording file."""
+    with self._lock:
+      self._file.close()
+
+  @override
+  def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    start = time.perf_counter()
+    response = self._model.sample_text(
+        prompt,
+        max_tokens=max_tokens,
+        terminators=terminators,
+        temperature=temperature,
+        timeout=timeout,
+        seed=seed,
+    )
+    self._record({
+        'key': _text_key(prompt, max_tokens, terminators),
+        'method': 'sample_text',
+        'prompt': prompt,
+        'response': response,
+        'latency_seconds': time.perf_counter() - start,
+    })
+    return response
+
+  @override
+  def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, Mapping[str, Any]]:
+    start = time.perf_counter()
+    idx, response, debug = self._model.sample_choice(
+        prompt, responses, seed=seed
+    )
+    self._record({
+        'key': _choice_key(prompt, responses),
+        'method': 'sample_choice',
+        'prompt': prompt,
+        'response': [idx, response, debug],
+        'latency_seconds': time.perf_counter() - start,
+    })
+    return idx, response, debug
+
+
+def recorded_latency(scale: float = 1.0) -> Callable[[float], float]:
+  """Returns a latency model that replays the recorded latencies, scaled."""
+  return lambda recorded: recorded * scale
+
+
+def lognormal_latency(
+    median_seconds: float, sigma: float = 0.5, seed: int | None = None
+) -> Callable[[float], float]:
+  """Returns a latency model that samples latencies from a log-normal.
+
+  Args:
+    median_seconds: the median latency.
+    sigma: the standard deviation of the logarithm of the latency.
+    seed: the seed of the random number generator.
+  """
+  rng = np.random.default_rng(seed)
+  lock = threading.Lock()
+
+  def sample(recorded: float) -> float:
+    del recorded  # Unused.
+    with lock:
+      return float(rng.lognormal(np.log(median_seconds), sigma))
+
+  return sample
+
+
+class ReplayLanguageModel(language_model.LanguageModel):
+  """Serves the responses recorded by a `RecordingLanguageModel`.
+
+  Calls are matched to recordings by a hash of the prompt and the parameters
+  that shape the response: `max_tokens` and `terminators` for text, and the
+  candidate responses for choices. The temperature and seed are not part of
+  the match. When a prompt was recorded several times, its responses are
+  served in the order they were recorded, starting over once all were used.
+  """
+
+  def __init__(
+      self,
+      path: str,
+      *,
+      latency: Callable[[float], float] | None = None,
+      fallback: language_model.LanguageModel | None = None,
+  ) -> None:
+    """Loads the recorded calls.
+
+    Args:
+      path: a JSON lines file written by `RecordingLanguageModel`.
+      latency: if not None, the time to wait before each response, as a
+        function of the latency recorded for it, e.g. `recorded_latency()` or
+        `lognormal_latency(...)`.
+      fallback: if not None, the model to call for prompts that were not
+        recorded. Otherwise such calls raise LookupError.
+    """
+    self._latency = latency
+    self._fallback = fallback
+    self._records: dict[str, list[tuple[Any, float]]] = (
+        collections.defaultdict(list)
+    )
+    with open(path, encoding='utf-8') as f:
+      for line in f:
+        if line.strip():
+          record = json.loads(line)
+          self._records[record['key']].append(
+              (record['response'], record['latency_seconds'])
+          )
+    self._next_index = collections.Counter()
+    self._lock = threading.Lock()
+
+  def _replay(self, key: str, prompt: str) -> Any:
+    """Returns the next recorded response for a key, after its latency."""
+    with self._lock:
+      records = self._records.get(key)
+      if not records:
+        raise LookupError(f'No recorded response for prompt: {prompt!r}')
+      response, recorded = records[self._next_index[key] % len(records)]
+      self._next_index[key] += 1
+    if self._latency is not None:
+      time.sleep(self._latency(recorded))
+    return response
+
+  @override
+  def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    key = _text_key(prompt, max_tokens, terminators)
+    if self._fallback is not None and key not in self._records:
+      return self._fallback.sample_text(
+          prompt,
+          max_tokens=max_tokens,
+          terminators=terminators,
+          temperature=temperature,
+          timeout=timeout,
+          seed=seed,
+      )
+    return self._replay(key, prompt)
+
+  @override
+  def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, Mapping[str, Any]]:
+    key = _choice_key(prompt, responses)
+    if self._fallback is not None and key not in self._records:
+      return self._fallback.sample_choice(prompt, responses, seed=seed)
+    idx, response, debug = self._replay(key, prompt)
+    return idx, response, debug
@@ -0,0 +1,102 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for recording_wrapper.py."""
+
+import itertools
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from concordia.language_model import language_model
+from concordia.language_model import recording_wrapper
+from concordia.tests import mock_model
+
+
+def _mock_model() -> mock.Mock:
+  model = mock.create_autospec(
+      language_model.LanguageModel, instance=True, spec_set=True
+  )
+  counter = itertools.count()
+  model.sample_text.side_effect = (
+      lambda prompt, **kwargs: f'{prompt} {next(counter)}'
+  )
+  model.sample_choice.return_value = (1, 'b', {'score': 0.5})
+  return model
+
+
+class RecordingWrapperTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._path = os.path.join(
+        self.enter_context(tempfile.TemporaryDirectory()), 'calls.jsonl'
+    )
+
+  def _record(self, calls):
+    recording = recording_wrapper.RecordingLanguageModel(
+        _mock_model(), self._path
+    )
+    results = [call(recording) for call in calls]
+    recording.close()
+    return results
+
+  def test_replays_recorded_responses_in_order(self):
+    recorded = self._record([
+        lambda model: model.sample_text('a'),
+        lambda model: model.sample_text('b', max_tokens=10),
+        lambda model: model.sample_text('a'),
+        lambda model: model.sample_choice('q', ['a', 'b']),
+    ])
+    self.assertEqual(recorded[:3], ['a 0', 'b 1', 'a 2'])
+
+    replay = recording_wrapper.ReplayLanguageModel(self._path)
+    self.assertEqual(replay.sample_text('a'), 'a 0')
+    self.assertEqual(replay.sample_text('a'), 'a 2')
+    # Responses are reused once all those recorded for a prompt were served.
+    self.assertEqual(replay.sample_text('a'), 'a 0')
+    self.assertEqual(replay.sample_text('b', max_tokens=10), 'b 1')
+    self.assertEqual(
+        replay.sample_choice('q', ['a', 'b']), (1, 'b', {'score': 0.5})
+    )
+
+  def test_unrecorded_prompts(self):
+    self._record([lambda model: model.sample_text('a')])
+
+    replay = recording_wrapper.ReplayLanguageModel(self._path)
+    with self.assertRaises(LookupError):
+      replay.sample_text('a', max_tokens=10)
+
+    fallback = recording_wrapper.ReplayLanguageModel(
+        self._path, fallback=mock_model.MockModel('fallback')
+    )
+    self.assertEqual(fallback.sample_text('b'), 'fallback')
+    self.assertEqual(fallback.sample_text('a'), 'a 0')
+
+  def test_latency_is_simulated(self):
+    self._record([lambda model: model.sample_text('a')])
+    latency = mock.Mock(return_value=0.0)
+    replay = recording_wrapper.ReplayLanguageModel(
+        self._path, latency=latency
+    )
+    replay.sample_text('a')
+    latency.assert_called_once()
+    self.assertGreaterEqual(
+        recording_wrapper.lognormal_latency(0.5, seed=0)(0.0), 0.0
+    )
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,257 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Wrapper to schedule calls to language models under global limits.
+
+Simulations call models from nested thread pools, so the number of concurrent
+requests grows with the number of players and components rather than with what
+the provider allows. A `CallScheduler` is shared by every model that sends
+requests to the same provider. It caps the number of requests in flight, keeps
+within requests and tokens per minute budgets, and admits waiting requests in
+priority order. `ScheduledLanguageModel` routes a model's calls through it.
+"""
+
+from collections.abc import Callable, Collection, Iterator, Mapping, Sequence
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+from typing import Any
+
+from concordia.language_model import language_model
+from concordia.utils import measurements as measurements_lib
+from typing_extensions import override
+
+DEFAULT_STATS_CHANNEL = 'language_model_scheduler_stats'
+
+# Priorities of common kinds of calls, lower values are admitted first.
+GAME_MASTER_PRIORITY = 0
+AGENT_PRIORITY = 10
+METRICS_PRIORITY = 20
+
+# Rough number of characters per token, used to estimate prompt sizes.
+_CHARACTERS_PER_TOKEN = 4
+
+
+def _estimate_tokens(prompt: str, max_tokens: int) -> int:
+  return len(prompt) // _CHARACTERS_PER_TOKEN + max_tokens
+
+
+class _TokenBucket:
+  """A budget per minute that refills continuously, up to one minute's worth."""
+
+  def __init__(self, per_minute: float, clock: Callable[[], float]):
+    self._capacity = per_minute
+    self._rate = per_minute / 60
+    self._clock = clock
+    self._level = per_minute
+    self._last_refill = clock()
+
+  def _refill(self) -> None:
+    now = self._clock()
+    self._level = min(
+        self._capacity, self._level + (now - self._last_refill) * self._rate
+    )
+    self._last_refill = now
+
+  def seconds_until_available(self, amount: float) -> float:
+    """Returns how long until `amount` can be taken, 0 if it can be now."""
+    self._refill()
+    # Requests larger than the capacity are let through once the bucket is full.
+    amount = min(amount, self._capacity)
+    return max(0.0, (amount - self._level) / self._rate)
+
+  def take(self, amount: float) -> None:
+    self._refill()
+    self._level -= min(amount, self._capacity)
+
+
+class CallScheduler:
+  """Admits model calls under global concurrency and rate limits.
+
+  Calls wait in a single queue ordered by priority, then by arrival. Only the
+  call at the head of the queue is admitted, once there is a free slot and
+  enough budget, so lower priority calls never overtake higher priority ones.
+  """
+
+  def __init__(
+      self,
+      *,
+      max_in_flight: int = 16,
+      requests_per_minute: float | None = None,
+      tokens_per_minute: float | None = None,
+      measurements: measurements_lib.Measurements | None = None,
+      channel: str = DEFAULT_STATS_CHANNEL,
+      clock: Callable[[], float] = time.monotonic,
+  ):
+    """Constructor.
+
+    Args:
+      max_in_flight: maximum number of calls in progress at once.
+      requests_per_minute: if not None, the budget of calls per minute.
+      tokens_per_minute: if not None, the budget of tokens per minute. The
+        tokens of a call are estimated from its prompt and maximum response
+        length.
+      measurements: the measurements object to publish queue wait times and
+        the number of calls in flight to.
+      channel: the channel to publish the statistics to.
+      clock: monotonic clock in seconds, used for the budgets.
+    """
+    self._max_in_flight = max_in_flight
+    self._buckets: list[tuple[_TokenBucket, bool]] = []
+    if requests_per_minute is not None:
+      self._buckets.append((_TokenBucket(requests_per_minute, clock), False))
+    if tokens_per_minute is not None:
+      self._buckets.append((_TokenBucket(tokens_per_minute, clock), True))
+    self._measurements = measurements
+    self._channel = channel
+
+    self._condition = threading.Condition()
+    self._queue: list[tuple[int, int]] = []
+    self._arrivals = itertools.count()
+    self._in_flight = 0
+
+  def _seconds_until_admissible(self, tokens: int) -> float:
+    """Returns how long until the budgets allow a call. Assumes lock is held."""
+    return max(
+        [
+            bucket.seconds_until_available(tokens if counts_tokens else 1)
+            for bucket, counts_tokens in self._buckets
+        ],
+        default=0.0,
+    )
+
+  def _publish(self, datum: Mapping[str, Any]) -> None:
+    if self._measurements is not None:
+      self._measurements.publish_datum(self._channel, datum)
+
+  @contextlib.contextmanager
+  def slot(self, *, priority: int, tokens: int) -> Iterator[None]:
+    """Waits until a call may be made, and holds its slot while it runs.
+
+    Args:
+      priority: the priority of the call, lower values are admitted first.
+      tokens: the estimated number of tokens used by the call.
+
+    Yields:
+      Nothing, once the call is admitted.
+    """
+    start = time.perf_counter()
+    entry = (priority, next(self._arrivals))
+    with self._condition:
+      heapq.heappush(self._queue, entry)
+      try:
+        while True:
+          wait = None
+          if self._queue[0] == entry and self._in_flight < self._max_in_flight:
+            wait = self._seconds_until_admissible(tokens)
+            if wait <= 0:
+              break
+          self._condition.wait(timeout=wait)
+      except BaseException:
+        self._queue.remove(entry)
+        heapq.heapify(self._queue)
+        self._condition.notify_all()
+        raise
+      heapq.heappop(self._queue)
+      for bucket, counts_tokens in self._buckets:
+        bucket.take(tokens if counts_tokens else 1)
+      self._in_flight += 1
+      in_flight = self._in_flight
+      # The next call in the queue may be admissible too.
+      self._condition.notify_all()
+    self._publish({
+        'queue_wait_seconds': time.perf_counter() - start,
+        'in_flight': in_flight,
+        'priority': priority,
+    })
+    try:
+      yield
+    finally:
+      with self._condition:
+        self._in_flight -= 1
+        in_flight = self._in_flight
+        self._condition.notify_all()
+      self._publish({'in_flight': in_flight})
+
+
+class ScheduledLanguageModel(language_model.LanguageModel):
+  """Wraps an underlying language model and schedules its calls.
+
+  Wrap every model that shares a provider with the same scheduler, each with
+  the priority of the code that uses it, e.g. `GAME_MASTER_PRIORITY` for the
+  game master's model and `METRICS_PRIORITY` for the model used by metrics.
+  """
+
+  def __init__(
+      self,
+      model: language_model.LanguageModel,
+      scheduler: CallScheduler,
+      priority: int = AGENT_PRIORITY,
+  ) -> None:
+    """Wrap the underlying language model with a scheduler.
+
+    Args:
+      model: A language model to wrap.
+      scheduler: the scheduler to admit calls through, usually shared.
+      priority: the priority of this model's calls, lower values first.
+    """
+    self._model = model
+    self._scheduler = scheduler
+    self._priority = priority
+
+  @override
+  def sample_text(
+      self,
+      prompt: str,
+      *,
+      max_tokens: int = language_model.DEFAULT_MAX_TOKENS,
+      terminators: Collection[str] = language_model.DEFAULT_TERMINATORS,
+      temperature: float = language_model.DEFAULT_TEMPERATURE,
+      timeout: float = language_model.DEFAULT_TIMEOUT_SECONDS,
+      seed: int | None = None,
+  ) -> str:
+    with self._scheduler.slot(
+        priority=self._priority,
+        tokens=_estimate_tokens(prompt, max_tokens),
+    ):
+      return self._model.sample_text(
+          prompt,
+          max_tokens=max_tokens,
+          terminators=terminators,
+          temperature=temperature,
+          timeout=timeout,
+          seed=seed,
+      )
+
+  @override
+  def sample_choice(
+      self,
+      prompt: str,
+      responses: Sequence[str],
+      *,
+      seed: int | None = None,
+  ) -> tuple[int, str, Mapping[str, Any]]:
+    # The whole choice is admitted as one call, in one slot, although models
+    # served over an API may make several requests for it, each sampling up to
+    # `DEFAULT_MAX_TOKENS` tokens. Only the first of them is charged to the
+    # requests and tokens per minute budgets, so choices that are retried
+    # undercharge those budgets.
+    with self._scheduler.slot(
+        priority=self._priority,
+        tokens=_estimate_tokens(prompt, language_model.DEFAULT_MAX_TOKENS),
+    ):
+      return self._model.sample_choice(prompt, responses, seed=seed)
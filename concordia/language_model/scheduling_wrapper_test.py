@@ -0,0 +1,113 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for scheduling_wrapper.py."""
+
+from concurrent import futures
+import threading
+import time
+
+from absl.testing import absltest
+from concordia.language_model import scheduling_wrapper
+from concordia.tests import mock_model
+from concordia.utils import measurements as measurements_lib
+
+
+class _BlockingModel(mock_model.MockModel):
+  """Records calls and blocks each of them until released."""
+
+  def __init__(self):
+    super().__init__()
+    self.prompts = []
+    self.in_flight = 0
+    self.max_in_flight = 0
+    self.release = threading.Event()
+    self._lock = threading.Lock()
+
+  def sample_text(self, prompt, **kwargs):
+    with self._lock:
+      self.prompts.append(prompt)
+      self.in_flight += 1
+      self.max_in_flight = max(self.max_in_flight, self.in_flight)
+    self.release.wait()
+    with self._lock:
+      self.in_flight -= 1
+    return prompt
+
+
+def _wait_for(condition):
+  deadline = time.monotonic() + 5
+  while not condition():
+    if time.monotonic() > deadline:
+      raise TimeoutError()
+    time.sleep(0.001)
+
+
+class CallSchedulerTest(absltest.TestCase):
+
+  def test_limits_calls_in_flight(self):
+    model = _BlockingModel()
+    measurements = measurements_lib.Measurements()
+    scheduler = scheduling_wrapper.CallScheduler(
+        max_in_flight=3, measurements=measurements
+    )
+    scheduled = scheduling_wrapper.ScheduledLanguageModel(model, scheduler)
+    with futures.ThreadPoolExecutor(max_workers=10) as executor:
+      results = executor.map(scheduled.sample_text, map(str, range(10)))
+      _wait_for(lambda: model.in_flight == 3)
+      model.release.set()
+      self.assertEqual(list(results), list(map(str, range(10))))
+    self.assertEqual(model.max_in_flight, 3)
+
+    stats = []
+    measurements.get_channel(
+        scheduling_wrapper.DEFAULT_STATS_CHANNEL
+    ).subscribe(on_next=stats.append)
+    admissions = [datum for datum in stats if 'queue_wait_seconds' in datum]
+    self.assertLen(admissions, 10)
+    self.assertLessEqual(max(datum['in_flight'] for datum in stats), 3)
+
+  def test_higher_priority_calls_are_admitted_first(self):
+    model = _BlockingModel()
+    scheduler = scheduling_wrapper.CallScheduler(max_in_flight=1)
+    low = scheduling_wrapper.ScheduledLanguageModel(
+        model, scheduler, priority=scheduling_wrapper.METRICS_PRIORITY
+    )
+    high = scheduling_wrapper.ScheduledLanguageModel(
+        model, scheduler, priority=scheduling_wrapper.GAME_MASTER_PRIORITY
+    )
+    with futures.ThreadPoolExecutor(max_workers=3) as executor:
+      executor.submit(low.sample_text, 'first')
+      _wait_for(lambda: model.prompts == ['first'])
+      executor.submit(low.sample_text, 'low')
+      _wait_for(lambda: len(scheduler._queue) == 1)
+      executor.submit(high.sample_text, 'high')
+      _wait_for(lambda: len(scheduler._queue) == 2)
+      model.release.set()
+    self.assertEqual(model.prompts, ['first', 'high', 'low'])
+
+  def test_token_bucket_refills_over_time(self):
+    now = 0.0
+    bucket = scheduling_wrapper._TokenBucket(60, clock=lambda: now)
+    self.assertEqual(bucket.seconds_until_available(60), 0)
+    bucket.take(60)
+    self.assertEqual(bucket.seconds_until_available(30), 30)
+    now = 10.0
+    self.assertEqual(bucket.seconds_until_available(30), 20)
+    # Requests over the capacity wait for a full bucket.
+    self.assertEqual(bucket.seconds_until_available(1000), 50)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -25,13 +25,13 @@ https://www2.psy.unsw.edu.au/dass/DASSFAQ.htm
 """
 
 from collections.abc import Callable
-import concurrent
 from typing import Any
 
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import clock as game_clock
 from concordia.typing import component
+from concordia.utils import concurrency
 from concordia.utils import measurements as measurements_lib
 import numpy as np
 import termcolor
@@ -134,8 +134,7 @@ class Questionnaire(component.Component):
       if self._verbose:
         self._log('\n' + prompt.view().text() + '\n')
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-      executor.map(respond, self._questionnaire)
+    concurrency.map_parallel(respond, self._questionnaire)
 
     final_result = np.mean(numeric_results)
     datum = {
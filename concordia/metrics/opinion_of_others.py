@@ -16,13 +16,13 @@
 """Metric of player's opinion of other players."""
 
 from collections.abc import Sequence
-import concurrent.futures
 from typing import Callable
 
 from concordia.document import interactive_document
 from concordia.language_model import language_model
 from concordia.typing import clock as game_clock
 from concordia.typing import component
+from concordia.utils import concurrency
 from concordia.utils import measurements as measurements_lib
 
 DEFAULT_SCALE = (
@@ -155,10 +155,7 @@ class OpinionOfOthersMetric(component.Component):
   def update(self) -> None:
     """See base class."""
 
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=len(self._player_names)
-    ) as executor:
-      executor.map(self._get_opinion, self._player_names)
+    concurrency.map_parallel(self._get_opinion, self._player_names)
     self._timestep += 1
 
   def state(
@@ -22,6 +22,7 @@ https://arxiv.org/abs/2304.03442
 """
 
 import abc
+import asyncio
 from collections.abc import Sequence
 import dataclasses
 
@@ -89,6 +90,19 @@ class GenerativeAgent(metaclass=abc.ABCMeta):
     """Returns the agent's intended action."""
     raise NotImplementedError
 
+  async def act_async(
+      self, action_spec: ActionSpec = DEFAULT_ACTION_SPEC
+  ) -> str:
+    """Returns the agent's intended action, without blocking the event loop.
+
+    By default `act` is called in a worker thread. Agents whose models can be
+    awaited should override this.
+
+    Args:
+      action_spec: the action spec, as for `act`.
+    """
+    return await asyncio.to_thread(self.act, action_spec)
+
   @abc.abstractmethod
   def observe(
       self,
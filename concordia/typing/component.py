@@ -125,3 +125,7 @@ class Component(metaclass=abc.ABCMeta):
   ) -> Sequence['Component']:
     """Returns a list of components or an empty list."""
     return []
+
+  def close(self) -> None:
+    """Closes what the component keeps open, e.g. the file of its log."""
+    pass
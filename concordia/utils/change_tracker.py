@@ -0,0 +1,122 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Tracks whether the inputs of a component changed since it last updated.
+
+Components declare what their update reads, e.g. the version of a memory and
+the states of the components they are conditioned on, and skip the update
+while none of it has changed:
+
+  self._inputs = change_tracker.ChangeTracker(
+      change_tracker.memory_version(memory),
+      change_tracker.component_states(components),
+  )
+
+  def update(self):
+    if not self._inputs.changed():
+      return
+    ...
+
+Since a component that skips its update keeps its state, the components that
+read that state skip theirs too, so changes propagate up the component tree
+and nothing else does.
+"""
+
+from collections.abc import Callable, Hashable, Iterable, Sized
+import threading
+
+from concordia.typing import component
+
+Input = Callable[[], Hashable]
+
+
+class _MemoryVersion:
+  """The number of memories in a memory, which are never deleted."""
+
+  def __init__(self, memory: Sized):
+    self._memory = memory
+
+  def __call__(self) -> int:
+    return len(self._memory)
+
+
+def memory_version(memory: Sized) -> Input:
+  """Returns an input that changes whenever memories are added.
+
+  Memories are never deleted, so the number of memories is a version counter.
+
+  Args:
+    memory: an associative memory.
+  """
+  return _MemoryVersion(memory)
+
+
+def component_states(components: Iterable[component.Component]) -> Input:
+  """Returns an input that changes whenever the states of components change."""
+  components = tuple(components)
+  return lambda: tuple(comp.state() for comp in components)
+
+
+class ChangeTracker:
+  """Tells whether any of a set of inputs changed since they were recorded."""
+
+  def __init__(self, *inputs: Input):
+    """Initializes the tracker. Its inputs are considered changed at first.
+
+    Args:
+      *inputs: functions that return the current values of the inputs.
+    """
+    self._inputs = inputs
+    self._lock = threading.Lock()
+    self._values = None
+
+  def _read(self) -> tuple[Hashable, ...]:
+    return tuple(read() for read in self._inputs)
+
+  def changed(self) -> bool:
+    """Returns whether the inputs changed, and records their current values."""
+    values = self._read()
+    with self._lock:
+      changed = values != self._values
+      self._values = values
+    return changed
+
+  def record(self, num_memories_added: int) -> None:
+    """Records memories that the component itself added as unchanged inputs.
+
+    Call this after a component added memories to the memory it reads, so that
+    its own writes do not trigger its next update. Only the versions of the
+    memories are advanced, and only by the component's own writes: memories
+    that other components add concurrently, and any other change since the
+    last call to `changed`, still trigger the next update.
+
+    Args:
+      num_memories_added: the number of memories the component added, e.g. as
+        returned by `AssociativeMemory.add`.
+    """
+    with self._lock:
+      if self._values is None:
+        return
+      self._values = tuple(
+          value + num_memories_added
+          if isinstance(read, _MemoryVersion)
+          else value
+          for read, value in zip(self._inputs, self._values)
+      )
+
+  def invalidate(self) -> None:
+    """Makes the next call to `changed` return True."""
+    with self._lock:
+      self._values = None
@@ -0,0 +1,76 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for change_tracker.py."""
+
+from absl.testing import absltest
+from concordia.components import constant
+from concordia.utils import change_tracker
+
+
+class ChangeTrackerTest(absltest.TestCase):
+
+  def test_memory_version(self):
+    memory = []
+    tracker = change_tracker.ChangeTracker(
+        change_tracker.memory_version(memory)
+    )
+    self.assertTrue(tracker.changed())
+    self.assertFalse(tracker.changed())
+    memory.append('Alice went to the market.')
+    self.assertTrue(tracker.changed())
+    self.assertFalse(tracker.changed())
+
+  def test_component_states(self):
+    comp = constant.ConstantComponent(state='hungry')
+    tracker = change_tracker.ChangeTracker(
+        change_tracker.component_states([comp])
+    )
+    self.assertTrue(tracker.changed())
+    self.assertFalse(tracker.changed())
+    comp.set_state('thirsty')
+    self.assertTrue(tracker.changed())
+
+  def test_record_and_invalidate(self):
+    memory = []
+    tracker = change_tracker.ChangeTracker(
+        change_tracker.memory_version(memory)
+    )
+    tracker.changed()
+    memory.append('[self reflection] Alice is curious.')
+    tracker.record(1)
+    self.assertFalse(tracker.changed())
+    tracker.invalidate()
+    self.assertTrue(tracker.changed())
+
+  def test_record_keeps_foreign_changes(self):
+    memory = []
+    comp = constant.ConstantComponent(state='hungry')
+    tracker = change_tracker.ChangeTracker(
+        change_tracker.memory_version(memory),
+        change_tracker.component_states([comp]),
+    )
+    tracker.changed()
+    # Another component adds a memory, and a child changes its state, while
+    # this component updates and adds its own memory.
+    memory.append('Bob went to the market.')
+    comp.set_state('thirsty')
+    memory.append('[self reflection] Alice is curious.')
+    tracker.record(1)
+    self.assertTrue(tracker.changed())
+    self.assertFalse(tracker.changed())
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,189 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Schedules updates of a graph of components.
+
+A component is updated after the components returned by its `get_components`,
+as in `helper_functions.apply_recursively`. `ComponentGraph` builds the graph
+of these dependencies once, updates a component shared by several parents only
+once per pass, and starts each component as soon as its own dependencies are
+done rather than when its parent is reached. The passes run in the shared pool
+of `concordia.utils.concurrency`, whose size bounds the number of components
+updated at once.
+
+The time each component took in the last pass is recorded, so that the
+critical path of an update, the chain of dependencies that bounds its
+duration, can be inspected.
+"""
+
+from collections.abc import Iterable, Sequence
+from concurrent import futures
+import dataclasses
+import threading
+import time
+
+from concordia.typing import component
+from concordia.utils import concurrency
+
+
+@dataclasses.dataclass(frozen=True)
+class NodeTiming:
+  """When a component was updated in the last pass.
+
+  Attributes:
+    component: the component.
+    start: when its update started, in seconds since the pass started.
+    end: when its update ended, in seconds since the pass started.
+  """
+
+  component: component.Component
+  start: float
+  end: float
+
+  @property
+  def name(self) -> str:
+    return self.component.name()
+
+  @property
+  def seconds(self) -> float:
+    return self.end - self.start
+
+
+class ComponentGraph:
+  """The components of an agent or game master and their dependencies."""
+
+  def __init__(self, components: Iterable[component.Component]):
+    """Builds the graph of the components and their subcomponents.
+
+    The subcomponents are read once, so the graph should be rebuilt if a
+    component changes what its `get_components` returns.
+
+    Args:
+      components: the top level components.
+
+    Raises:
+      ValueError: if the components depend on each other in a cycle.
+    """
+    self._order: list[component.Component] = []
+    self._dependencies: dict[int, list[component.Component]] = {}
+    visiting = set()
+
+    def visit(comp: component.Component) -> None:
+      key = id(comp)
+      if key in self._dependencies:
+        return
+      if key in visiting:
+        raise ValueError(f'Component {comp.name()} depends on itself.')
+      visiting.add(key)
+      dependencies = []
+      for child in comp.get_components():
+        visit(child)
+        if all(child is not other for other in dependencies):
+          dependencies.append(child)
+      visiting.remove(key)
+      self._dependencies[key] = dependencies
+      self._order.append(comp)
+
+    for comp in components:
+      visit(comp)
+
+    self._timings_lock = threading.Lock()
+    self._timings: dict[int, NodeTiming] = {}
+
+  @property
+  def components(self) -> Sequence[component.Component]:
+    """All the components, each after the components it depends on."""
+    return tuple(self._order)
+
+  def dependencies(
+      self, comp: component.Component
+  ) -> Sequence[component.Component]:
+    """Returns the components that are updated before `comp`."""
+    return tuple(self._dependencies[id(comp)])
+
+  def apply(self, function_name: str, function_arg: str | None = None) -> None:
+    """Calls a function of every component, after those it depends on.
+
+    Args:
+      function_name: the name of the function to call.
+      function_arg: the argument to pass to the function, if any.
+    """
+    pass_start = time.perf_counter()
+    timings = {}
+    done: dict[int, futures.Future[None]] = {}
+
+    def call(comp: component.Component) -> None:
+      for dependency in self._dependencies[id(comp)]:
+        # Dependencies were submitted first, so they are running or done.
+        done[id(dependency)].result()
+      start = time.perf_counter()
+      if function_arg is None:
+        getattr(comp, function_name)()
+      else:
+        getattr(comp, function_name)(function_arg)
+      timings[id(comp)] = NodeTiming(
+          component=comp,
+          start=start - pass_start,
+          end=time.perf_counter() - pass_start,
+      )
+
+    try:
+      with concurrency.task_group() as group:
+        for comp in self._order:
+          done[id(comp)] = group.submit(call, comp)
+    finally:
+      with self._timings_lock:
+        self._timings = timings
+
+  def update(self) -> None:
+    """Updates every component, after those it depends on."""
+    self.apply('update')
+
+  def timings(self) -> Sequence[NodeTiming]:
+    """Returns the timings of the components updated in the last pass."""
+    with self._timings_lock:
+      timings = dict(self._timings)
+    return tuple(
+        timings[id(comp)] for comp in self._order if id(comp) in timings
+    )
+
+  def critical_path(self) -> Sequence[NodeTiming]:
+    """Returns the longest chain of dependencies in the last pass.
+
+    The chain is the one whose updates took the longest in total, so with
+    enough threads it bounds how long a pass takes. It is listed in the order
+    the components were updated.
+    """
+    with self._timings_lock:
+      timings = dict(self._timings)
+    if not timings:
+      return ()
+    longest: dict[int, tuple[float, list[NodeTiming]]] = {}
+    for comp in self._order:
+      key = id(comp)
+      if key not in timings:
+        continue
+      seconds, path = max(
+          (
+              longest[id(dependency)]
+              for dependency in self._dependencies[key]
+              if id(dependency) in longest
+          ),
+          key=lambda item: item[0],
+          default=(0.0, []),
+      )
+      longest[key] = (seconds + timings[key].seconds, path + [timings[key]])
+    _, path = max(longest.values(), key=lambda item: item[0])
+    return tuple(path)
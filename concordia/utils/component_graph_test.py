@@ -0,0 +1,108 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for component_graph.py."""
+
+from collections.abc import Sequence
+import time
+
+from absl.testing import absltest
+from concordia.typing import component
+from concordia.utils import component_graph
+
+
+class _Component(component.Component):
+  """Records when it was updated."""
+
+  def __init__(
+      self,
+      name: str,
+      log: list[str],
+      components: Sequence[component.Component] = (),
+      seconds: float = 0.0,
+  ):
+    self._name = name
+    self._log = log
+    self._components = list(components)
+    self._seconds = seconds
+
+  def name(self) -> str:
+    return self._name
+
+  def get_components(self) -> Sequence[component.Component]:
+    return self._components
+
+  def update(self) -> None:
+    time.sleep(self._seconds)
+    self._log.append(self._name)
+
+
+class ComponentGraphTest(absltest.TestCase):
+
+  def test_shared_components_are_updated_once_before_parents(self):
+    log = []
+    memory = _Component('memory', log)
+    plan = _Component('plan', log, [memory])
+    identity = _Component('identity', log, [memory])
+    graph = component_graph.ComponentGraph([plan, memory, identity])
+    self.assertEqual(graph.components, (memory, plan, identity))
+    self.assertEqual(graph.dependencies(plan), (memory,))
+
+    graph.update()
+    self.assertLen(log, 3)
+    self.assertEqual(log[0], 'memory')
+    self.assertCountEqual(log[1:], ['plan', 'identity'])
+
+  def test_critical_path(self):
+    log = []
+    slow = _Component('slow', log, seconds=0.2)
+    fast = _Component('fast', log, seconds=0.01)
+    parent = _Component('parent', log, [fast, slow], seconds=0.01)
+    other = _Component('other', log, seconds=0.05)
+    graph = component_graph.ComponentGraph([parent, other])
+
+    start = time.perf_counter()
+    graph.update()
+    # All leaves start at once, so the pass takes about as long as its
+    # critical path rather than the sum of the updates.
+    self.assertLess(time.perf_counter() - start, 0.26)
+    self.assertEqual(
+        [timing.name for timing in graph.critical_path()], ['slow', 'parent']
+    )
+    timings = {timing.name: timing for timing in graph.timings()}
+    self.assertLen(timings, 4)
+    self.assertGreaterEqual(timings['parent'].start, timings['slow'].end)
+    self.assertGreaterEqual(timings['slow'].seconds, 0.2)
+
+  def test_cycles_are_rejected(self):
+    log = []
+    child = _Component('child', log)
+    parent = _Component('parent', log, [child])
+    child.get_components = lambda: [parent]
+    with self.assertRaises(ValueError):
+      component_graph.ComponentGraph([parent])
+
+  def test_failures_skip_dependent_components(self):
+    log = []
+    failing = _Component('failing', log)
+    failing.update = lambda: 1 / 0
+    parent = _Component('parent', log, [failing])
+    graph = component_graph.ComponentGraph([parent])
+    with self.assertRaises(ZeroDivisionError):
+      graph.update()
+    self.assertEmpty(log)
+
+
+if __name__ == '__main__':
+  absltest.main()
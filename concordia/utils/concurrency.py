@@ -12,15 +12,179 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Better error handling for ThreadPoolExecutors."""
+"""A shared thread pool with structured task groups.
 
-from collections.abc import Collection, Iterator
+Agents, game masters and components fan work out to threads several times per
+step, usually from threads that are themselves fanning out. Rather than create
+a thread pool for every fan out, all of them share one bounded, process-wide
+pool through task groups:
+
+  with concurrency.task_group() as group:
+    for comp in components:
+      group.submit(comp.update)
+
+A task group waits for all its tasks on exit. If a task raises, the group's
+pending tasks are cancelled and the exception is re-raised to the caller.
+While it waits, the calling thread runs the group's tasks that no worker has
+started yet, so nested task groups cannot deadlock the bounded pool.
+"""
+
+from collections.abc import Callable, Collection, Iterator
 from concurrent import futures
 import contextlib
-from typing import Any, Callable, TypeVar
+import functools
+import threading
+from typing import Any, TypeVar
 
 _T = TypeVar('_T')
 
+DEFAULT_MAX_WORKERS = 32
+
+_pool_lock = threading.Lock()
+_pool: futures.ThreadPoolExecutor | None = None
+_max_workers = DEFAULT_MAX_WORKERS
+
+
+def set_max_workers(max_workers: int) -> None:
+  """Sets the number of threads in the shared pool.
+
+  Tasks already submitted to the previous pool still run to completion.
+
+  Args:
+    max_workers: the maximum number of threads in the shared pool.
+  """
+  global _pool, _max_workers
+  if max_workers < 1:
+    raise ValueError(f'max_workers must be positive, got {max_workers}.')
+  with _pool_lock:
+    _max_workers = max_workers
+    old_pool, _pool = _pool, None
+  if old_pool is not None:
+    old_pool.shutdown(wait=False)
+
+
+def get_max_workers() -> int:
+  """Returns the number of threads in the shared pool."""
+  return _max_workers
+
+
+def _get_pool() -> futures.ThreadPoolExecutor:
+  global _pool
+  with _pool_lock:
+    if _pool is None:
+      _pool = futures.ThreadPoolExecutor(
+          max_workers=_max_workers, thread_name_prefix='concordia'
+      )
+    return _pool
+
+
+class _Task:
+  """A call that runs once, either in a pool worker or in a waiting thread."""
+
+  def __init__(self, fn: Callable[[], Any]):
+    self.future = futures.Future()
+    self._fn = fn
+    self._claim = threading.Lock()
+
+  def run(self) -> None:
+    """Runs the call, unless it has already been started or cancelled."""
+    if not self._claim.acquire(blocking=False):
+      return
+    if not self.future.set_running_or_notify_cancel():
+      return
+    try:
+      result = self._fn()
+    except BaseException as e:  # pylint: disable=broad-exception-caught
+      self.future.set_exception(e)
+    else:
+      self.future.set_result(result)
+
+
+class TaskGroup:
+  """Tasks submitted to the shared pool that are waited for together.
+
+  Create task groups with `task_group`, which waits for the tasks on exit.
+  """
+
+  def __init__(self):
+    self._tasks: list[_Task] = []
+    self._cancelled = False
+    self._closed = False
+
+  def submit(
+      self, fn: Callable[..., _T], /, *args: Any, **kwargs: Any
+  ) -> 'futures.Future[_T]':
+    """Runs `fn(*args, **kwargs)` in the shared pool.
+
+    Args:
+      fn: the function to call.
+      *args: positional arguments to call it with.
+      **kwargs: keyword arguments to call it with.
+
+    Returns:
+      A future for the result of the call. It is done once the group exits.
+    """
+    if self._closed:
+      raise RuntimeError('Cannot submit to a task group that has exited.')
+    task = _Task(functools.partial(fn, *args, **kwargs))
+    task.future.add_done_callback(self._on_done)
+    self._tasks.append(task)
+    if self._cancelled:
+      task.future.cancel()
+    else:
+      _get_pool().submit(task.run)
+    return task.future
+
+  def cancel(self) -> None:
+    """Cancels the tasks that have not started yet, and any submitted later."""
+    self._cancelled = True
+    for task in list(self._tasks):
+      task.future.cancel()
+
+  def _on_done(self, future: futures.Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+      self.cancel()
+
+  def _wait(self) -> None:
+    """Waits for all tasks, running the ones not started yet in this thread."""
+    self._closed = True
+    # Cancelled tasks are only done once something tries to run them.
+    for task in self._tasks:
+      task.run()
+    futures.wait([task.future for task in self._tasks])
+
+  def _first_exception(self) -> BaseException | None:
+    for task in self._tasks:
+      if not task.future.cancelled() and task.future.exception() is not None:
+        return task.future.exception()
+    return None
+
+
+@contextlib.contextmanager
+def task_group() -> Iterator[TaskGroup]:
+  """Context manager for a group of tasks run in the shared pool.
+
+  On exit, blocks until every task in the group has finished. If a task
+  raises, the tasks that have not started are cancelled and the exception of
+  the first failed task, in order of submission, is raised. If the body of the
+  `with` statement raises, the pending tasks are cancelled, the running ones
+  are waited for, and the exception propagates.
+
+  Yields:
+    The task group.
+  """
+  group = TaskGroup()
+  try:
+    yield group
+  except BaseException:
+    group.cancel()
+    group._wait()  # pylint: disable=protected-access
+    raise
+  group._wait()  # pylint: disable=protected-access
+  exception = group._first_exception()  # pylint: disable=protected-access
+  if exception is not None:
+    raise exception
+
 
 @contextlib.contextmanager
 def executor(**kwargs) -> Iterator[futures.ThreadPoolExecutor]:
@@ -35,6 +199,8 @@ def executor(**kwargs) -> Iterator[futures.ThreadPoolExecutor]:
   pending futures will be cancelled. This allows errors to quickly propagate to
   the caller.
 
+  Prefer `task_group`, which reuses the threads of the shared pool.
+
   Args:
     **kwargs: Forwarded to ThreadPoolExecutor.
 
@@ -58,7 +224,7 @@ def map_parallel(
 ) -> Iterator[_T]:
   """Maps a function to a sequence of values in parallel.
 
-  Convenience wrapper for ThreadPoolExecutor.map.
+  The calls run in the shared pool.
 
   Args:
     fn: function to execute
@@ -71,8 +237,13 @@ def map_parallel(
 
   Raises:
     TimeoutError: If the entire result iterator could not be generated before
-        the given timeout.
+        the given timeout. Calls that have not started are cancelled.
     Exception: If fn(*args) raises for any values.
   """
-  with executor(max_workers=len(iterables)) as executor_:
-    return executor_.map(fn, *iterables, timeout=timeout)
+  with task_group() as group:
+    results = [group.submit(fn, *args) for args in zip(*iterables)]
+    if timeout is not None:
+      _, not_done = futures.wait(results, timeout=timeout)
+      if not_done:
+        raise TimeoutError()
+  return iter([result.result() for result in results])
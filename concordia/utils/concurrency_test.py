@@ -0,0 +1,118 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for concurrency.py."""
+
+import threading
+
+from absl.testing import absltest
+from concordia.utils import concurrency
+
+
+class _Error(Exception):
+  pass
+
+
+class TaskGroupTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    max_workers = concurrency.get_max_workers()
+    self.addCleanup(concurrency.set_max_workers, max_workers)
+
+  def test_results_are_available_after_exit(self):
+    with concurrency.task_group() as group:
+      results = [group.submit(lambda x: x * 2, i) for i in range(10)]
+    self.assertEqual(
+        [result.result() for result in results], [i * 2 for i in range(10)]
+    )
+
+  def test_threads_are_reused(self):
+    concurrency.set_max_workers(2)
+    threads = set()
+    for _ in range(10):
+      with concurrency.task_group() as group:
+        for _ in range(4):
+          group.submit(lambda: threads.add(threading.current_thread()))
+    # The pool's two workers, and possibly the thread that waits.
+    self.assertLessEqual(len(threads), 3)
+
+  def test_exceptions_propagate_and_cancel_pending_tasks(self):
+    concurrency.set_max_workers(1)
+    started = threading.Event()
+    release = threading.Event()
+    ran = []
+
+    def block():
+      started.set()
+      release.wait()
+
+    def fail():
+      raise _Error()
+
+    with self.assertRaises(_Error):
+      with concurrency.task_group() as group:
+        group.submit(block)
+        started.wait()
+        # The only worker is busy, so these run in this thread on exit.
+        group.submit(fail)
+        pending = [group.submit(ran.append, i) for i in range(5)]
+        threading.Timer(0.1, release.set).start()
+    self.assertEmpty(ran)
+    self.assertTrue(all(future.cancelled() for future in pending))
+
+  def test_body_exception_cancels_pending_tasks(self):
+    concurrency.set_max_workers(1)
+    started = threading.Event()
+    release = threading.Event()
+    ran = []
+
+    def block():
+      started.set()
+      release.wait()
+
+    with self.assertRaises(_Error):
+      with concurrency.task_group() as group:
+        group.submit(block)
+        started.wait()
+        group.submit(ran.append, 0)
+        threading.Timer(0.1, release.set).start()
+        raise _Error()
+    self.assertEmpty(ran)
+
+  def test_nested_groups_do_not_deadlock(self):
+    concurrency.set_max_workers(2)
+
+    def outer(i):
+      with concurrency.task_group() as group:
+        inner = [group.submit(lambda j: i * 10 + j, j) for j in range(3)]
+      return sum(future.result() for future in inner)
+
+    self.assertEqual(
+        list(concurrency.map_parallel(outer, range(8))),
+        [i * 30 + 3 for i in range(8)],
+    )
+
+  def test_map_parallel_raises(self):
+    def fail_on_three(x):
+      if x == 3:
+        raise _Error()
+      return x
+
+    with self.assertRaises(_Error):
+      concurrency.map_parallel(fail_on_three, range(10))
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -122,16 +122,14 @@ def apply_recursively(
   """
 
   if concurrent_child_calls:
-    with concurrency.executor(
-        max_workers=len(parent_component.get_components())) as executor:
+    with concurrency.task_group() as group:
       for child_component in parent_component.get_components():
-        executor.submit(
+        group.submit(
             apply_recursively,
             child_component,
             function_name,
             function_arg=function_arg,
             concurrent_child_calls=concurrent_child_calls,
-            executor=executor,
         )
   else:
     for child_component in parent_component.get_components():
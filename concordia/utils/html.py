@@ -17,6 +17,8 @@
 
 import html
 
+from concordia.utils import log_sink
+
 HTML_HEAD = """
   <!DOCTYPE html>
   <html>
@@ -119,7 +121,7 @@ class PythonObjectToHTMLConverter:
     if isinstance(python_object, str):
       self.html_writer.write(html.escape(python_object))
 
-    elif isinstance(python_object, list):
+    elif isinstance(python_object, (list, log_sink.LogSink)):
       for item in python_object:
         self._convert_python_object(item)
         self.html_writer.write("<br />")
@@ -0,0 +1,187 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""Append-only logs of agents and game masters, optionally spilled to disk.
+
+Log entries hold whole prompts, so over a long simulation the logs can grow
+to many gigabytes. A `LogSink` keeps only its latest entries in memory. Given
+a path, it also streams every entry to a gzip compressed JSON lines file, and
+reads the older entries back from the file, lazily, when the log is iterated
+or indexed. Without a path and with no bound on the entries in memory, it
+behaves like the list it replaces.
+"""
+
+import collections
+from collections.abc import Iterator, Mapping, Sequence
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import threading
+from typing import Any, BinaryIO
+
+# Entries kept in memory by a sink that spills to disk, if not specified.
+DEFAULT_MAX_ENTRIES_IN_MEMORY = 100
+
+
+class _Prefix(io.RawIOBase):
+  """Reads no further than a given number of bytes into a file."""
+
+  def __init__(self, file: BinaryIO, size: int):
+    self._file = file
+    self._remaining = size
+
+  def readable(self) -> bool:
+    return True
+
+  def readinto(self, buffer) -> int:
+    data = self._file.read(min(len(buffer), self._remaining))
+    buffer[:len(data)] = data
+    self._remaining -= len(data)
+    return len(data)
+
+
+class LogSink(Sequence[Mapping[str, Any]]):
+  """An append-only log of entries, the latest of which are kept in memory.
+
+  Entries are written to disk, if a path is given, as JSON. Values that JSON
+  cannot represent, such as dates, are written as strings, so entries read back
+  from disk may differ from the ones appended in the types of their values.
+  """
+
+  def __init__(
+      self,
+      path: str | None = None,
+      max_entries_in_memory: int | None = None,
+  ):
+    """Initializes the sink.
+
+    Args:
+      path: if not None, the file to write every entry to. Any existing file
+        is overwritten.
+      max_entries_in_memory: how many of the latest entries to keep in memory.
+        If None, `DEFAULT_MAX_ENTRIES_IN_MEMORY` when writing to disk, and all
+        of them otherwise. Without a path, older entries are dropped.
+    """
+    if path is not None and max_entries_in_memory is None:
+      max_entries_in_memory = DEFAULT_MAX_ENTRIES_IN_MEMORY
+    self._path = path
+    self._file = None if path is None else open(path, 'wb')
+    self._lock = threading.Lock()
+    self._latest = collections.deque(maxlen=max_entries_in_memory)
+    self._num_entries = 0
+    self._num_bytes = 0
+
+  def append(self, entry: Mapping[str, Any]) -> None:
+    """Appends an entry to the log.
+
+    Args:
+      entry: the entry to append.
+
+    Raises:
+      ValueError: if the sink writes to disk and has been closed.
+    """
+    if self._file is not None:
+      line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+      # Each entry is a complete gzip member, so that the file can be read
+      # while it is written.
+      data = gzip.compress(line.encode('utf-8'), mtime=0)
+    with self._lock:
+      if self._file is not None:
+        if self._file.closed:
+          raise ValueError(f'Cannot append to the closed log {self._path}.')
+        self._file.write(data)
+        self._file.flush()
+        self._num_bytes += len(data)
+        self._num_entries += 1
+      self._latest.append(entry)
+
+  def close(self) -> None:
+    """Closes the file, after which no more entries can be appended.
+
+    All the entries, including the ones that are not in memory, can still be
+    read, from the file at the sink's path.
+    """
+    with self._lock:
+      if self._file is not None:
+        self._file.close()
+
+  def _snapshot(self) -> tuple[int, list[Mapping[str, Any]], int]:
+    """Returns the number of entries, the latest entries and the file size."""
+    with self._lock:
+      if self._file is None:
+        return len(self._latest), list(self._latest), 0
+      return self._num_entries, list(self._latest), self._num_bytes
+
+  def _read(self, num_bytes: int) -> Iterator[Mapping[str, Any]]:
+    """Reads the entries in the first `num_bytes` bytes of the file."""
+    with open(self._path, 'rb') as f:
+      with gzip.GzipFile(fileobj=io.BufferedReader(_Prefix(f, num_bytes))) as g:
+        for line in g:
+          yield json.loads(line)
+
+  def __len__(self) -> int:
+    with self._lock:
+      if self._file is None:
+        return len(self._latest)
+      return self._num_entries
+
+  def __iter__(self) -> Iterator[Mapping[str, Any]]:
+    num_entries, latest, num_bytes = self._snapshot()
+    num_on_disk_only = num_entries - len(latest)
+    if num_on_disk_only:
+      yield from itertools.islice(self._read(num_bytes), num_on_disk_only)
+    yield from latest
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return list(self)[index]
+    num_entries, latest, num_bytes = self._snapshot()
+    if index < 0:
+      index += num_entries
+    if not 0 <= index < num_entries:
+      raise IndexError('log index out of range')
+    first_in_memory = num_entries - len(latest)
+    if index >= first_in_memory:
+      return latest[index - first_in_memory]
+    return next(itertools.islice(self._read(num_bytes), index, None))
+
+
+def in_directory(directory: str | None, name: str) -> LogSink:
+  """Returns a sink that writes to a file named after `name` in `directory`.
+
+  Args:
+    directory: the directory to write the log to, which is created if it does
+      not exist. If None, the sink keeps all of its entries in memory.
+    name: the name of the log, e.g. the name of the agent it belongs to. It
+      may contain any characters: the file is always in `directory`.
+  """
+  if directory is None:
+    return LogSink()
+  os.makedirs(directory, exist_ok=True)
+  return LogSink(os.path.join(directory, f'{_file_name(name)}.jsonl.gz'))
+
+
+def _file_name(name: str) -> str:
+  """Returns a file name for `name`, made of safe characters only."""
+  file_name = re.sub(r'[^\w\-. ]', '_', name).strip(' .')
+  if file_name == name:
+    return name
+  # Names that map to the same safe characters still get different files.
+  digest = hashlib.sha256(name.encode('utf-8')).hexdigest()[:8]
+  return f'{file_name}_{digest}' if file_name else digest
@@ -0,0 +1,128 @@
+# Copyright 2023 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for log_sink.py."""
+
+import datetime
+import gzip
+import json
+import os
+import tempfile
+
+from absl.testing import absltest
+from concordia.utils import html as html_lib
+from concordia.utils import log_sink
+
+_DATE = datetime.datetime(2024, 1, 1)
+
+
+def _entry(i: int) -> dict[str, object]:
+  return {'date': _DATE, 'Summary': f'step {i}', 'Chain': ['a', 'b']}
+
+
+class LogSinkTest(absltest.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._path = os.path.join(
+        self.enter_context(tempfile.TemporaryDirectory()), 'log.jsonl.gz'
+    )
+
+  def test_in_memory(self):
+    log = log_sink.LogSink()
+    self.assertEmpty(log)
+    for i in range(3):
+      log.append(_entry(i))
+    self.assertEqual(list(log), [_entry(0), _entry(1), _entry(2)])
+    self.assertEqual(log[-1], _entry(2))
+    self.assertEqual(log[:2], [_entry(0), _entry(1)])
+
+  def test_bounded_in_memory(self):
+    log = log_sink.LogSink(max_entries_in_memory=2)
+    for i in range(3):
+      log.append(_entry(i))
+    self.assertEqual(list(log), [_entry(1), _entry(2)])
+
+  def test_spills_to_disk(self):
+    log = log_sink.LogSink(self._path, max_entries_in_memory=2)
+    for i in range(5):
+      log.append(_entry(i))
+    self.assertLen(log, 5)
+    entries = list(log)
+    self.assertLen(entries, 5)
+    # Older entries are read back from disk, where dates are strings.
+    self.assertEqual(entries[0], {**_entry(0), 'date': str(_DATE)})
+    self.assertEqual(log[1]['Summary'], 'step 1')
+    self.assertEqual(entries[4], _entry(4))
+    self.assertEqual(log[-1], _entry(4))
+    with self.assertRaises(IndexError):
+      _ = log[5]
+
+    with gzip.open(self._path, 'rt', encoding='utf-8') as f:
+      self.assertLen([json.loads(line) for line in f], 5)
+
+  def test_entries_can_be_read_while_writing(self):
+    log = log_sink.LogSink(self._path, max_entries_in_memory=1)
+    log.append(_entry(0))
+    log.append(_entry(1))
+    entries = iter(log)
+    self.assertEqual(next(entries)['Summary'], 'step 0')
+    log.append(_entry(2))
+    self.assertEqual(next(entries), _entry(1))
+    with self.assertRaises(StopIteration):
+      next(entries)
+
+  def test_entries_can_be_read_after_close(self):
+    log = log_sink.LogSink(self._path, max_entries_in_memory=1)
+    for i in range(2):
+      log.append(_entry(i))
+    log.close()
+    self.assertEqual([entry['Summary'] for entry in log], ['step 0', 'step 1'])
+    with self.assertRaisesRegex(ValueError, 'closed'):
+      log.append(_entry(2))
+    self.assertLen(log, 2)
+
+  def test_in_directory(self):
+    directory = os.path.dirname(self._path)
+    log = log_sink.in_directory(os.path.join(directory, 'logs'), 'Alice')
+    log.append(_entry(0))
+    self.assertTrue(
+        os.path.exists(os.path.join(directory, 'logs', 'Alice.jsonl.gz'))
+    )
+    self.assertEqual(list(log_sink.in_directory(None, 'Alice')), [])
+
+  def test_in_directory_keeps_names_in_the_directory(self):
+    directory = os.path.dirname(self._path)
+    names = ['../Alice', 'Alice/..', '..', 'Alice_..', 'Alice Smith']
+    logs = [log_sink.in_directory(directory, name) for name in names]
+    for log in logs:
+      log.append(_entry(0))
+    files = sorted(os.listdir(directory))
+    self.assertLen(files, len(names))
+    self.assertIn('Alice Smith.jsonl.gz', files)
+    self.assertNotIn(
+        'Alice.jsonl.gz', os.listdir(os.path.dirname(directory))
+    )
+
+  def test_html(self):
+    log = log_sink.LogSink(self._path, max_entries_in_memory=1)
+    for i in range(2):
+      log.append(_entry(i))
+    html = html_lib.PythonObjectToHTMLConverter(log).convert()
+    self.assertIn('step 0', html)
+    self.assertIn('step 1', html)
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -15,6 +15,8 @@
 """Helper functions for language model sampling.
 """
 
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Collection
+from collections.abc import Iterable, Iterator
 import re
 
 
@@ -52,3 +54,114 @@ def dynamically_adjust_temperature(
   elif attempts > (max_attempts / 2.0):
     temperature = 0.75
   return temperature
+
+
+def _find_terminator(text: str, terminators: Collection[str]) -> int | None:
+  """Returns where the first terminator in the text starts, if there is one."""
+  indices = [text.find(terminator) for terminator in terminators]
+  return min((index for index in indices if index != -1), default=None)
+
+
+class _Truncation:
+  """Splits chunks of text into the text that is ready and the text held back.
+
+  Text that could be the start of a terminator split across chunks is held
+  back until the next chunk shows whether it is.
+  """
+
+  def __init__(
+      self,
+      terminators: Collection[str],
+      stop: Callable[[str], bool] | None,
+  ):
+    self._terminators = [terminator for terminator in terminators if terminator]
+    self._held_back = max(map(len, self._terminators), default=1) - 1
+    self._stop = stop
+    self._text = ''
+    self._pending = ''
+    self.done = False
+
+  def add(self, chunk: str) -> str:
+    """Returns the text that is ready after a chunk, and sets `done` if ended."""
+    self._pending += chunk
+    end = _find_terminator(self._pending, self._terminators)
+    if end is not None:
+      ready, self._pending = self._pending[:end], ''
+      self.done = True
+    else:
+      split = max(0, len(self._pending) - self._held_back)
+      ready, self._pending = self._pending[:split], self._pending[split:]
+    if ready:
+      self._text += ready
+      if self._stop is not None and self._stop(self._text):
+        self.done = True
+    return ready
+
+  def flush(self) -> str:
+    """Returns the text held back, once the chunks have ended."""
+    pending, self._pending = self._pending, ''
+    return pending
+
+
+def stream_until(
+    chunks: Iterable[str],
+    terminators: Collection[str] = (),
+    stop: Callable[[str], bool] | None = None,
+) -> Iterator[str]:
+  """Yields chunks of text up to the first terminator, or until `stop` fires.
+
+  Text that could be the start of a terminator split across chunks is held
+  back until the next chunk shows whether it is. Once iteration ends early,
+  whether at a terminator, because `stop` returned True or because the caller
+  closed the iterator, the chunks are closed so that a streaming source can
+  stop generating.
+
+  Args:
+    chunks: consecutive chunks of text, e.g. as they are generated.
+    terminators: the text ends before the first occurrence of any of these.
+    stop: optional predicate, called with all the text yielded so far after
+      each chunk. Once it returns True, no more text is yielded.
+
+  Yields:
+    Consecutive chunks of the text.
+  """
+  truncation = _Truncation(terminators, stop)
+  chunks = iter(chunks)
+  try:
+    for chunk in chunks:
+      ready = truncation.add(chunk)
+      if ready:
+        yield ready
+      if truncation.done:
+        return
+    pending = truncation.flush()
+    if pending:
+      yield pending
+  finally:
+    close = getattr(chunks, 'close', None)
+    if close is not None:
+      close()
+
+
+async def astream_until(
+    chunks: AsyncIterable[str],
+    terminators: Collection[str] = (),
+    stop: Callable[[str], bool] | None = None,
+) -> AsyncIterator[str]:
+  """Asynchronous version of `stream_until`, for chunks that are awaited."""
+  truncation = _Truncation(terminators, stop)
+  chunks = aiter(chunks)
+  try:
+    async for chunk in chunks:
+      ready = truncation.add(chunk)
+      if ready:
+        yield ready
+      if truncation.done:
+        return
+    pending = truncation.flush()
+    if pending:
+      yield pending
+  finally:
+    aclose = getattr(chunks, 'aclose', None)
+    if aclose is not None:
+      await aclose()
@@ -0,0 +1,77 @@
+# Copyright 2024 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for sampling.py."""
+
+import asyncio
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from concordia.utils import sampling
+
+
+class StreamUntilTest(parameterized.TestCase):
+
+  @parameterized.named_parameters(
+      ('no_terminators', ['Hello', ' world'], (), 'Hello world'),
+      ('terminator_in_chunk', ['Hello.', ' world'], ('.',), 'Hello'),
+      ('terminator_across_chunks', ['Hi <e', 'nd> there'], ('<end>',), 'Hi '),
+      ('partial_terminator', ['Hi <e', 'x'], ('<end>',), 'Hi <ex'),
+      ('earliest_terminator', ['a;b.c'], ('.', ';'), 'a'),
+  )
+  def test_terminators(self, chunks, terminators, expected):
+    self.assertEqual(
+        ''.join(sampling.stream_until(chunks, terminators)), expected
+    )
+
+  def test_stop_ends_the_stream_and_closes_the_source(self):
+    generated = []
+    closed = []
+
+    def source():
+      try:
+        for word in ['One sentence.', ' Another', ' sentence.']:
+          generated.append(word)
+          yield word
+      finally:
+        closed.append(True)
+
+    text = ''.join(
+        sampling.stream_until(source(), stop=lambda text: '.' in text)
+    )
+    self.assertEqual(text, 'One sentence.')
+    self.assertEqual(generated, ['One sentence.'])
+    self.assertEqual(closed, [True])
+
+  def test_async_stream_ends_at_a_terminator_and_closes_the_source(self):
+    closed = []
+
+    async def source():
+      try:
+        for chunk in ['Hi <e', 'nd> there', ' and more']:
+          yield chunk
+      finally:
+        closed.append(True)
+
+    async def collect():
+      return [
+          chunk async for chunk in sampling.astream_until(source(), ('<end>',))
+      ]
+
+    self.assertEqual(''.join(asyncio.run(collect())), 'Hi ')
+    self.assertEqual(closed, [True])
+
+
+if __name__ == '__main__':
+  absltest.main()
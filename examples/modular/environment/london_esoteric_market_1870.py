@@ -463,6 +463,7 @@ class Simulation(Runnable):
       measurements: measurements_lib.Measurements,
       agent_module: types.ModuleType = basic_agent__main_role,
       resident_visitor_modules: Sequence[types.ModuleType] | None = None,
+      log_dir: str | None = None,
   ):
     """Initialize the simulation object.
 
@@ -475,6 +476,8 @@ class Simulation(Runnable):
       agent_module: the agent module to use for all main characters.
       resident_visitor_modules: optionally, use different modules for majority
         and minority parts of the focal population.
+      log_dir: if not None, the directory to write the logs of the players and
+        the game master to, keeping only their latest entries in memory.
     """
     if resident_visitor_modules is None:
       self._two_focal_populations = False
@@ -514,31 +517,30 @@ class Simulation(Runnable):
 
     supporting_player_names = [cfg.name for cfg in supporting_player_configs]
 
-    num_main_players = len(main_player_configs)
     num_supporting_players = len(supporting_player_configs)
 
     self._all_memories = {}
 
     main_player_memory_futures = []
-    with concurrency.executor(max_workers=num_main_players) as pool:
+    with concurrency.task_group() as group:
       for player_config in main_player_configs:
-        future = pool.submit(self._make_player_memories,
-                             config=player_config)
+        future = group.submit(self._make_player_memories,
+                              config=player_config)
         main_player_memory_futures.append(future)
-      for player_config, future in zip(main_player_configs,
-                                       main_player_memory_futures):
-        self._all_memories[player_config.name] = future.result()
+    for player_config, future in zip(main_player_configs,
+                                     main_player_memory_futures):
+      self._all_memories[player_config.name] = future.result()
 
     if num_supporting_players > 0:
       supporting_player_memory_futures = []
-      with concurrency.executor(max_workers=num_supporting_players) as pool:
+      with concurrency.task_group() as group:
         for player_config in supporting_player_configs:
-          future = pool.submit(self._make_player_memories,
-                               config=player_config)
+          future = group.submit(self._make_player_memories,
+                                config=player_config)
           supporting_player_memory_futures.append(future)
-        for player_config, future in zip(supporting_player_configs,
-                                         supporting_player_memory_futures):
-          self._all_memories[player_config.name] = future.result()
+      for player_config, future in zip(supporting_player_configs,
+                                       supporting_player_memory_futures):
+        self._all_memories[player_config.name] = future.result()
 
     main_players = []
     for idx, player_config in enumerate(main_player_configs):
@@ -548,6 +550,7 @@ class Simulation(Runnable):
           memory=self._all_memories[player_config.name],
           clock=self._clock,
           update_time_interval=MAJOR_TIME_STEP,
+          log_dir=log_dir,
       )
       if self._two_focal_populations:
         if idx == 0:
@@ -572,6 +575,7 @@ class Simulation(Runnable):
           clock=self._clock,
           update_time_interval=MAJOR_TIME_STEP,
           additional_components=[conversation_style],
+          log_dir=log_dir,
       )
       supporting_players.append(player)
 
@@ -634,6 +638,7 @@ class Simulation(Runnable):
             supporting_players_at_fixed_locations=SUPPORTING_PLAYER_LOCATIONS,
             additional_components=additional_gm_components,
             npc_context=only_named_characters_sell_str,
+            log_dir=log_dir,
         )
     )
     self._scenes = configure_scenes(
@@ -651,12 +656,25 @@ class Simulation(Runnable):
         scenario_premise=SCENARIO_PREMISE,
     )
 
+  def close(self) -> None:
+    """Closes the logs of the players and game masters."""
+    for player in self._all_players:
+      player.close()
+    for environment in [
+        self._primary_environment,
+        *self._secondary_environments,
+    ]:
+      environment.close()
+
   def _make_player_memories(self, config: formative_memories.AgentConfig):
     """Make memories for a player."""
     mem = self._formative_memory_factory.make_memories(config)
     # Inject player-specific memories declared in the agent config.
-    for extra_memory in config.extras['player_specific_memories']:
-      mem.add(f'{extra_memory}', tags=['initial_player_specific_memory'])
+    mem.extend(
+        [f'{extra_memory}'
+         for extra_memory in config.extras['player_specific_memories']],
+        tags=['initial_player_specific_memory'],
+    )
     return mem
 
   def _init_premise_memories(
@@ -680,21 +698,20 @@ class Simulation(Runnable):
     player_configs = main_player_configs + supporting_player_configs
     self._clock.set(setup_time)
 
+    self._game_master_memory.extend(scenario_premise)
     for premise in scenario_premise:
-      self._game_master_memory.add(premise)
       for player in self._all_players:
         player.observe(premise)
 
+    self._game_master_memory.extend(shared_memories)
     for shared_memory in shared_memories:
-      self._game_master_memory.add(shared_memory)
       for player in self._all_players:
         player.observe(shared_memory)
 
     # The game master also observes all the player-specific memories.
     for player_config in player_configs:
-      extra_memories = player_config.extras['player_specific_memories']
-      for extra_memory in extra_memories:
-        self._game_master_memory.add(extra_memory)
+      self._game_master_memory.extend(
+          player_config.extras['player_specific_memories'])
 
   def __call__(self) -> str:
     """Run the simulation.
@@ -32,12 +32,26 @@ and EMBEDDER_NAME specifies a sentence transformers embedding model listed at
 https://huggingface.co/sentence-transformers.
 
 This script will download the embedder from huggingface and cache it locally.
+To also reuse text embeddings across runs, pass the option:
+  --embedding_cache_dir=DIRECTORY
+
+To keep the memory use of long simulations bounded, pass the option:
+  --log_dir=DIRECTORY
+to write the logs of the players and the game master to files in DIRECTORY.
 
 To debug without spending money on API calls, pass the the option:
   --disable_language_model
 It replaces the language model with a null model that always returns an empty
 string when asked for a free response and alwats selects the first option when
 asked for a multiple choice.
+
+To profile the simulation along the control flow of a real run, record the
+language model calls of a run with the option:
+  --record_language_model=FILE
+and replay them in later runs, without calling the model, with the option:
+  --replay_language_model=FILE
+Prompts that were not recorded, e.g. multiple choice questions whose options
+were shuffled differently, get the null model's responses.
 """
 
 import argparse
@@ -47,9 +61,12 @@ import os
 import pathlib
 import sys
 
+from concordia.associative_memory import embedders
+from concordia.associative_memory import embedding_cache
 from concordia.language_model import gpt_model
 from concordia.language_model import mistral_model
 from concordia.language_model import no_language_model
+from concordia.language_model import recording_wrapper
 from concordia.utils import measurements as measurements_lib
 import openai
 import sentence_transformers
@@ -77,6 +94,19 @@ parser.add_argument('--embedder',
                     action='store',
                     default='all-mpnet-base-v2',
                     dest='embedder_name')
+parser.add_argument('--embedding_cache_dir',
+                    action='store',
+                    default=None,
+                    help=('directory in which to persist text embeddings so '
+                          'they can be reused by later runs.'),
+                    dest='embedding_cache_dir')
+parser.add_argument('--log_dir',
+                    action='store',
+                    default=None,
+                    help=('directory in which to write the logs of the players '
+                          'and the game master, keeping only their latest '
+                          'entries in memory.'),
+                    dest='log_dir')
 parser.add_argument('--disable_language_model',
                     action='store_true',
                     help=('replace the language model with a null model. This '
@@ -84,6 +114,18 @@ parser.add_argument('--disable_language_model',
                           'on api calls.'),
                     default=False,
                     dest='disable_language_model')
+parser.add_argument('--record_language_model',
+                    action='store',
+                    default=None,
+                    help=('file to record the language model calls to, for '
+                          'later runs to replay.'),
+                    dest='record_language_model')
+parser.add_argument('--replay_language_model',
+                    action='store',
+                    default=None,
+                    help=('file of recorded language model calls to replay '
+                          'instead of calling the language model.'),
+                    dest='replay_language_model')
 # Parse command line arguments
 args = parser.parse_args()
 
@@ -99,7 +141,13 @@ simulation = importlib.import_module(
     f'{IMPORT_ENV_BASE_DIR}.{args.environment_name}')
 
 # Language Model setup
-if not args.disable_language_model:
+if args.replay_language_model:
+  model = recording_wrapper.ReplayLanguageModel(
+      args.replay_language_model,
+      latency=recording_wrapper.recorded_latency(),
+      fallback=no_language_model.NoLanguageModel(),
+  )
+elif not args.disable_language_model:
   # By default this script uses GPT-4, so you must provide an API key.
   # Note that it is also possible to use local models or other API models,
   # simply replace the following with the correct initialization for the model
@@ -120,22 +168,36 @@ if not args.disable_language_model:
     raise ValueError(f'Unrecognized api type: {args.api_type}')
 else:
   model = no_language_model.NoLanguageModel()
+if args.record_language_model:
+  model = recording_wrapper.RecordingLanguageModel(
+      model, args.record_language_model
+  )
 
 # Setup sentence encoder
 st_model = sentence_transformers.SentenceTransformer(
     f'sentence-transformers/{args.embedder_name}')
-embedder = lambda x: st_model.encode(x, show_progress_bar=False)
+measurements = measurements_lib.Measurements()
+embedder = embedding_cache.CachedEmbedder(
+    embedders.FunctionBatchEmbedder(
+        lambda texts: st_model.encode(texts, show_progress_bar=False)),
+    cache_dir=args.embedding_cache_dir,
+    measurements=measurements,
+)
 
 # Initialize the simulation
-measurements = measurements_lib.Measurements()
 runnable_simulation = simulation.Simulation(
     model=model,
     embedder=embedder,
     measurements=measurements,
     agent_module=agent_module,
+    log_dir=args.log_dir,
 )
 # Run the simulation
-results_log = runnable_simulation()
+try:
+  results_log = runnable_simulation()
+finally:
+  # Closes the files of the logs in --log_dir.
+  runnable_simulation.close()
 
 # Write the results log as an HTML file in the current working directory.
 filename = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '.html'
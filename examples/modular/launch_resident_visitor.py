@@ -33,6 +33,8 @@ and EMBEDDER_NAME specifies a sentence transformers embedding model listed at
 https://huggingface.co/sentence-transformers.
 
 This script will download the embedder from huggingface and cache it locally.
+To also reuse text embeddings across runs, pass the option:
+  --embedding_cache_dir=DIRECTORY
 
 To debug without spending money on API calls, pass the the option:
   --disable_language_model
@@ -48,6 +50,8 @@ import os
 import pathlib
 import sys
 
+from concordia.associative_memory import embedders
+from concordia.associative_memory import embedding_cache
 from concordia.language_model import gpt_model
 from concordia.language_model import mistral_model
 from concordia.language_model import no_language_model
@@ -82,6 +86,19 @@ parser.add_argument('--embedder',
                     action='store',
                     default='all-mpnet-base-v2',
                     dest='embedder_name')
+parser.add_argument('--embedding_cache_dir',
+                    action='store',
+                    default=None,
+                    help=('directory in which to persist text embeddings so '
+                          'they can be reused by later runs.'),
+                    dest='embedding_cache_dir')
+parser.add_argument('--log_dir',
+                    action='store',
+                    default=None,
+                    help=('directory in which to write the logs of the players '
+                          'and the game master, keeping only their latest '
+                          'entries in memory.'),
+                    dest='log_dir')
 parser.add_argument('--disable_language_model',
                     action='store_true',
                     help=('replace the language model with a null model. This '
@@ -131,18 +148,28 @@ else:
 # Setup sentence encoder
 st_model = sentence_transformers.SentenceTransformer(
     f'sentence-transformers/{args.embedder_name}')
-embedder = lambda x: st_model.encode(x, show_progress_bar=False)
+measurements = measurements_lib.Measurements()
+embedder = embedding_cache.CachedEmbedder(
+    embedders.FunctionBatchEmbedder(
+        lambda texts: st_model.encode(texts, show_progress_bar=False)),
+    cache_dir=args.embedding_cache_dir,
+    measurements=measurements,
+)
 
 # Initialize the simulation
-measurements = measurements_lib.Measurements()
 runnable_simulation = simulation.Simulation(
     model=model,
     embedder=embedder,
     measurements=measurements,
     resident_visitor_modules=(resident_agent_module, visitor_agent_module),
+    log_dir=args.log_dir,
 )
 # Run the simulation
-results_log = runnable_simulation()
+try:
+  results_log = runnable_simulation()
+finally:
+  # Closes the files of the logs in --log_dir.
+  runnable_simulation.close()
 
 # Write the results log as an HTML file in the current working directory.
 filename = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '.html'
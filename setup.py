@@ -71,8 +71,8 @@ setuptools.setup(
         'absl-py',
         'google-cloud-aiplatform',
         'google-generativeai',
+        'httpx',
         'ipython',
-        'langchain',
         'matplotlib',
         'mistralai',
         'numpy',
@@ -100,5 +100,9 @@ setuptools.setup(
             'pytype',
             'twine',
         ],
+        # HTTP/2 connections of the clients in language_model.connection_pool.
+        'http2': [
+            'httpx[http2]',
+        ],
     },
 )